@@ -0,0 +1,74 @@
+"""
+Microbenchmark of the per-call overhead of call_function
+with precompiled call plans, compared to dispatch without
+validation and to introspecting the function on every call.
+
+Usage: python benchmarks/bench_call_plans.py
+"""
+import inspect
+import os
+import sys
+import timeit
+import typing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import BaseModel, TypeAdapter
+
+from tiny_fnc_engine import FunctionCallingEngine, FunctionCall
+
+NUMBER = 20_000
+
+class User(BaseModel):
+    name: str
+    age: int
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+def greet(user: User, greeting: str = "Hello") -> str:
+    return f"{greeting}, {user.name}!"
+
+def call_with_introspection(function: callable, parameters: dict) -> object:
+    # What validation costs without a precompiled plan
+    signature = inspect.signature(function)
+    hints = typing.get_type_hints(function)
+    signature.bind(**parameters)
+    parameters = {
+        name: TypeAdapter(hints[name]).validate_python(value) if name in hints else value
+        for name, value in parameters.items()
+    }
+    return function(**parameters)
+
+def measure(statement: callable) -> float:
+    return min(timeit.repeat(statement, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+def main() -> None:
+    unvalidated = FunctionCallingEngine()
+    unvalidated.add_functions([add, greet], validate=False)
+    compiled = FunctionCallingEngine()
+    compiled.add_functions([add, greet])
+
+    cases = {
+        "add(a: int, b: int)": (add, {'a': 2, 'b': 3}),
+        "greet(user: User)": (greet, {'user': {'name': 'Alice', 'age': 30}}),
+    }
+    user = User(name='Alice', age=30)
+    print(f"{'case':<24}{'path':<28}{'us/call':>10}")
+    for case, (function, parameters) in cases.items():
+        def make_call() -> FunctionCall:
+            return FunctionCall.model_construct(name=function.__name__, parameters=dict(parameters), returns=None)
+
+        results = {
+            "direct call": measure(lambda: function(**parameters) if function is add else function(user=user)),
+            "introspection per call": measure(lambda: call_with_introspection(function, dict(parameters))),
+            "compiled plan": measure(lambda: compiled.call_function(make_call())),
+        }
+        if function is add:
+            # greet needs the dict coerced to a User, so it only runs validated
+            results["no validation"] = measure(lambda: unvalidated.call_function(make_call()))
+        for path, microseconds in results.items():
+            print(f"{case:<24}{path:<28}{microseconds:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Microbenchmark of parsing function calls into the Pydantic
+FunctionCall model, as parse_function_calls does, compared
+to the CompactCall objects the engine runs parsed plans
+with: latency and allocations per call.
+
+Usage: python benchmarks/bench_compact_calls.py
+"""
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tiny_fnc_engine import FunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.calls import CompactCall
+
+NUMBER = 20_000
+CALLS = 10
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+def native_calls(number: int) -> list[dict]:
+    return [
+        {'name': 'add', 'parameters': {'a': i, 'b': 1}, 'returns': [{'name': f'result{i}', 'type': 'int'}]}
+        for i in range(number)
+    ]
+
+def openai_calls(number: int) -> list[dict]:
+    return [
+        {
+            'id': f'call_{i}',
+            'function': {'name': 'add', 'arguments': json.dumps({'a': i, 'b': 1})},
+            'type': 'function'
+        }
+        for i in range(number)
+    ]
+
+def measure(statement: callable, calls: int) -> float:
+    return min(timeit.repeat(statement, number=NUMBER // calls, repeat=5)) / NUMBER * 1e6
+
+def count_allocations(statement: callable, calls: int) -> tuple[float, float]:
+    """
+    Count the blocks and bytes allocated per call and still
+    alive when the statement returns, i.e. held by its result.
+    """
+    statement()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = statement()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = [stat for stat in after.compare_to(before, "filename") if stat.size_diff > 0]
+    del result
+    return sum(stat.count_diff for stat in stats) / calls, sum(stat.size_diff for stat in stats) / calls
+
+def main() -> None:
+    engine = FunctionCallingEngine()
+    engine.add_functions([add])
+    native = native_calls(CALLS)
+    openai = openai_calls(CALLS)
+    native_json = json.dumps(native)
+    call = native[0]
+
+    cases = {
+        "one call": (1, {
+            "FunctionCall(**call)": lambda: FunctionCall(**call),
+            "CompactCall.from_dict": lambda: CompactCall.from_dict(call),
+        }),
+        f"{CALLS} native calls": (CALLS, {
+            "parse_function_calls": lambda: engine.parse_function_calls(native),
+            "compact (engine path)": lambda: engine._parse_function_calls(native, compact=True),
+        }),
+        f"{CALLS} OpenAI tool calls": (CALLS, {
+            "parse_function_calls": lambda: engine.parse_function_calls(openai),
+            "compact (engine path)": lambda: engine._parse_function_calls(openai, compact=True),
+        }),
+        f"{CALLS} calls from JSON": (CALLS, {
+            "decode + FunctionCall": lambda: engine.parse_function_calls(engine.json_backend.loads(native_json)),
+            "decode + compact": lambda: engine._decode_and_parse(native_json),
+        }),
+    }
+    print(f"{'case':<24}{'path':<26}{'us/call':>10}{'blocks/call':>14}{'bytes/call':>12}")
+    for case, (calls, paths) in cases.items():
+        for path, statement in paths.items():
+            blocks, size = count_allocations(statement, calls)
+            print(f"{case:<24}{path:<26}{measure(statement, calls):>10.2f}{blocks:>14.1f}{size:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Benchmark suite of the overhead of the engine itself:
+parsing, FunctionCall validation, dispatch and chained calls.
+
+Usage:
+    python benchmarks/bench_engine.py                        Print the results
+    python benchmarks/bench_engine.py --save baseline.json   Save the results as a baseline
+    python benchmarks/bench_engine.py --compare baseline.json [--threshold 0.2]
+        Compare the results to a baseline, exiting with status 1
+        if a benchmark is slower than the baseline by more than
+        the threshold (a fraction of the baseline time).
+"""
+from typing import Callable
+import argparse
+import platform
+import statistics
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine, FunctionCall
+
+REPEAT = 5
+CHAIN_LENGTH = 100
+BATCH_SIZE = 100
+
+class User(BaseModel):
+    name: str
+    age: int
+    tags: list[str]
+
+def noop() -> None:
+    return None
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+def count(document: str, items: list) -> int:
+    return len(document) + len(items)
+
+def greet(user: User) -> str:
+    return f"Hello, {user.name}!"
+
+def native_calls(number: int) -> list[dict]:
+    return [
+        {'name': 'add', 'parameters': {'a': i, 'b': 1}, 'returns': [{'name': f'result{i}', 'type': 'int'}]}
+        for i in range(number)
+    ]
+
+def openai_calls(number: int) -> list[dict]:
+    return [
+        {
+            'id': f'call_{i}',
+            'function': {'name': 'add', 'arguments': json.dumps({'a': i, 'b': 1})},
+            'type': 'function'
+        }
+        for i in range(number)
+    ]
+
+def chain_calls(length: int) -> list[dict]:
+    calls = [{'name': 'add', 'parameters': {'a': 0, 'b': 1}, 'returns': [{'name': 'value0', 'type': 'int'}]}]
+    for i in range(1, length):
+        calls.append({
+            'name': 'add',
+            'parameters': {'a': f'value{i - 1}', 'b': 1},
+            'returns': [{'name': f'value{i}', 'type': 'int'}]
+        })
+    return calls
+
+def make_engine() -> FunctionCallingEngine:
+    engine = FunctionCallingEngine()
+    engine.add_functions([noop, add, count, greet])
+    return engine
+
+def build_benchmarks() -> dict[str, Callable[[], object]]:
+    """
+    Build the benchmarks, each a callable running one operation.
+    """
+    engine = make_engine()
+    native = native_calls(10)
+    openai = openai_calls(10)
+    native_json = json.dumps(native)
+    call_dict = native[0]
+    chain_json = json.dumps(chain_calls(CHAIN_LENGTH))
+    batch = [native_json] * BATCH_SIZE
+    large_call = {
+        'name': 'count',
+        'parameters': {'document': 'x' * 1_000_000, 'items': list(range(10_000))},
+        'returns': [{'name': 'length', 'type': 'int'}]
+    }
+    user_call = {
+        'name': 'greet',
+        'parameters': {'user': {'name': 'Alice', 'age': 30, 'tags': ['admin', 'beta']}},
+        'returns': [{'name': 'greeting', 'type': 'str'}]
+    }
+
+    def call_noop() -> object:
+        return engine.call_function(FunctionCall.model_construct(name='noop', parameters={}, returns=None))
+
+    def call_chain() -> object:
+        engine.reset_session()
+        return engine.parse_and_call_functions(chain_json)
+
+    return {
+        "parse_native_10": lambda: engine.parse_function_calls(native),
+        "parse_openai_10": lambda: engine.parse_function_calls(openai),
+        "parse_json_string_10": lambda: engine._parse_input(native_json),
+        "function_call_validation": lambda: FunctionCall(**call_dict),
+        "call_function_noop": call_noop,
+        f"chain_{CHAIN_LENGTH}_calls": call_chain,
+        "large_payload_call": lambda: engine.parse_and_call_functions(large_call),
+        "pydantic_argument_call": lambda: engine.parse_and_call_functions(user_call),
+        f"batch_{BATCH_SIZE}_responses": lambda: engine.batch_parse_and_call_functions(batch, executor="inline"),
+    }
+
+def measure(benchmark: Callable[[], object]) -> dict[str, float]:
+    """
+    Measure a benchmark, in microseconds per operation.
+    """
+    timer = timeit.Timer(benchmark)
+    number, _ = timer.autorange()
+    times = [time / number * 1e6 for time in timer.repeat(repeat=REPEAT, number=number)]
+    return {"min_us": min(times), "median_us": statistics.median(times), "number": number}
+
+def run(selected: list[str]) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, benchmark in build_benchmarks().items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(benchmark)
+        print(f"{name:<28}{results[name]['min_us']:>14.2f} us")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compare results to a baseline and return the names
+    of the benchmarks that regressed.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+        before, after = baseline["results"][name]["min_us"], result["min_us"]
+        change = (after - before) / before
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<28}{before:>11.2f} us{after:>11.2f} us{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", metavar="PATH", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results to a baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, default 0.2")
+    parser.add_argument("benchmarks", nargs="*", help="only run benchmarks containing these names")
+    args = parser.parse_args()
+
+    results = run(args.benchmarks)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results
+            }, file, indent=4)
+            file.write("\n")
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
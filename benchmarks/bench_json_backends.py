@@ -0,0 +1,59 @@
+"""
+Benchmark of the JSON backends on large tool-call payloads,
+e.g. long document arguments, given as str and as the raw
+bytes received from the network.
+
+Usage: python benchmarks/bench_json_backends.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tiny_fnc_engine import FunctionCallingEngine
+from tiny_fnc_engine.json_backend import available_json_backends
+
+REPEAT = 5
+
+def summarize(document: str, max_words: int = 100) -> int:
+    return min(len(document), max_words)
+
+def make_payloads() -> dict[str, bytes]:
+    document = "lorem ipsum dolor sit amet, \"consectetur\" adipiscing elit\n" * 20_000
+    return {
+        "native_1MB": json.dumps([
+            {'name': 'summarize', 'parameters': {'document': document}, 'returns': [{'name': 'summary', 'type': 'int'}]}
+        ]).encode(),
+        "openai_4x256KB": json.dumps([
+            {
+                'id': f'call_{i}',
+                'type': 'function',
+                'function': {'name': 'summarize', 'arguments': json.dumps({'document': document[:256 * 1024]})}
+            }
+            for i in range(4)
+        ]).encode(),
+    }
+
+def measure(statement: callable) -> float:
+    timer = timeit.Timer(statement)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number * 1e3
+
+def main() -> None:
+    print(f"{'payload':<18}{'backend':<10}{'input':<22}{'ms/call':>10}")
+    for payload_name, payload in make_payloads().items():
+        for backend in available_json_backends():
+            engine = FunctionCallingEngine(json_backend=backend)
+            engine.add_functions([summarize])
+            cases = {
+                "bytes": lambda: engine.parse_and_call_functions(payload),
+                "memoryview": lambda: engine.parse_and_call_functions(memoryview(payload)),
+                "bytes.decode() + str": lambda: engine.parse_and_call_functions(payload.decode()),
+            }
+            for case, statement in cases.items():
+                print(f"{payload_name:<18}{backend:<10}{case:<22}{measure(statement):>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of session snapshots: full, compressed and
+incremental snapshots of a multi-megabyte session, compared
+to pickling its outputs, and restoring them from bytes and
+from a memory-mapped SnapshotStore.
+
+Usage: python benchmarks/bench_snapshots.py
+"""
+import pickle
+import tempfile
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine
+from tiny_fnc_engine.snapshots import SnapshotStore
+
+REPEAT = 5
+
+class Item(BaseModel):
+    id: int
+    name: str
+    price: float
+
+class Cart(BaseModel):
+    owner: str
+    items: list[Item]
+
+def make_session(engine: FunctionCallingEngine):
+    session = engine.create_session("bench")
+    session.outputs['cart'] = Cart(owner='alice', items=[Item(id=i, name=f'item {i}', price=i * 0.5) for i in range(20_000)])
+    session.outputs['document'] = "lorem ipsum dolor sit amet " * 40_000
+    session.outputs['embeddings'] = bytearray(os.urandom(4 * 1024 * 1024))
+    session.outputs['results'] = [{'id': i, 'score': i / 7} for i in range(10_000)]
+    return session
+
+def measure(statement: callable) -> float:
+    timer = timeit.Timer(statement)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number * 1e3
+
+def main() -> None:
+    engine = FunctionCallingEngine()
+    session = make_session(engine)
+    full = session.snapshot()
+    compressed = session.snapshot(compress=True)
+    session.snapshot()
+
+    def incremental() -> bytes:
+        session.outputs['answer'] = 42
+        return session.snapshot(incremental=True)
+
+    directory = tempfile.mkdtemp(prefix="tiny_fnc_engine_bench_")
+    store = SnapshotStore(directory)
+    store.checkpoint(session, full=True)
+
+    def restore(data: bytes) -> None:
+        engine.close_session("restored")
+        engine.restore_session(data, "restored")
+
+    cases = {
+        "pickle.dumps(outputs)": lambda: pickle.dumps(dict(session.outputs), protocol=5),
+        "snapshot": session.snapshot,
+        "snapshot compressed": lambda: session.snapshot(compress=True),
+        "snapshot incremental": incremental,
+        "restore": lambda: restore(full),
+        "restore compressed": lambda: restore(compressed),
+    }
+    print(f"session: {len(full) / 1e6:.1f} MB, compressed: {len(compressed) / 1e6:.1f} MB")
+    print(f"{'case':<24}{'ms':>10}")
+    for case, statement in cases.items():
+        print(f"{case:<24}{measure(statement):>10.2f}")
+
+    engine.close_session("restored")
+    engine.close_session("bench")
+    print(f"{'restore mmap store':<24}{measure(lambda: restore(store.read('bench')[0])):>10.2f}")
+    store.remove("bench")
+    os.rmdir(directory)
+
+if __name__ == "__main__":
+    main()
@@ -3,29 +3,19 @@ import json
 from openai import OpenAI
 from tiny_fnc_engine import FunctionCallingEngine, OpenAIToolCall, OpenAIFunction
 
-# Declare constants
-TOOLS = [
-    {
-        "type": "function",
-        "function": {
-            "name": "search",
-            "description": "Search for items",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Search query"
-                    }
-                }
-            }
-        }
-    }
-]
-
 def search(query: str) -> str:
+    """
+    Search for items
+
+    query: str
+        Search query
+    """
     return f"Search results for {query}"
 
+# Initialize the FunctionCallingEngine and add functions
+engine = FunctionCallingEngine()
+engine.add_functions([search])
+
 # Initialize OpenAI client
 client = OpenAI(
     base_url = 'http://localhost:11434/v1',
@@ -42,17 +32,13 @@ messages = [
 response = client.chat.completions.create(
     model="mistral-nemo:12b",
     messages=messages,
-    tools=TOOLS,
+    tools=engine.get_tools(),
     tool_choice="auto",
 )
 
 # Extract tool calls
 tool_calls = response.choices[0].message.tool_calls
 
-# Initialize the FunctionCallingEngine and add functions
-engine = FunctionCallingEngine()
-engine.add_functions([search])
-
 # Parse and call the functions
 function_calls = []
 for tool_call in tool_calls:
@@ -0,0 +1,70 @@
+import unittest
+import asyncio
+import time
+import json
+
+from tiny_fnc_engine import AsyncFunctionCallingEngine, FunctionCall, Parameter
+
+async def fetch_weather(city: str) -> str:
+    await asyncio.sleep(0.2)
+    return f"Sunny in {city}"
+
+async def fetch_population(city: str) -> int:
+    await asyncio.sleep(0.2)
+    return len(city) * 1000
+
+def describe(weather: str, population: int) -> str:
+    return f"{weather}, population {population}"
+
+class TestAsyncFunctionCallingEngine(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.engine = AsyncFunctionCallingEngine()
+        self.engine.add_functions([fetch_weather, fetch_population, describe])
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    async def test_call_function_coroutine(self):
+        result = await self.engine.call_function(FunctionCall(
+            name='fetch_weather',
+            parameters={'city': 'Paris'},
+            returns=[Parameter(name='weather', type='str')]
+        ))
+        self.assertEqual(result, "Sunny in Paris")
+        self.assertEqual(self.engine.outputs['weather'], "Sunny in Paris")
+
+    async def test_call_function_sync(self):
+        result = await self.engine.call_function(FunctionCall(
+            name='describe',
+            parameters={'weather': 'Rainy', 'population': 5},
+            returns=None
+        ))
+        self.assertEqual(result, "Rainy, population 5")
+
+    async def test_parse_and_call_functions_concurrent(self):
+        function_calls = json.dumps([
+            {'name': 'fetch_weather', 'parameters': {'city': 'Oslo'}, 'returns': [{'name': 'weather', 'type': 'str'}]},
+            {'name': 'fetch_population', 'parameters': {'city': 'Oslo'}, 'returns': [{'name': 'population', 'type': 'int'}]},
+            {'name': 'describe', 'parameters': {'weather': 'weather', 'population': 'population'}, 'returns': None}
+        ])
+        start = time.perf_counter()
+        results = await self.engine.parse_and_call_functions(function_calls)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, ["Sunny in Oslo", 4000, "Sunny in Oslo, population 4000"])
+        self.assertLess(elapsed, 0.35)
+
+    async def test_call_functions_error(self):
+        async def failing_function() -> str:
+            raise RuntimeError("Tool failed")
+
+        self.engine.add_functions([failing_function])
+        function_calls = [
+            FunctionCall(name='failing_function', parameters={}, returns=[Parameter(name='weather', type='str')]),
+            FunctionCall(name='describe', parameters={'weather': 'weather', 'population': 1}, returns=None)
+        ]
+        with self.assertRaises(RuntimeError):
+            await self.engine.call_functions(function_calls)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import json
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, BatchResult, PlanValidationError
+from tiny_fnc_engine.instrumentation import Instrumentation
+from tiny_fnc_engine.stores import BoundedOutputStore
+
+class Order(BaseModel):
+    item: str
+    quantity: int
+
+def make_order(item: str, quantity: int) -> Order:
+    return Order(item=item, quantity=quantity)
+
+def total(order: Order, price: float) -> float:
+    return order.quantity * price
+
+def fail(reason: str) -> None:
+    raise RuntimeError(reason)
+
+async def async_total(order: Order, price: float) -> float:
+    return order.quantity * price
+
+def order_response(item: str, quantity: int, price: float) -> str:
+    return json.dumps([
+        {'name': 'make_order', 'parameters': {'item': item, 'quantity': quantity}, 'returns': [{'name': 'order', 'type': 'Order'}]},
+        {'name': 'total', 'parameters': {'order': 'order', 'price': price}}
+    ])
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([make_order, total, fail])
+        self.responses = [
+            order_response('apple', 2, 0.5),
+            {'name': 'fail', 'parameters': {'reason': 'out of stock'}},
+            order_response('pear', 3, 1.0),
+            '{"name": "make_order", "parameters": ',
+            [{'name': 'make_order', 'parameters': {'item': 'fig'}}],
+            [{'parameters': {}}],
+            {'id': 'call_1', 'type': 'function', 'function': {'name': 'total', 'arguments': '{"order": {"item": "kiwi", "quantity": 4}, "price": 2}'}}
+        ]
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def check_results(self, results: list[BatchResult]):
+        self.assertEqual([result.index for result in results], list(range(len(self.responses))))
+        self.assertEqual(results[0].results, [Order(item='apple', quantity=2), 1.0])
+        self.assertIsInstance(results[1].error, RuntimeError)
+        self.assertEqual(results[2].results, [Order(item='pear', quantity=3), 3.0])
+        self.assertIsInstance(results[3].error, json.JSONDecodeError)
+        self.assertIsInstance(results[4].error, PlanValidationError)
+        self.assertIsInstance(results[4].error, TypeError)
+        self.assertIsInstance(results[5].error, ValueError)
+        self.assertEqual(results[6], BatchResult(6, [8.0], None))
+        for result in results:
+            self.assertTrue((result.results is None) != (result.error is None))
+
+    def test_inline(self):
+        self.check_results(self.engine.batch_parse_and_call_functions(self.responses, executor="inline"))
+
+    def test_thread(self):
+        self.check_results(self.engine.batch_parse_and_call_functions(self.responses))
+
+    def test_process(self):
+        self.check_results(self.engine.batch_parse_and_call_functions(self.responses, executor="process", chunk_size=3))
+
+    def test_process_engine_options(self):
+        engine = FunctionCallingEngine(reference_mode="explicit", preflight=False)
+        engine.add_functions([make_order, total])
+        responses = [
+            json.dumps([
+                {'name': 'make_order', 'parameters': {'item': 'fig', 'quantity': 3}, 'returns': [{'name': 'order', 'type': 'Order'}]},
+                {'name': 'make_order', 'parameters': {'item': 'kiwi', 'quantity': {'$ref': 'order.quantity'}}}
+            ]),
+            json.dumps([
+                {'name': 'make_order', 'parameters': {'item': 'fig', 'quantity': 3}},
+                {'name': 'missing', 'parameters': {}}
+            ])
+        ]
+        for executor in ("thread", "process"):
+            results = engine.batch_parse_and_call_functions(responses, executor=executor)
+            self.assertEqual(results[0].results[1], Order(item='kiwi', quantity=3))
+            # Without the preflight check, the unknown function fails when it is called
+            self.assertIsInstance(results[1].error, KeyError)
+        engine.shutdown()
+
+    def test_chunks(self):
+        for chunk_size in (1, 2, 100):
+            self.check_results(self.engine.batch_parse_and_call_functions(self.responses, chunk_size=chunk_size))
+
+    def test_isolated_outputs(self):
+        results = self.engine.batch_parse_and_call_functions([
+            order_response('apple', 1, 1.0),
+            {'name': 'total', 'parameters': {'order': 'order', 'price': 1.0}}
+        ])
+        self.assertEqual(results[0].results[1], 1.0)
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(len(self.engine.outputs), 0)
+
+    def test_output_store_closed(self):
+        stores = []
+
+        def output_store():
+            stores.append(BoundedOutputStore(max_bytes=1024))
+            return stores[-1]
+
+        engine = FunctionCallingEngine(output_store=output_store)
+        engine.add_functions([make_order, total])
+        results = engine.batch_parse_and_call_functions([order_response('apple', 1, 1.0)] * 3)
+        self.assertEqual([result.results[1] for result in results], [1.0] * 3)
+        self.assertEqual([len(store) for store in stores], [0] * 4)
+
+    def test_instrumentation(self):
+        instrumentation = Instrumentation()
+        engine = FunctionCallingEngine(instrumentation=instrumentation)
+        engine.add_functions([make_order, total])
+        engine.batch_parse_and_call_functions([order_response('apple', 1, 1.0)] * 5, chunk_size=2)
+        self.assertEqual(instrumentation.parse_metrics.calls, 3)
+        self.assertEqual(instrumentation.metrics['total'].calls, 5)
+
+    def test_invalid_executor(self):
+        with self.assertRaises(ValueError):
+            self.engine.batch_parse_and_call_functions(self.responses, executor="gpu")
+
+class TestAsyncBatch(unittest.IsolatedAsyncioTestCase):
+    async def test_batch(self):
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([make_order, async_total, fail])
+        responses = [
+            [
+                {'name': 'make_order', 'parameters': {'item': 'apple', 'quantity': i}, 'returns': [{'name': 'order', 'type': 'Order'}]},
+                {'name': 'async_total', 'parameters': {'order': 'order', 'price': 1.0}}
+            ]
+            for i in range(10)
+        ] + [{'name': 'fail', 'parameters': {'reason': 'boom'}}]
+        results = await engine.batch_parse_and_call_functions(responses, max_concurrency=3)
+        engine.shutdown()
+
+        self.assertEqual([result.results[1] for result in results[:10]], [float(i) for i in range(10)])
+        self.assertIsInstance(results[10].error, RuntimeError)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import json
+import time
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine, FunctionCall, Parameter
+from tiny_fnc_engine.cache import MISSING, ResultCache, make_cache_key, make_plan_key
+
+class Location(BaseModel):
+    city: str
+    country: str
+
+class TestResultCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = ResultCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_ttl_eviction(self):
+        cache = ResultCache(maxsize=2, ttl=0.05)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.1)
+        self.assertIs(cache.get('a'), MISSING)
+        self.assertEqual(cache.stats.hits, 1)
+        self.assertEqual(cache.stats.misses, 1)
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_make_cache_key(self):
+        key = make_cache_key('geocode', {'location': Location(city='Paris', country='FR'), 'limit': 1})
+        same_key = make_cache_key('geocode', {'limit': 1, 'location': Location(city='Paris', country='FR')})
+        other_key = make_cache_key('geocode', {'location': {'city': 'Paris', 'country': 'FR'}, 'limit': 1})
+        self.assertEqual(key, same_key)
+        self.assertNotEqual(key, other_key)
+        self.assertIsNone(make_cache_key('geocode', {'location': object()}))
+        self.assertNotEqual(make_cache_key('geocode', {'limit': 1}, 1), make_cache_key('geocode', {'limit': 1}, 2))
+
+    def test_canonical_types(self):
+        for value, other in (
+            ((1, 2), [1, 2]),
+            ({1: 'x'}, {'1': 'x'}),
+            ({'\0tuple': [1, 2]}, (1, 2)),
+            ({(1, 2): 'x'}, {'[1,2]': 'x'}),
+            ({'a': {1, 2}}, {'a': [1, 2]}),
+            (b'ab', '6162')
+        ):
+            self.assertNotEqual(make_cache_key('f', {'p': value}), make_cache_key('f', {'p': other}))
+        self.assertEqual(make_cache_key('f', {'p': {2: 'b', 1: 'a'}}), make_cache_key('f', {'p': {1: 'a', 2: 'b'}}))
+        circular = []
+        circular.append(circular)
+        self.assertIsNone(make_cache_key('f', {'p': circular}))
+
+class TestEngineCache(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        def convert(value: float, unit: str) -> float:
+            self.calls += 1
+            return value * 2.54 if unit == 'in' else value
+
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([convert], cache=True)
+
+    def test_repeated_calls_hit_cache(self):
+        function_call = {'name': 'convert', 'parameters': {'value': 2, 'unit': 'in'}}
+        self.assertEqual(self.engine.parse_and_call_functions(function_call), [5.08])
+        self.engine.reset_session()
+        self.assertEqual(self.engine.parse_and_call_functions(function_call), [5.08])
+        self.assertEqual(self.engine.parse_and_call_functions(function_call, parallel=True), [5.08])
+        self.engine.shutdown()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.engine.cache.stats.hits, 2)
+        self.assertEqual(self.engine.cache.stats.misses, 1)
+
+    def test_registering_again_drops_cached_outputs(self):
+        function_call = FunctionCall(name='convert', parameters={'value': 2, 'unit': 'in'})
+        self.assertEqual(self.engine.call_function(function_call), 5.08)
+        self.assertEqual(len(self.engine.cache), 1)
+
+        def convert(value: float, unit: str) -> float:
+            return value * 25.4 if unit == 'in' else value
+
+        self.engine.add_functions([convert], cache=True)
+        self.assertEqual(len(self.engine.cache), 0)
+        self.assertEqual(self.engine.call_function(function_call), 50.8)
+
+    def test_per_function_cache(self):
+        def square(x: int) -> int:
+            return x * x
+
+        cache = ResultCache(maxsize=1)
+        self.engine.add_functions([square], cache=cache)
+        self.engine.call_function(FunctionCall(name='square', parameters={'x': 2}, returns=[Parameter(name='y', type='int')]))
+        self.engine.call_function(FunctionCall(name='square', parameters={'x': 3}, returns=None))
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertEqual(len(self.engine.cache), 0)
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self):
+        def add(a: int, b: int) -> int:
+            return a + b
+
+        self.engine = FunctionCallingEngine(plan_cache_size=2)
+        self.engine.add_functions([add])
+        self.response = json.dumps([
+            {'name': 'add', 'parameters': {'a': 1, 'b': 2}, 'returns': [{'name': 'x', 'type': 'int'}]},
+            {'name': 'add', 'parameters': {'a': 'x', 'b': 3}, 'returns': [{'name': 'y', 'type': 'int'}]}
+        ])
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(FunctionCallingEngine().plan_cache)
+
+    def test_make_plan_key(self):
+        self.assertEqual(make_plan_key('{"a": 1}'), make_plan_key(b'{"a": 1}'))
+        self.assertEqual(make_plan_key(memoryview(b'{"a": 1}')), make_plan_key(bytearray(b'{"a": 1}')))
+        self.assertNotEqual(make_plan_key('{"a": 1}'), make_plan_key('{"a": 2}'))
+
+    def test_repeated_plans_skip_parsing(self):
+        self.assertEqual(self.engine.parse_and_call_functions(self.response), [3, 6])
+        plan = self.engine.plan_cache.get(make_plan_key(self.response))
+        self.assertIsInstance(plan, tuple)
+        session = self.engine.create_session()
+        self.assertEqual(session.parse_and_call_functions(self.response.encode()), [3, 6])
+
+        # References are resolved on copies, so the cached plan is unchanged
+        self.assertEqual(plan[1].parameters, {'a': 'x', 'b': 3})
+        stats = self.engine.plan_cache.stats
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+        self.assertAlmostEqual(stats.hit_rate, 2 / 3)
+
+    def test_invalid_plans_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.engine.parse_and_call_functions('{"parameters": {}}')
+        self.assertEqual(len(self.engine.plan_cache), 0)
+
+    def test_batch(self):
+        results = self.engine.batch_parse_and_call_functions([self.response, '[', self.response, '['], executor='inline', chunk_size=4)
+        self.assertEqual([result.results for result in results], [[3, 6], None, [3, 6], None])
+        self.assertEqual(self.engine.plan_cache.stats.size, 1)
+        results = self.engine.batch_parse_and_call_functions([self.response.encode()], executor='inline')
+        self.assertEqual(results[0].results, [3, 6])
+        self.assertEqual(self.engine.plan_cache.stats.hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
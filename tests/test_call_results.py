@@ -0,0 +1,141 @@
+import unittest
+import threading
+import asyncio
+import time
+from concurrent.futures import CancelledError
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall, CallResult
+
+def wait(seconds: float, value: str) -> str:
+    time.sleep(seconds)
+    return value
+
+def upper(value: str) -> str:
+    return value.upper()
+
+def fail(value: str) -> str:
+    raise ValueError(value)
+
+async def async_wait(seconds: float, value: str) -> str:
+    await asyncio.sleep(seconds)
+    return value
+
+async def async_upper(value: str) -> str:
+    return value.upper()
+
+class TestIterCallFunctions(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine(max_workers=4)
+        self.engine.add_functions([wait, upper, fail])
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def test_completion_order(self):
+        function_calls = [
+            FunctionCall(name='wait', parameters={'seconds': 0.2, 'value': 'slow'}, returns=[{'name': 'slow', 'type': 'str'}]),
+            FunctionCall(name='wait', parameters={'seconds': 0.01, 'value': 'fast'}),
+            FunctionCall(name='upper', parameters={'value': 'slow'})
+        ]
+        start = time.monotonic()
+        results = self.engine.iter_call_functions(function_calls)
+        first = next(results)
+        self.assertLess(time.monotonic() - start, 0.15)
+        self.assertEqual(first, CallResult(1, function_calls[1], 'fast', None))
+        self.assertEqual([result.index for result in results], [0, 2])
+        self.assertEqual(results.summary(), ['slow', 'fast', 'SLOW'])
+        self.assertEqual(results.summary(), self.engine.call_functions(function_calls, parallel=True))
+
+    def test_sequential(self):
+        results = self.engine.iter_parse_and_call_functions([
+            {'name': 'wait', 'parameters': {'seconds': 0.05, 'value': 'a'}, 'returns': [{'name': 'a', 'type': 'str'}]},
+            {'name': 'upper', 'parameters': {'value': 'a'}}
+        ], parallel=False)
+        self.assertEqual([(result.index, result.output) for result in results], [(0, 'a'), (1, 'A')])
+        self.assertEqual(results.summary(), ['a', 'A'])
+
+    def test_errors_are_yielded(self):
+        function_calls = [
+            FunctionCall(name='fail', parameters={'value': 'boom'}, returns=[{'name': 'x', 'type': 'str'}]),
+            FunctionCall(name='upper', parameters={'value': 'x'}),
+            FunctionCall(name='wait', parameters={'seconds': 0.05, 'value': 'independent'})
+        ]
+        for parallel in (True, False):
+            results = self.engine.iter_call_functions(function_calls, parallel=parallel)
+            finished = list(results)
+            self.assertIsInstance(finished[0].error, ValueError)
+            # The dependent call is skipped, not yielded
+            self.assertNotIn(1, [result.index for result in finished])
+            with self.assertRaises(ValueError):
+                results.summary()
+
+    def test_close_skips_remaining_calls(self):
+        calls = []
+
+        def record(value: str) -> str:
+            calls.append(value)
+            return value
+
+        self.engine.add_functions([record])
+        results = self.engine.iter_call_functions([
+            FunctionCall(name='wait', parameters={'seconds': 0.05, 'value': 'a'}, returns=[{'name': 'a', 'type': 'str'}]),
+            FunctionCall(name='wait', parameters={'seconds': 0.2, 'value': 'b'}, returns=[{'name': 'b', 'type': 'str'}]),
+            FunctionCall(name='record', parameters={'value': 'b'})
+        ])
+        self.assertEqual(next(results).index, 0)
+        results.close()
+        time.sleep(0.3)
+        self.assertEqual(calls, [])
+
+    def test_cancel_event(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        results = self.engine.iter_call_functions([FunctionCall(name='upper', parameters={'value': 'a'})], cancel_event=cancel_event)
+        self.assertIsInstance(next(results).error, CancelledError)
+        with self.assertRaises(CancelledError):
+            results.summary()
+
+    def test_session(self):
+        session = self.engine.create_session()
+        results = session.iter_call_functions([
+            FunctionCall(name='upper', parameters={'value': 'a'}, returns=[{'name': 'b', 'type': 'str'}])
+        ])
+        self.assertEqual(results.summary(), ['A'])
+        self.assertEqual(session.outputs['b'], 'A')
+        self.assertNotIn('b', self.engine.outputs)
+
+class TestAsyncIterCallFunctions(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = AsyncFunctionCallingEngine()
+        self.engine.add_functions([async_wait, async_upper, fail])
+
+    async def test_completion_order(self):
+        results = self.engine.iter_parse_and_call_functions([
+            {'name': 'async_wait', 'parameters': {'seconds': 0.1, 'value': 'slow'}, 'returns': [{'name': 'slow', 'type': 'str'}]},
+            {'name': 'async_wait', 'parameters': {'seconds': 0.01, 'value': 'fast'}},
+            {'name': 'async_upper', 'parameters': {'value': 'slow'}}
+        ])
+        indices = [result.index async for result in results]
+        self.assertEqual(indices, [1, 0, 2])
+        self.assertEqual(await results.summary(), ['slow', 'fast', 'SLOW'])
+
+    async def test_error_cancels_remaining_calls(self):
+        results = self.engine.iter_call_functions([
+            FunctionCall(name='fail', parameters={'value': 'boom'}),
+            FunctionCall(name='async_wait', parameters={'seconds': 5, 'value': 'never'})
+        ])
+        start = time.monotonic()
+        finished = [result async for result in results]
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual([result.index for result in finished], [0])
+        with self.assertRaises(ValueError):
+            await results.summary()
+
+    async def test_session(self):
+        session = self.engine.create_session()
+        results = session.iter_call_functions([FunctionCall(name='async_upper', parameters={'value': 'a'})])
+        self.assertEqual(await results.summary(), ['A'])
+        self.engine.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import threading
+from concurrent.futures import CancelledError
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+
+batches = []
+
+def embed(text: str, scale: int = 1) -> int:
+    return len(text) * scale
+
+def embed_batch(calls: list[dict]) -> list[int]:
+    batches.append([call['text'] for call in calls])
+    return [len(call['text']) * call.get('scale', 1) for call in calls]
+
+async def async_embed_batch(calls: list[dict]) -> list[int]:
+    return embed_batch(calls)
+
+def broken_batch(calls: list[dict]) -> list[int]:
+    return [0]
+
+def concat(a: str, b: str) -> str:
+    return a + b
+
+def embed_call(text: str, returns: str = None) -> FunctionCall:
+    return FunctionCall(
+        name='embed',
+        parameters={'text': text},
+        returns=[{'name': returns, 'type': 'int'}] if returns else None
+    )
+
+class TestCoalescing(unittest.TestCase):
+    def setUp(self):
+        batches.clear()
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([embed], batch_functions={'embed': embed_batch})
+        self.engine.add_functions([concat])
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def test_independent_calls_run_as_one_batch(self):
+        function_calls = [embed_call('a', 'x'), embed_call('bb', 'y'), embed_call('ccc')]
+        for parallel in (False, True):
+            batches.clear()
+            results = self.engine.call_functions(function_calls, parallel=parallel)
+            self.assertEqual(results, [1, 2, 3])
+            self.assertEqual(batches, [['a', 'bb', 'ccc']])
+            self.assertEqual((self.engine.outputs['x'], self.engine.outputs['y']), (1, 2))
+
+    def test_parameters_are_validated(self):
+        results = self.engine.parse_and_call_functions([
+            {'name': 'embed', 'parameters': {'text': 'ab', 'scale': '3'}},
+            {'name': 'embed', 'parameters': {'text': 'c'}}
+        ])
+        self.assertEqual(results, [6, 1])
+
+    def test_dependent_calls_are_not_coalesced(self):
+        function_calls = [
+            FunctionCall(name='concat', parameters={'a': 'a', 'b': 'b'}, returns=[{'name': 'ab', 'type': 'str'}]),
+            embed_call('ab'),
+            embed_call('xyz'),
+            embed_call('ab'),
+            embed_call('q')
+        ]
+        for parallel in (False, True):
+            batches.clear()
+            results = self.engine.call_functions(function_calls, parallel=parallel)
+            self.assertEqual(results, ['ab', 2, 3, 2, 1])
+            # The calls referencing the output of concat run in a batch after it
+            self.assertEqual(sorted(batches), [['ab', 'ab'], ['xyz', 'q']])
+
+    def test_single_call_is_not_batched(self):
+        self.assertEqual(self.engine.call_functions([embed_call('abcd')]), [4])
+        self.assertEqual(batches, [])
+
+    def test_wrong_number_of_outputs(self):
+        self.engine.add_functions([embed], batch_functions={'embed': broken_batch})
+        for parallel in (False, True):
+            with self.assertRaises(ValueError):
+                self.engine.call_functions([embed_call('a'), embed_call('b')], parallel=parallel)
+
+    def test_cached_calls_are_not_batched(self):
+        self.engine.add_functions([embed], cache=True, batch_functions={'embed': embed_batch})
+        self.engine.call_functions([embed_call('a'), embed_call('bb')])
+        results = self.engine.call_functions([embed_call('a'), embed_call('ccc'), embed_call('bb'), embed_call('dddd')])
+        self.assertEqual(results, [1, 3, 2, 4])
+        self.assertEqual(batches, [['a', 'bb'], ['ccc', 'dddd']])
+
+    def test_iter_call_functions(self):
+        results = self.engine.iter_call_functions([embed_call('a'), embed_call('bb')])
+        self.assertEqual(sorted(result.output for result in results), [1, 2])
+        self.assertEqual(batches, [['a', 'bb']])
+
+    def test_cancel_event(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(CancelledError):
+            self.engine.call_functions([embed_call('a'), embed_call('b')], cancel_event=cancel_event)
+        self.assertEqual(batches, [])
+
+    def test_invalid_batch_functions(self):
+        with self.assertRaises(ValueError):
+            self.engine.add_functions([concat], batch_functions={'embed': embed_batch})
+        with self.assertRaises(TypeError):
+            self.engine.add_functions([embed], batch_functions={'embed': lambda: []})
+
+class TestAsyncCoalescing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        batches.clear()
+        self.engine = AsyncFunctionCallingEngine()
+        self.engine.add_functions([embed], batch_functions={'embed': async_embed_batch})
+        self.engine.add_functions([concat])
+
+    async def test_independent_calls_run_as_one_batch(self):
+        results = await self.engine.call_functions([
+            embed_call('a', 'x'),
+            FunctionCall(name='concat', parameters={'a': 'a', 'b': 'b'}, returns=[{'name': 'ab', 'type': 'str'}]),
+            embed_call('ab'),
+            embed_call('cc', 'y')
+        ])
+        self.assertEqual(results, [1, 'ab', 2, 2])
+        self.assertEqual(batches, [['a', 'cc']])
+        self.assertEqual(self.engine.outputs['y'], 2)
+
+    async def test_iter_call_functions(self):
+        results = self.engine.iter_call_functions([embed_call('a'), embed_call('bb')])
+        self.assertEqual(await results.summary(), [1, 2])
+        self.assertEqual(batches, [['a', 'bb']])
+
+    async def test_wrong_number_of_outputs(self):
+        self.engine.add_functions([embed], batch_functions={'embed': broken_batch})
+        with self.assertRaises(ValueError):
+            await self.engine.call_functions([embed_call('a'), embed_call('b')])
+
+if __name__ == '__main__':
+    unittest.main()
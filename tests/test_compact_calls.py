@@ -0,0 +1,125 @@
+import unittest
+import pickle
+import io
+from contextlib import redirect_stdout
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.calls import CallReturn, CompactCall
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+def norm(point: Point) -> int:
+    return abs(point.x) + abs(point.y)
+
+class TestCompactCall(unittest.TestCase):
+    def test_from_dict(self):
+        parameters = {'a': 1, 'b': [2, {'c': None}]}
+        call = CompactCall.from_dict({'name': 'add', 'parameters': parameters, 'returns': [{'name': 'x', 'type': 'int'}], 'id': 1})
+        self.assertEqual(call.name, 'add')
+        self.assertIs(call.parameters, parameters)
+        self.assertEqual(call.returns, (CallReturn('x', 'int'),))
+        self.assertEqual(call.returns[0].name, 'x')
+        self.assertIsNone(CompactCall.from_dict({'name': 'add', 'parameters': {}}).returns)
+
+    def test_from_dict_rejects_other_values(self):
+        for data in (
+            [],
+            {'parameters': {}},
+            {'name': 'add'},
+            {'name': 1, 'parameters': {}},
+            {'name': 'add', 'parameters': {'a': None}},
+            {'name': 'add', 'parameters': {'a': (1, 2)}},
+            {'name': 'add', 'parameters': {}, 'returns': {'name': 'x'}},
+            {'name': 'add', 'parameters': {}, 'returns': [{'name': 'x'}]}
+        ):
+            with self.assertRaises(TypeError):
+                CompactCall.from_dict(data)
+
+    def test_model_round_trip(self):
+        model = FunctionCall(name='add', parameters={'a': 1, 'b': 2}, returns=[{'name': 'x', 'type': 'int'}])
+        call = CompactCall.from_model(model)
+        self.assertEqual(call, CompactCall('add', {'a': 1, 'b': 2}, (CallReturn('x', 'int'),)))
+        self.assertEqual(FunctionCall(**call.to_dict()), model)
+
+    def test_immutable_and_picklable(self):
+        call = CompactCall.from_dict({'name': 'add', 'parameters': {'a': 1}})
+        with self.assertRaises(AttributeError):
+            call.name = 'other'
+        with self.assertRaises(AttributeError):
+            del call.parameters
+        self.assertEqual(pickle.loads(pickle.dumps(call)), call)
+        with self.assertRaises(TypeError):
+            hash(call)
+
+class TestEngineCompactCalls(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine(plan_cache_size=16)
+        self.engine.add_functions([add, norm])
+
+    def test_parsed_plans_are_compact(self):
+        response = '[{"name": "add", "parameters": {"a": 1, "b": 2}, "returns": [{"name": "x", "type": "int"}]}, {"name": "add", "parameters": {"a": "x", "b": 3}}]'
+        self.assertEqual(self.engine.parse_and_call_functions(response), [3, 6])
+        plan = self.engine._parse_input(response)
+        self.assertTrue(all(type(call) is CompactCall for call in plan))
+        self.assertIsInstance(self.engine.parse_function_calls({'name': 'add', 'parameters': {'a': 1, 'b': 2}})[0], FunctionCall)
+        result, = self.engine.iter_parse_and_call_functions('{"name": "add", "parameters": {"a": 1, "b": 2}}')
+        self.assertIsInstance(result.function_call, CompactCall)
+        self.assertEqual(FunctionCall(**result.function_call.to_dict()).name, 'add')
+
+    def test_openai_tool_calls(self):
+        results = self.engine.parse_and_call_functions({
+            'id': 'call_1',
+            'function': {'name': 'add', 'arguments': '{"a": 2, "b": 5}'},
+            'type': 'function'
+        })
+        self.assertEqual(results, [7])
+
+    def test_values_validated_by_the_model(self):
+        # Models and tuples are not JSON values, the FunctionCall model validates them
+        self.assertEqual(self.engine.parse_and_call_functions([
+            {'name': 'norm', 'parameters': {'point': Point(x=-1, y=2)}},
+            {'name': 'norm', 'parameters': {'point': {'x': 3, 'y': 4}}, 'returns': ({'name': 'n', 'type': 'int'},)}
+        ]), [3, 7])
+        self.assertEqual(self.engine.outputs['n'], 7)
+        for invalid in ({'name': 'add', 'parameters': {'a': None}}, {'parameters': {}}):
+            with self.assertRaises(ValueError):
+                self.engine.parse_and_call_functions(invalid)
+
+    def test_verbose_output(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.engine.parse_and_call_functions(
+                {'name': 'add', 'parameters': {'a': 1, 'b': 1}, 'returns': [{'name': 'x', 'type': 'int'}]},
+                verbose=True
+            )
+        self.assertIn("Returns: [Parameter(name='x', type='int')]", output.getvalue())
+
+    def test_batches(self):
+        results = self.engine.batch_parse_and_call_functions([
+            '{"name": "add", "parameters": {"a": 1, "b": 2}}',
+            '{"name": "add", "parameters": {"a": null}}',
+            [{'name': 'norm', 'parameters': {'point': Point(x=1, y=1)}}]
+        ])
+        self.assertEqual(results[0].results, [3])
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(results[2].results, [2])
+
+class TestAsyncEngineCompactCalls(unittest.IsolatedAsyncioTestCase):
+    async def test_streamed_calls(self):
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([add])
+        results = await engine.stream_and_call_functions([
+            '[{"name": "add", "parameters": {"a": 1, "b": 2}, "returns": [{"name": "x", "type": "int"}]},',
+            ' {"name": "add", "parameters": {"a": "x", "b": 1}}]'
+        ])
+        self.assertEqual(results, [3, 4])
+
+if __name__ == '__main__':
+    unittest.main()
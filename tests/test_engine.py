@@ -4,6 +4,7 @@ import sys
 import os
 import tempfile
 import json
+import time
 
 # Add the tiny_fnc_engine directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tiny_fnc_engine')))
@@ -26,6 +27,15 @@ class Person(BaseModel):
     name: str
     age: int
 
+def get_person(name: str) -> Person:
+    return Person(name=name, age=len(name))
+
+def greet_person(person: Person, greeting: str = "Hello") -> str:
+    return f"{greeting}, {person.name}!"
+
+def get_process_id(person: Person) -> tuple[int, str]:
+    return os.getpid(), person.name
+
 class TestFunctionCallingEngine(unittest.TestCase):
     def setUp(self):
         self.engine = FunctionCallingEngine()
@@ -369,5 +379,161 @@ def square_area(side):
         results = self.engine.parse_and_call_functions(tool_calls)
         self.assertEqual(results, ["Name: Alice, Age: 30"])
 
+    def test_call_functions_parallel(self):
+        def slow_square(x: int) -> int:
+            time.sleep(0.2)
+            return x * x
+
+        self.engine.add_functions([slow_square])
+        function_calls = [
+            FunctionCall(
+                name='slow_square',
+                parameters={'x': i},
+                returns=[Parameter(name=f'square{i}', type='int')]
+            )
+            for i in range(4)
+        ]
+        start = time.perf_counter()
+        results = self.engine.call_functions(function_calls, parallel=True)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, [0, 1, 4, 9])
+        self.assertEqual(self.engine.outputs['square3'], 9)
+        self.assertLess(elapsed, 0.6)
+
+    def test_parse_and_call_functions_parallel_chained(self):
+        function_calls = [
+            {
+                'name': 'helper_function',
+                'parameters': {'a': 2, 'b': 3},
+                'returns': [{'name': 'sum', 'type': 'int'}]
+            },
+            {
+                'name': 'helper_function',
+                'parameters': {'a': 10, 'b': 10},
+                'returns': [{'name': 'other', 'type': 'int'}]
+            },
+            {
+                'name': 'helper_function',
+                'parameters': {'a': 'sum', 'b': 'other'},
+                'returns': [{'name': 'final_result', 'type': 'int'}]
+            }
+        ]
+        results = self.engine.parse_and_call_functions(function_calls, parallel=True)
+        self.assertEqual(results, [5, 20, 25])
+        self.assertEqual(self.engine.outputs['final_result'], 25)
+
+    def test_call_functions_parallel_error(self):
+        def failing_function() -> int:
+            raise RuntimeError("Tool failed")
+
+        self.engine.add_functions([failing_function])
+        function_calls = [
+            FunctionCall(name='failing_function', parameters={}, returns=[Parameter(name='x', type='int')]),
+            FunctionCall(name='helper_function', parameters={'a': 'x', 'b': 1}, returns=None)
+        ]
+        with self.assertRaises(RuntimeError):
+            self.engine.call_functions(function_calls, parallel=True)
+        self.assertNotIn('x', self.engine.outputs)
+
+    def test_call_functions_parallel_long_chains(self):
+        def slow_start() -> int:
+            time.sleep(0.1)
+            return 0
+
+        def increment(x: int) -> int:
+            return x + 1
+
+        engine = FunctionCallingEngine()
+        engine.add_functions([slow_start])
+        engine.add_functions([increment], executor='inline')
+        engine.add_functions([increment], executor='inline', cache=True)
+        # Calls finishing inline or from the cache launch the next one without recursing
+        chain = [FunctionCall(name='slow_start', parameters={}, returns=[Parameter(name='x0', type='int')])]
+        for i in range(1, 1000):
+            chain.append(FunctionCall(name='increment', parameters={'x': f'x{i - 1}'}, returns=[Parameter(name=f'x{i}', type='int')]))
+        for _ in range(2):
+            results = engine.call_functions(chain, parallel=True)
+            self.assertEqual(results[-1], 999)
+        engine.shutdown()
+
+    def test_add_functions_invalid_executor(self):
+        with self.assertRaises(ValueError):
+            self.engine.add_functions([helper_function], executor='gpu')
+
+    def test_call_functions_executors(self):
+        self.engine.add_functions([get_person], executor='inline')
+        self.engine.add_functions([get_process_id], executor='process')
+        function_calls = [
+            FunctionCall(name='get_person', parameters={'name': 'Alice'}, returns=[Parameter(name='person', type='Person')]),
+            FunctionCall(
+                name='get_process_id',
+                parameters={'person': 'person'},
+                returns=[Parameter(name='pid', type='int'), Parameter(name='name', type='str')]
+            )
+        ]
+        try:
+            results = self.engine.call_functions(function_calls)
+            parallel_results = self.engine.call_functions(function_calls, parallel=True)
+        finally:
+            self.engine.shutdown()
+
+        self.assertEqual(results[0], Person(name='Alice', age=5))
+        self.assertNotEqual(results[1][0], os.getpid())
+        self.assertEqual(self.engine.outputs['name'], 'Alice')
+        self.assertNotEqual(parallel_results[1][0], os.getpid())
+
+    def test_add_functions_from_file_process_executor(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as temp_file:
+            temp_file.write("""
+import os
+
+def double_in_process(x):
+    return x * 2, os.getpid()
+            """)
+        try:
+            self.engine.add_functions_from_file(temp_file.name, executor='process')
+            result = self.engine.call_function(FunctionCall(
+                name='double_in_process',
+                parameters={'x': 21},
+                returns=None
+            ))
+            self.assertEqual(result[0], 42)
+            self.assertNotEqual(result[1], os.getpid())
+        finally:
+            self.engine.shutdown()
+            os.unlink(temp_file.name)
+
+    def test_call_function_coerces_pydantic_model(self):
+        self.engine.add_functions([greet_person])
+        result = self.engine.parse_and_call_functions({
+            'name': 'greet_person',
+            'parameters': {'person': {'name': 'Alice', 'age': 30}}
+        })
+        self.assertEqual(result, ["Hello, Alice!"])
+
+    def test_call_function_invalid_arguments(self):
+        self.engine.add_functions([greet_person])
+        with self.assertRaises(TypeError):
+            self.engine.call_function(FunctionCall(name='greet_person', parameters={'greeting': 'Hi'}))
+        with self.assertRaises(TypeError):
+            self.engine.call_function(FunctionCall(
+                name='greet_person',
+                parameters={'person': {'name': 'Alice', 'age': 30}, 'mood': 'happy'}
+            ))
+        with self.assertRaises(ValueError):
+            self.engine.call_function(FunctionCall(
+                name='greet_person',
+                parameters={'person': {'name': 'Alice', 'age': 'thirty'}}
+            ))
+
+    def test_add_functions_without_validation(self):
+        self.engine.add_functions([greet_person], validate=False)
+        with self.assertRaises(AttributeError):
+            self.engine.call_function(FunctionCall(
+                name='greet_person',
+                parameters={'person': {'name': 'Alice', 'age': 30}}
+            ))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,194 @@
+import unittest
+import time
+import json
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall, Parameter
+from tiny_fnc_engine.instrumentation import (
+    Histogram,
+    Instrumentation,
+    InMemoryExporter,
+    OpenTelemetrySpanExporter
+)
+
+def get_user(user_id: int) -> dict:
+    return {'id': user_id, 'name': 'Alice'}
+
+def slow_upper(text: str) -> str:
+    time.sleep(0.05)
+    return text.upper()
+
+def fail(reason: str) -> None:
+    raise RuntimeError(reason)
+
+async def async_upper(text: str) -> str:
+    return text.upper()
+
+class TestHistogram(unittest.TestCase):
+    def test_observe_and_quantile(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.mean, 0.65)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.75), 1.0)
+        self.assertEqual(histogram.quantile(1.0), 2.0)
+        self.assertEqual(Histogram().quantile(0.99), 0.0)
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.instrumentation = Instrumentation(exporters=[self.exporter])
+        self.engine = FunctionCallingEngine(instrumentation=self.instrumentation)
+        self.engine.add_functions([get_user, slow_upper, fail])
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def test_hooks(self):
+        events = []
+        self.instrumentation.add_hooks(
+            before=lambda span: events.append(('before', span.name)),
+            after=lambda span: events.append(('after', span.name, span.output)),
+            error=lambda span: events.append(('error', span.name, str(span.error)))
+        )
+        self.engine.call_function(FunctionCall(name='slow_upper', parameters={'text': 'hi'}))
+        with self.assertRaises(RuntimeError):
+            self.engine.call_function(FunctionCall(name='fail', parameters={'reason': 'boom'}))
+        self.assertEqual(events, [
+            ('before', 'slow_upper'),
+            ('after', 'slow_upper', 'HI'),
+            ('before', 'fail'),
+            ('error', 'fail', 'boom')
+        ])
+
+    def test_phase_durations(self):
+        self.engine.call_function(FunctionCall(name='slow_upper', parameters={'text': 'hi'}))
+        span, = self.exporter.spans
+        self.assertEqual(set(span.durations), {'resolve', 'execute', 'store', 'total'})
+        self.assertGreaterEqual(span.durations['execute'], 0.05)
+        self.assertGreaterEqual(span.durations['total'], span.durations['execute'])
+        self.assertGreater(span.end_time_ns, span.start_time_ns)
+
+    def test_metrics(self):
+        for user_id in range(3):
+            self.engine.call_function(FunctionCall(name='get_user', parameters={'user_id': user_id}))
+        with self.assertRaises(TypeError):
+            self.engine.call_function(FunctionCall(name='get_user', parameters={}))
+
+        metrics = self.instrumentation.metrics['get_user']
+        self.assertEqual(metrics.calls, 4)
+        self.assertEqual(metrics.errors, 1)
+        self.assertEqual(metrics.histograms['execute'].count, 3)
+        self.assertEqual(metrics.histograms['total'].count, 4)
+
+        summary = self.instrumentation.summary()
+        self.assertEqual(summary['get_user']['calls'], 4)
+        self.assertIn('execute_p99', summary['get_user'])
+        self.assertIn('total_mean', summary['get_user'])
+
+    def test_parse_metrics(self):
+        calls = json.dumps([{'name': 'get_user', 'parameters': {'user_id': 1}}])
+        self.engine.parse_and_call_functions(calls)
+        with self.assertRaises(ValueError):
+            self.engine.parse_function_calls([{'parameters': {}}])
+
+        self.assertEqual(self.instrumentation.parse_metrics.calls, 2)
+        self.assertEqual(self.instrumentation.parse_metrics.errors, 1)
+        self.assertEqual([span.kind for span in self.exporter.spans], ['parse', 'call', 'parse'])
+
+    def test_parallel_calls(self):
+        function_calls = [
+            FunctionCall(name='slow_upper', parameters={'text': 'a'}, returns=[Parameter(name='a', type='str')]),
+            FunctionCall(name='slow_upper', parameters={'text': 'a'}),
+            FunctionCall(name='fail', parameters={'reason': 'a'})
+        ]
+        with self.assertRaises(RuntimeError):
+            self.engine.call_functions(function_calls, parallel=True)
+        self.engine.call_functions(function_calls[:2], parallel=True)
+
+        metrics = self.instrumentation.metrics
+        self.assertEqual(metrics['slow_upper'].calls, 4)
+        self.assertEqual(metrics['slow_upper'].errors, 0)
+        self.assertEqual(metrics['fail'].errors, 1)
+        for span in self.exporter.spans:
+            if span.error is None:
+                self.assertGreaterEqual(span.durations['execute'], 0.05)
+
+    def test_hook_errors_in_parallel_plans(self):
+        function_calls = [
+            FunctionCall(name='get_user', parameters={'user_id': 1}, returns=[Parameter(name='user', type='dict')]),
+            FunctionCall(name='get_user', parameters={'user_id': 2})
+        ]
+        self.instrumentation.add_hooks(after=lambda span: 1 / 0)
+        for parallel in (False, True):
+            with self.assertRaises(ZeroDivisionError):
+                self.engine.call_functions(function_calls, parallel=parallel)
+
+        instrumentation = Instrumentation()
+        instrumentation.add_hooks(error=lambda span: 1 / 0)
+        engine = FunctionCallingEngine(instrumentation=instrumentation)
+        engine.add_functions([fail])
+        with self.assertRaises(ZeroDivisionError):
+            engine.call_functions([FunctionCall(name='fail', parameters={'reason': 'boom'})], parallel=True)
+        engine.shutdown()
+
+    def test_disabled(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions([get_user])
+        self.assertIsNone(engine.instrumentation)
+        self.assertEqual(engine.parse_and_call_functions({'name': 'get_user', 'parameters': {'user_id': 1}}), [{'id': 1, 'name': 'Alice'}])
+
+class TestOpenTelemetrySpanExporter(unittest.TestCase):
+    def test_span_data_model(self):
+        sunk = []
+        instrumentation = Instrumentation(exporters=[OpenTelemetrySpanExporter(sink=sunk.append, service_name='agent')])
+        engine = FunctionCallingEngine(instrumentation=instrumentation)
+        engine.add_functions([get_user, fail])
+        engine.call_function(FunctionCall(name='get_user', parameters={'user_id': 1}))
+        with self.assertRaises(RuntimeError):
+            engine.call_function(FunctionCall(name='fail', parameters={'reason': 'boom'}))
+
+        ok, error = sunk
+        self.assertEqual(ok['name'], 'get_user')
+        self.assertEqual(len(ok['trace_id']), 32)
+        self.assertEqual(len(ok['span_id']), 16)
+        self.assertEqual(ok['status'], {'code': 'STATUS_CODE_OK'})
+        self.assertEqual(ok['attributes']['code.function'], 'get_user')
+        self.assertIn('tiny_fnc_engine.execute_seconds', ok['attributes'])
+        self.assertLessEqual(ok['start_time_unix_nano'], ok['end_time_unix_nano'])
+        self.assertEqual(ok['resource']['attributes']['service.name'], 'agent')
+
+        self.assertEqual(error['status']['code'], 'STATUS_CODE_ERROR')
+        self.assertEqual(error['events'][0]['attributes']['exception.type'], 'RuntimeError')
+
+    def test_spans_without_sink_are_bounded(self):
+        exporter = OpenTelemetrySpanExporter(max_spans=2)
+        engine = FunctionCallingEngine(instrumentation=Instrumentation(exporters=[exporter]))
+        engine.add_functions([get_user])
+        for user_id in range(1, 4):
+            engine.call_function(FunctionCall(name='get_user', parameters={'user_id': user_id}))
+        self.assertEqual(len(exporter.spans), 2)
+
+class TestAsyncInstrumentation(unittest.IsolatedAsyncioTestCase):
+    async def test_async_calls(self):
+        exporter = InMemoryExporter()
+        instrumentation = Instrumentation(exporters=[exporter])
+        engine = AsyncFunctionCallingEngine(instrumentation=instrumentation)
+        engine.add_functions([async_upper, fail])
+        await engine.parse_and_call_functions([
+            {'name': 'async_upper', 'parameters': {'text': 'a'}},
+            {'name': 'async_upper', 'parameters': {'text': 'b'}}
+        ])
+        with self.assertRaises(RuntimeError):
+            await engine.call_function(FunctionCall(name='fail', parameters={'reason': 'boom'}))
+        engine.shutdown()
+
+        self.assertEqual(instrumentation.metrics['async_upper'].calls, 2)
+        self.assertEqual(instrumentation.metrics['fail'].errors, 1)
+        self.assertEqual(instrumentation.parse_metrics.calls, 1)
+        self.assertEqual(len(exporter.spans), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import json
+
+from tiny_fnc_engine import FunctionCallingEngine
+from tiny_fnc_engine.json_backend import JSON_BACKENDS, available_json_backends, get_json_backend
+
+def count_words(document: str) -> int:
+    return len(document.split())
+
+class TestJSONBackend(unittest.TestCase):
+    def test_default_backend(self):
+        self.assertEqual(get_json_backend().name, 'json')
+        self.assertEqual(FunctionCallingEngine().json_backend.name, 'json')
+        self.assertIn('json', available_json_backends())
+
+    def test_default_accepts_stdlib_json(self):
+        # Faster backends reject these, so they are not the default
+        document = '{"big": 123456789012345678901234567890, "nan": NaN, "inf": -Infinity}'
+        for data in (document, document.encode(), memoryview(document.encode())):
+            result = get_json_backend().loads(data)
+            self.assertEqual(result['big'], 123456789012345678901234567890)
+            self.assertNotEqual(result['nan'], result['nan'])
+            self.assertEqual(result['inf'], float('-inf'))
+
+    def test_memoryview_encodings(self):
+        document = '{"text": "caf\u00e9"}'
+        for encoding in ('utf-8', 'utf-16', 'utf-32'):
+            data = memoryview(document.encode(encoding))
+            self.assertEqual(get_json_backend('json').loads(data), {'text': 'café'}, encoding)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_json_backend('yaml')
+
+    def test_inputs(self):
+        document = '{"name": "count_words", "parameters": {"document": "a b c"}}'
+        for name in available_json_backends():
+            loads = get_json_backend(name).loads
+            for data in (document, document.encode(), bytearray(document.encode()), memoryview(document.encode())):
+                self.assertEqual(loads(data), json.loads(document), name)
+
+    def test_invalid_json(self):
+        for name in available_json_backends():
+            with self.assertRaises(json.JSONDecodeError, msg=name):
+                get_json_backend(name).loads(b'{"name": ')
+
+class TestEngineJSONBackend(unittest.TestCase):
+    def test_bytes_input(self):
+        payload = json.dumps([
+            {'name': 'count_words', 'parameters': {'document': 'word ' * 1000}},
+            {'id': 'call_1', 'type': 'function', 'function': {'name': 'count_words', 'arguments': '{"document": "a b"}'}}
+        ]).encode()
+        for name in JSON_BACKENDS:
+            if name not in available_json_backends():
+                continue
+            engine = FunctionCallingEngine(json_backend=name)
+            engine.add_functions([count_words])
+            self.assertEqual(engine.json_backend.name, name)
+            for data in (payload, bytearray(payload), memoryview(payload)):
+                self.assertEqual(engine.parse_and_call_functions(data), [1000, 2])
+            results = engine.batch_parse_and_call_functions([payload, memoryview(payload)], executor='inline')
+            self.assertEqual([result.results for result in results], [[1000, 2]] * 2)
+
+    def test_stream_uses_backend(self):
+        calls = []
+        engine = FunctionCallingEngine()
+        engine.json_backend = engine.json_backend._replace(loads=lambda data: calls.append(data) or json.loads(data))
+        engine.add_functions([count_words])
+        results = engine.stream_and_call_functions(['[{"name": "count_words", ', '"parameters": {"document": "a b"}}]'])
+        self.assertEqual(results, [2])
+        self.assertEqual(len(calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
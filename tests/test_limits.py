@@ -0,0 +1,227 @@
+import unittest
+import threading
+import asyncio
+import pickle
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.limits import ConcurrencyLimiter, ConcurrencyLimitError, FunctionTimeoutError
+
+def slow(seconds: float) -> str:
+    time.sleep(seconds)
+    return "done"
+
+def echo(value: str) -> str:
+    return value
+
+async def async_slow(seconds: float) -> str:
+    await asyncio.sleep(seconds)
+    return "done"
+
+def fails_with_timeout() -> str:
+    raise TimeoutError("backend timeout")
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_fifo(self):
+        limiter = ConcurrencyLimiter(1)
+        order = []
+        self.assertIsNone(limiter.request(lambda: order.append('never')))
+        limiter.request(lambda: order.append('first'))
+        limiter.request(lambda: order.append('second'))
+        self.assertEqual((limiter.active, limiter.waiting), (1, 2))
+        limiter.release()
+        limiter.release()
+        self.assertEqual(order, ['first', 'second'])
+        limiter.release()
+        self.assertEqual((limiter.active, limiter.waiting), (0, 0))
+
+    def test_max_queue(self):
+        limiter = ConcurrencyLimiter(1, max_queue=1)
+        self.assertTrue(limiter.acquire())
+        waiter = limiter.request(lambda: None)
+        with self.assertRaises(ConcurrencyLimitError):
+            limiter.request(lambda: None)
+        self.assertTrue(limiter.withdraw(waiter))
+        self.assertFalse(limiter.acquire(timeout=0.01))
+        self.assertEqual(limiter.waiting, 0)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            ConcurrencyLimiter(0)
+
+class TestTimeouts(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([slow], timeout=0.1)
+        self.engine.add_functions([echo, fails_with_timeout])
+
+    def tearDown(self):
+        self.engine.shutdown(wait=False)
+
+    def test_function_timeout(self):
+        self.assertEqual(self.engine.call_function(FunctionCall(name='slow', parameters={'seconds': 0.01})), 'done')
+        start = time.monotonic()
+        with self.assertRaises(FunctionTimeoutError) as context:
+            self.engine.call_function(FunctionCall(name='slow', parameters={'seconds': 1}))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual((context.exception.name, context.exception.timeout, context.exception.scope), ('slow', 0.1, 'function'))
+
+    def test_parallel_timeout(self):
+        function_calls = [
+            FunctionCall(name='slow', parameters={'seconds': 1}),
+            FunctionCall(name='echo', parameters={'value': 'a'})
+        ]
+        with self.assertRaises(FunctionTimeoutError):
+            self.engine.call_functions(function_calls, parallel=True)
+
+    def test_plan_timeout(self):
+        self.engine.add_functions([slow])
+        function_calls = [
+            FunctionCall(name='slow', parameters={'seconds': 0.05}),
+            FunctionCall(name='slow', parameters={'seconds': 0.05}),
+            FunctionCall(name='slow', parameters={'seconds': 0.05})
+        ]
+        for parallel in (False, True):
+            with self.assertRaises(FunctionTimeoutError) as context:
+                self.engine.call_functions(function_calls, timeout=0.02, parallel=parallel)
+            self.assertEqual((context.exception.scope, context.exception.timeout), ('plan', 0.02))
+
+    def test_default_plan_timeout(self):
+        engine = FunctionCallingEngine(plan_timeout=0.05)
+        engine.add_functions([slow])
+        with self.assertRaises(FunctionTimeoutError):
+            engine.parse_and_call_functions('{"name": "slow", "parameters": {"seconds": 1}}')
+        self.assertEqual(engine.parse_and_call_functions('{"name": "slow", "parameters": {"seconds": 0}}', timeout=1), ['done'])
+        engine.shutdown(wait=False)
+
+    def test_function_errors_pass_through(self):
+        with self.assertRaises(TimeoutError) as context:
+            self.engine.call_functions([FunctionCall(name='fails_with_timeout', parameters={})], timeout=1)
+        self.assertNotIsInstance(context.exception, FunctionTimeoutError)
+
+    def test_pickle(self):
+        error = pickle.loads(pickle.dumps(FunctionTimeoutError('slow', 0.1, 'plan')))
+        self.assertEqual((error.name, error.timeout, error.scope), ('slow', 0.1, 'plan'))
+        self.assertIn('plan', str(error))
+
+class TestCancellation(unittest.TestCase):
+    def test_cancel_event(self):
+        engine = FunctionCallingEngine()
+        cancel_event = threading.Event()
+        calls = []
+
+        def step(value: str) -> str:
+            calls.append(value)
+            cancel_event.set()
+            return value
+
+        engine.add_functions([step])
+        for parallel in (False, True):
+            calls.clear()
+            cancel_event.clear()
+            function_calls = [
+                FunctionCall(name='step', parameters={'value': 'a'}, returns=[{'name': 'a', 'type': 'str'}]),
+                FunctionCall(name='step', parameters={'value': 'a'})
+            ]
+            with self.assertRaises(CancelledError):
+                engine.call_functions(function_calls, parallel=parallel, cancel_event=cancel_event)
+            self.assertEqual(calls, ['a'])
+        engine.shutdown()
+
+class TestConcurrencyLimits(unittest.TestCase):
+    def test_limit_across_sessions(self):
+        engine = FunctionCallingEngine(max_workers=8)
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def backend(value: int) -> int:
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return value
+
+        engine.add_functions([backend], max_concurrency=2)
+        sessions = [engine.create_session() for _ in range(6)]
+
+        def run(session) -> list:
+            return session.call_functions(
+                [FunctionCall(name='backend', parameters={'value': i}) for i in range(3)],
+                parallel=True
+            )
+
+        with ThreadPoolExecutor(6) as pool:
+            results = list(pool.map(run, sessions))
+        self.assertEqual(results, [[0, 1, 2]] * 6)
+        self.assertLessEqual(peak[0], 2)
+        self.assertEqual(engine._get_entry('backend').limiter.active, 0)
+        engine.shutdown()
+
+    def test_shared_limiter(self):
+        engine = FunctionCallingEngine()
+        limiter = ConcurrencyLimiter(1, max_queue=0)
+        engine.add_functions([slow, echo], max_concurrency=limiter)
+        self.assertIs(engine._get_entry('slow').limiter, engine._get_entry('echo').limiter)
+        function_calls = [
+            FunctionCall(name='slow', parameters={'seconds': 0.1}),
+            FunctionCall(name='echo', parameters={'value': 'a'})
+        ]
+        with self.assertRaises(ConcurrencyLimitError):
+            engine.call_functions(function_calls, parallel=True)
+        engine.shutdown()
+
+    def test_timeout_while_waiting(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions([slow], max_concurrency=1, timeout=0.05)
+        function_calls = [
+            FunctionCall(name='slow', parameters={'seconds': 0.2}),
+            FunctionCall(name='slow', parameters={'seconds': 0})
+        ]
+        with self.assertRaises(FunctionTimeoutError):
+            engine.call_functions(function_calls, parallel=True)
+        time.sleep(0.3)
+        self.assertEqual((engine._get_entry('slow').limiter.active, engine._get_entry('slow').limiter.waiting), (0, 0))
+        engine.shutdown()
+
+class TestAsyncLimits(unittest.IsolatedAsyncioTestCase):
+    async def test_function_timeout(self):
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([async_slow, slow], timeout=0.05)
+        for name in ('async_slow', 'slow'):
+            with self.assertRaises(FunctionTimeoutError):
+                await engine.call_function(FunctionCall(name=name, parameters={'seconds': 0.5}))
+        engine.shutdown(wait=False)
+
+    async def test_plan_timeout_and_cancel_event(self):
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([async_slow])
+        function_calls = [FunctionCall(name='async_slow', parameters={'seconds': 0.5})]
+        with self.assertRaises(FunctionTimeoutError) as context:
+            await engine.call_functions(function_calls, timeout=0.05)
+        self.assertEqual(context.exception.scope, 'plan')
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(CancelledError):
+            await engine.call_functions(function_calls, cancel_event=cancel_event)
+
+    async def test_concurrency_limit(self):
+        engine = AsyncFunctionCallingEngine()
+        running, peak = [0], [0]
+
+        async def backend(value: int) -> int:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return value
+
+        engine.add_functions([backend], max_concurrency=3)
+        results = await engine.call_functions([FunctionCall(name='backend', parameters={'value': i}) for i in range(10)])
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(peak[0], 3)
+
+if __name__ == '__main__':
+    unittest.main()
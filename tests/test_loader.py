@@ -0,0 +1,148 @@
+import unittest
+import tempfile
+import textwrap
+import shutil
+import os
+
+from tiny_fnc_engine import FunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.loader import ToolManifest, find_source_files, scan_source
+
+WEATHER_TOOLS = '''
+import os
+from json import dumps
+
+IMPORTED = []
+IMPORTED.append(__name__)
+
+class Forecast:
+    pass
+
+def get_weather(city: str, days: int = 1, *, unit: str = "C") -> str:
+    """Get the weather of a city."""
+    return f"{city}: sunny for {days} day(s) in {unit}"
+
+async def get_alerts(city: str, **filters) -> list:
+    return []
+
+def _helper():
+    pass
+'''
+
+MATH_TOOLS = '''
+def add(a: int, b: int) -> int:
+    return a + b
+'''
+
+class TestScanSource(unittest.TestCase):
+    def test_scan(self):
+        get_weather, get_alerts = scan_source(textwrap.dedent(WEATHER_TOOLS))
+        self.assertEqual(get_weather.name, 'get_weather')
+        self.assertEqual(get_weather.parameters, ('city', 'days', 'unit'))
+        self.assertEqual(get_weather.required, ('city',))
+        self.assertEqual(get_weather.annotations, {'city': 'str', 'days': 'int', 'unit': 'str', 'return': 'str'})
+        self.assertEqual(get_weather.docstring, 'Get the weather of a city.')
+        self.assertFalse(get_weather.is_async)
+        self.assertTrue(get_alerts.is_async)
+        self.assertTrue(get_alerts.var_keyword)
+
+    def test_positional_only(self):
+        info, = scan_source('def f(a, /, b, c=1, *args, d, e=2): pass')
+        self.assertEqual(info.parameters, ('b', 'c', 'd', 'e'))
+        self.assertEqual(info.required, ('b', 'd'))
+
+class TestLazyLoading(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'math'))
+        os.makedirs(os.path.join(self.directory, '__pycache__'))
+        self.weather_path = self.write('weather.py', WEATHER_TOOLS)
+        self.write(os.path.join('math', 'basic.py'), MATH_TOOLS)
+        self.write('_private.py', MATH_TOOLS.replace('add', 'subtract'))
+        self.write('__init__.py', '')
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name: str, source: str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write(source)
+        return path
+
+    def test_find_source_files(self):
+        files = [os.path.relpath(path, self.directory) for path in find_source_files(self.directory)]
+        self.assertEqual(files, [os.path.join('math', 'basic.py'), 'weather.py'])
+        with self.assertRaises(NotADirectoryError):
+            find_source_files(os.path.join(self.directory, 'missing'))
+
+    def test_lazy_import(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions_from_directory(self.directory)
+        self.assertEqual(set(engine.functions), {'get_weather', 'get_alerts', 'add'})
+
+        # Nothing is imported until a function is called
+        weather_function = engine.functions['get_weather']
+        self.assertIsNone(weather_function._function)
+
+        result = engine.call_function(FunctionCall(name='get_weather', parameters={'city': 'Paris', 'days': '2'}))
+        self.assertEqual(result, 'Paris: sunny for 2 day(s) in C')
+        self.assertIsNotNone(weather_function._function)
+        self.assertIsNone(engine.functions['add']._function)
+
+        # Each module is imported once
+        engine.call_function(FunctionCall(name='get_weather', parameters={'city': 'Rome'}))
+        self.assertEqual(weather_function._function.__globals__['IMPORTED'], ['weather'])
+
+    def test_lazy_validation(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions_from_directory(self.directory)
+        entry = engine._get_entry('add')
+        self.assertEqual(entry.required, frozenset({'a', 'b'}))
+        self.assertTrue(entry.validates)
+        with self.assertRaises(TypeError):
+            engine.call_function(FunctionCall(name='add', parameters={'a': 1, 'c': 2}))
+        with self.assertRaises(ValueError):
+            engine.call_function(FunctionCall(name='add', parameters={'a': 1, 'b': 'two'}))
+        self.assertEqual(engine.call_function(FunctionCall(name='add', parameters={'a': 1, 'b': '2'})), 3)
+
+    def test_lazy_file(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions_from_file(self.weather_path, lazy=True)
+        self.assertEqual(set(engine.functions), {'get_weather', 'get_alerts'})
+
+    def test_process_executor(self):
+        engine = FunctionCallingEngine(max_processes=1)
+        engine.add_functions_from_directory(self.directory, executor='process')
+        try:
+            self.assertEqual(engine.call_function(FunctionCall(name='add', parameters={'a': 1, 'b': 2})), 3)
+        finally:
+            engine.shutdown()
+
+    def test_manifest(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions_from_directory(self.directory, manifest=self.manifest_path)
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+        # A restart reuses the manifest
+        manifest = ToolManifest(self.manifest_path)
+        FunctionCallingEngine().add_functions_from_directory(self.directory, manifest=manifest)
+        self.assertEqual((manifest.scanned, manifest.reused), (0, 2))
+
+        # Touched files are hashed but not rescanned
+        stat = os.stat(self.weather_path)
+        os.utime(self.weather_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        manifest = ToolManifest(self.manifest_path)
+        FunctionCallingEngine().add_functions_from_directory(self.directory, manifest=manifest)
+        self.assertEqual((manifest.scanned, manifest.reused), (0, 2))
+
+        # Modified files are rescanned
+        self.write('weather.py', WEATHER_TOOLS + '\ndef get_humidity(city: str) -> int:\n    return 50\n')
+        manifest = ToolManifest(self.manifest_path)
+        engine = FunctionCallingEngine()
+        engine.add_functions_from_directory(self.directory, manifest=manifest)
+        self.assertEqual((manifest.scanned, manifest.reused), (1, 1))
+        self.assertIn('get_humidity', engine.functions)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import threading
+import asyncio
+import time
+from concurrent.futures import Future
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.batching import MicroBatcher
+
+batches = []
+
+def search(query: str) -> str:
+    return query.upper()
+
+def search_batch(calls: list[dict]) -> list[str]:
+    batches.append(len(calls))
+    return [call['query'].upper() for call in calls]
+
+async def async_search_batch(calls: list[dict]) -> list[str]:
+    return search_batch(calls)
+
+def run_now(calls: list[dict]) -> Future:
+    future = Future()
+    future.set_result([call['x'] * 2 for call in calls])
+    return future
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_flush_on_size(self):
+        batcher = MicroBatcher(run_now, max_batch_size=3, max_wait=10)
+        futures = [batcher.submit({'x': i}) for i in range(7)]
+        self.assertEqual([future.result(timeout=0) for future in futures[:6]], [0, 2, 4, 6, 8, 10])
+        self.assertFalse(futures[6].done())
+        self.assertEqual(len(batcher), 1)
+        batcher.flush()
+        self.assertEqual(futures[6].result(timeout=0), 12)
+
+        stats = batcher.stats
+        self.assertEqual((stats.batches, stats.calls, stats.full_batches), (3, 7, 2))
+        self.assertAlmostEqual(stats.fill_ratio, 7 / 9)
+
+    def test_flush_on_wait(self):
+        batcher = MicroBatcher(run_now, max_batch_size=100, max_wait=0.01)
+        start = time.monotonic()
+        futures = [batcher.submit({'x': i}) for i in range(3)]
+        self.assertEqual([future.result(timeout=1) for future in futures], [0, 2, 4])
+        self.assertGreaterEqual(time.monotonic() - start, 0.01)
+        stats = batcher.stats
+        self.assertEqual((stats.batches, stats.full_batches), (1, 0))
+        self.assertGreaterEqual(stats.max_delay, 0.01)
+        self.assertGreater(stats.mean_delay, 0)
+
+    def test_errors_are_scattered(self):
+        def fail(calls: list[dict]) -> Future:
+            raise RuntimeError('backend down')
+
+        def short(calls: list[dict]) -> Future:
+            future = Future()
+            future.set_result([1])
+            return future
+
+        for run, error in ((fail, RuntimeError), (short, ValueError)):
+            batcher = MicroBatcher(run, max_batch_size=2)
+            futures = [batcher.submit({'x': 1}), batcher.submit({'x': 2})]
+            for future in futures:
+                with self.assertRaises(error):
+                    future.result(timeout=0)
+
+    def test_cancelled_calls_are_dropped(self):
+        sent = []
+
+        def record(calls: list[dict]) -> Future:
+            sent.append(calls)
+            return run_now(calls)
+
+        batcher = MicroBatcher(record, max_batch_size=2)
+        batcher.submit({'x': 1}).cancel()
+        self.assertEqual(batcher.submit({'x': 2}).result(timeout=0), 4)
+        self.assertEqual(sent, [[{'x': 2}]])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            MicroBatcher(run_now, max_batch_size=0)
+        with self.assertRaises(ValueError):
+            MicroBatcher(run_now, max_batch_size=1, max_wait=-1)
+
+class TestEngineMicroBatching(unittest.TestCase):
+    def setUp(self):
+        batches.clear()
+        self.engine = FunctionCallingEngine(max_workers=8)
+        self.engine.add_functions([search], batch_functions={'search': search_batch}, max_batch_size=4, max_batch_wait=0.05)
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def test_calls_from_sessions_are_batched(self):
+        results = {}
+        barrier = threading.Barrier(4)
+
+        def run(i: int) -> None:
+            session = self.engine.create_session()
+            barrier.wait()
+            results[i] = session.call_function(FunctionCall(name='search', parameters={'query': f'q{i}'}, returns=[{'name': 'hits', 'type': 'str'}]))
+            self.assertEqual(session.outputs['hits'], f'Q{i}')
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {i: f'Q{i}' for i in range(4)})
+        self.assertEqual(batches, [4])
+        stats = self.engine.get_batch_stats()['search']
+        self.assertEqual((stats.batches, stats.calls, stats.fill_ratio), (1, 4, 1.0))
+
+    def test_single_call_waits_for_max_wait(self):
+        start = time.monotonic()
+        self.assertEqual(self.engine.call_function(FunctionCall(name='search', parameters={'query': 'a'})), 'A')
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(batches, [1])
+        self.assertEqual(self.engine.get_batch_stats()['search'].full_batches, 0)
+
+    def test_shutdown_flushes_queued_calls(self):
+        future = self.engine._submit(self.engine._get_entry('search'), {'query': 'b'})
+        self.engine.shutdown()
+        self.assertEqual(future.result(timeout=0), 'B')
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            self.engine.add_functions([search], batch_functions={'search': search_batch}, max_batch_size=0)
+        with self.assertRaises(TypeError):
+            self.engine.add_functions([search], batch_functions={'search': async_search_batch}, max_batch_size=2)
+
+class TestAsyncEngineMicroBatching(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_plans_are_batched(self):
+        batches.clear()
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([search], batch_functions={'search': search_batch}, max_batch_size=3, max_batch_wait=1)
+        sessions = [engine.create_session() for _ in range(3)]
+        results = await asyncio.gather(*(
+            session.call_function(FunctionCall(name='search', parameters={'query': f'q{i}'}))
+            for i, session in enumerate(sessions)
+        ))
+        self.assertEqual(results, ['Q0', 'Q1', 'Q2'])
+        self.assertEqual(batches, [3])
+        engine.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall, PlanReport
+
+calls = []
+
+def search(query: str, limit: int = 3) -> list:
+    calls.append(('search', query))
+    return [f'{query} {i}' for i in range(limit)]
+
+def count(items: list) -> int:
+    calls.append(('count', len(items)))
+    return len(items)
+
+def log(message: str) -> str:
+    calls.append(('log', message))
+    return message
+
+def search_call(query: str, returns: str = None, limit: int = 3) -> FunctionCall:
+    return FunctionCall(
+        name='search',
+        parameters={'query': query, 'limit': limit},
+        returns=[{'name': returns, 'type': 'list'}] if returns else None
+    )
+
+def count_call(items: str, returns: str = None) -> FunctionCall:
+    return FunctionCall(
+        name='count',
+        parameters={'items': items},
+        returns=[{'name': returns, 'type': 'int'}] if returns else None
+    )
+
+class TestOptimizer(unittest.TestCase):
+    def setUp(self):
+        calls.clear()
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([search, count], pure=True)
+        self.engine.add_functions([log])
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def test_duplicates_reuse_the_output(self):
+        plan = [
+            search_call('a', 'first'),
+            search_call('b'),
+            search_call('a', 'second'),
+            count_call('first', 'n'),
+            count_call('second')
+        ]
+        report = self.engine.optimize_function_calls(plan)
+        self.assertEqual(report.duplicates, {2: 0, 4: 3})
+        self.assertEqual(report.pruned, ())
+        for parallel in (False, True):
+            calls.clear()
+            results = self.engine.call_functions(plan, parallel=parallel, optimization=report)
+            self.assertEqual(results, [['a 0', 'a 1', 'a 2'], ['b 0', 'b 1', 'b 2'], ['a 0', 'a 1', 'a 2'], 3, 3])
+            self.assertEqual(sorted(calls), [('count', 3), ('search', 'a'), ('search', 'b')])
+            self.assertIs(self.engine.outputs['second'], self.engine.outputs['first'])
+            self.assertEqual(self.engine.outputs['n'], 3)
+
+    def test_references_to_other_outputs_are_not_duplicates(self):
+        plan = [
+            search_call('a', 'items'),
+            count_call('items'),
+            search_call('b', 'items', limit=5),
+            count_call('items')
+        ]
+        report = self.engine.optimize_function_calls(plan)
+        self.assertEqual(report.duplicates, {})
+        self.assertEqual(self.engine.call_functions(plan, optimization=report)[3], 5)
+
+    def test_impure_calls_are_kept(self):
+        plan = [
+            FunctionCall(name='log', parameters={'message': 'hi'}),
+            FunctionCall(name='log', parameters={'message': 'hi'}),
+            search_call('unused'),
+            search_call('a', 'items'),
+            count_call('items')
+        ]
+        report = self.engine.optimize_function_calls(plan, prune=True)
+        self.assertEqual((report.duplicates, report.pruned), ({}, (2,)))
+        for parallel in (False, True):
+            calls.clear()
+            results = self.engine.call_functions(plan, parallel=parallel, optimization=report)
+            self.assertEqual(results, ['hi', 'hi', None, ['a 0', 'a 1', 'a 2'], 3])
+            self.assertEqual(calls, [('log', 'hi'), ('log', 'hi'), ('search', 'a'), ('count', 3)])
+
+    def test_prune_with_keep(self):
+        plan = [
+            search_call('a', 'items'),
+            count_call('items', 'n'),
+            search_call('b', 'other'),
+            search_call('a')
+        ]
+        report = self.engine.optimize_function_calls(plan, prune=True, keep=[1])
+        # The kept call keeps its producer, and a pruned duplicate is no longer a duplicate
+        self.assertEqual((report.duplicates, report.pruned), ({}, (2, 3)))
+        self.assertEqual(self.engine.call_functions(plan, optimization=report), [['a 0', 'a 1', 'a 2'], 3, None, None])
+        self.assertNotIn('other', self.engine.outputs)
+
+        report = self.engine.optimize_function_calls(plan, prune=True)
+        self.assertEqual((report.duplicates, report.pruned), ({3: 0}, (1, 2)))
+
+    def test_report(self):
+        plan = [search_call('a'), search_call('a'), search_call('b')]
+        report = self.engine.optimize_function_calls(plan, prune=True, keep=[1])
+        self.assertEqual(report[:3], (('search', 'search', 'search'), {1: 0}, (2,)))
+        self.assertIsInstance(report, PlanReport)
+        self.assertEqual(report.eliminated, 2)
+        self.assertEqual(report.summary().splitlines(), [
+            '2 of 3 calls eliminated',
+            'call 1 to search() reuses the output of call 0',
+            'call 2 to search() is pruned, its output is unused'
+        ])
+
+    def test_report_of_another_plan(self):
+        report = self.engine.optimize_function_calls([search_call('a'), search_call('a')])
+        with self.assertRaises(ValueError):
+            self.engine.call_functions([search_call('a'), count_call('x')], optimization=report)
+        self.assertEqual(calls, [])
+
+    def test_report_of_a_plan_with_other_parameters(self):
+        report = self.engine.optimize_function_calls([search_call('a', 'x'), search_call('a', 'y')])
+        for plan in (
+            [search_call('a', 'x'), search_call('b', 'y')],
+            [search_call('a', 'x'), search_call('a', 'y', limit=5)],
+            [search_call('a', 'x'), search_call('a', 'z')]
+        ):
+            with self.assertRaises(ValueError):
+                self.engine.call_functions(plan, optimization=report)
+        self.assertEqual(calls, [])
+        # Equal parameters in another order are the same plan
+        plan = [search_call('a', 'x'), FunctionCall(name='search', parameters={'limit': 3, 'query': 'a'}, returns=[{'name': 'y', 'type': 'list'}])]
+        self.assertEqual(self.engine.call_functions(plan, optimization=report), [['a 0', 'a 1', 'a 2']] * 2)
+        self.assertEqual(calls, [('search', 'a')])
+
+    def test_sessions(self):
+        session = self.engine.create_session()
+        plan = [search_call('a', 'x'), search_call('a', 'y')]
+        report = self.engine.optimize_function_calls(plan)
+        self.assertEqual(session.call_functions(plan, optimization=report), [['a 0', 'a 1', 'a 2']] * 2)
+        self.assertEqual(sorted(session.outputs), ['x', 'y'])
+        self.assertEqual(calls, [('search', 'a')])
+
+class TestAsyncOptimizer(unittest.IsolatedAsyncioTestCase):
+    async def test_duplicates_and_pruned_calls(self):
+        calls.clear()
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([search, count], pure=True)
+        plan = [search_call('a', 'x'), search_call('b'), search_call('a', 'y'), count_call('y')]
+        report = engine.optimize_function_calls(plan, prune=True)
+        self.assertEqual((report.duplicates, report.pruned), ({2: 0}, (1,)))
+        results = await engine.call_functions(plan, optimization=report)
+        self.assertEqual(results, [['a 0', 'a 1', 'a 2'], None, ['a 0', 'a 1', 'a 2'], 3])
+        self.assertEqual(calls, [('search', 'a'), ('count', 3)])
+        self.assertEqual(engine.outputs['y'], ['a 0', 'a 1', 'a 2'])
+
+if __name__ == '__main__':
+    unittest.main()
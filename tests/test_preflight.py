@@ -0,0 +1,116 @@
+import unittest
+import pickle
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall, PlanError, PlanValidationError
+
+calls = []
+
+def search(query: str, limit: int = 10) -> list:
+    calls.append(query)
+    return [f'{query} {i}' for i in range(limit)]
+
+def echo(value: object) -> object:
+    return value
+
+def untyped(*args, **kwargs) -> dict:
+    return kwargs
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self):
+        calls.clear()
+        self.engine = FunctionCallingEngine(reference_mode="explicit")
+        self.engine.add_functions([search, echo, untyped])
+
+    def test_errors_are_reported_before_any_call(self):
+        plan = [
+            FunctionCall(name='search', parameters={'query': 'a'}, returns=[{'name': 'results', 'type': 'list'}]),
+            FunctionCall(name='echo', parameters={'value': {'$ref': 'results[0]'}}),
+            FunctionCall(name='search', parameters={'limit': 2, 'page': 1}),
+            FunctionCall(name='delete_everything', parameters={}),
+            FunctionCall(name='echo', parameters={'value': {'$ref': 'later'}}),
+            FunctionCall(name='echo', parameters={'value': {'$ref': 'missing.name'}}),
+            FunctionCall(name='echo', parameters={'value': {'$ref': 'results[x'}}),
+            FunctionCall(name='search', parameters={'query': 'b'}, returns=[{'name': 'later', 'type': 'list'}])
+        ]
+        for parallel in (False, True):
+            with self.assertRaises(PlanValidationError) as context:
+                self.engine.call_functions(plan, parallel=parallel)
+            self.assertEqual(calls, [])
+        errors = context.exception.errors
+        self.assertEqual([(error.index, error.name) for error in errors], [
+            (2, 'search'), (2, 'search'), (3, 'delete_everything'), (4, 'echo'), (5, 'echo'), (6, 'echo')
+        ])
+        self.assertIn('missing required argument(s): query', errors[0].message)
+        self.assertIn('unexpected argument(s): page', errors[1].message)
+        self.assertIn('returned by call 7', errors[3].message)
+        # Handlers of the errors raised without the check still catch it
+        for error_type in (ValueError, KeyError, TypeError):
+            self.assertIsInstance(context.exception, error_type)
+        self.assertEqual(pickle.loads(pickle.dumps(context.exception)).errors, errors)
+        self.assertEqual(self.engine.validate_function_calls(plan), errors)
+
+    def test_valid_plans(self):
+        self.engine.outputs['stored'] = 'value'
+        plan = [
+            FunctionCall(name='search', parameters={'query': 'a', 'limit': 1}, returns=[{'name': 'results', 'type': 'list'}]),
+            FunctionCall(name='echo', parameters={'value': {'$ref': 'results[0]'}}),
+            FunctionCall(name='echo', parameters={'value': {'$ref': 'stored'}}),
+            FunctionCall(name='untyped', parameters={'anything': 1})
+        ]
+        self.assertEqual(self.engine.validate_function_calls(plan), [])
+        self.assertEqual(self.engine.call_functions(plan), [['a 0'], 'a 0', 'value', {'anything': 1}])
+
+    def test_session_outputs(self):
+        session = self.engine.create_session()
+        session.outputs['user'] = {'name': 'Alice'}
+        plan = [FunctionCall(name='echo', parameters={'value': {'$ref': 'user.name'}})]
+        self.assertEqual(session.call_functions(plan), ['Alice'])
+        with self.assertRaises(PlanValidationError):
+            self.engine.call_functions(plan)
+
+    def test_disabled(self):
+        engine = FunctionCallingEngine(preflight=False)
+        engine.add_functions([search])
+        with self.assertRaises(KeyError):
+            engine.call_functions([
+                FunctionCall(name='search', parameters={'query': 'a'}),
+                FunctionCall(name='missing', parameters={})
+            ])
+        self.assertEqual(calls, ['a'])
+
+    def test_implicit_references_are_not_checked(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions([search, echo])
+        plan = [
+            FunctionCall(name='echo', parameters={'value': 'later'}),
+            FunctionCall(name='search', parameters={'query': 'b'}, returns=[{'name': 'later', 'type': 'list'}])
+        ]
+        self.assertEqual(engine.validate_function_calls(plan), [])
+        self.assertEqual(engine.call_functions(plan)[0], 'later')
+        with self.assertRaises(KeyError):
+            engine.call_functions([FunctionCall(name='missing', parameters={})])
+
+    def test_unknown_function_message(self):
+        with self.assertRaisesRegex(KeyError, 'missing'):
+            self.engine.call_function(FunctionCall(name='missing', parameters={}))
+
+    def test_error_message(self):
+        error = PlanValidationError([PlanError(1, 'search', 'unknown function')])
+        self.assertEqual(str(error), 'Invalid plan, 1 error(s): call 1 to search(): unknown function')
+
+class TestAsyncPreflight(unittest.IsolatedAsyncioTestCase):
+    async def test_errors_are_reported_before_any_call(self):
+        calls.clear()
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([search])
+        with self.assertRaises(PlanValidationError):
+            await engine.parse_and_call_functions([
+                {'name': 'search', 'parameters': {'query': 'a'}},
+                {'name': 'search', 'parameters': {}}
+            ])
+        with self.assertRaises(PlanValidationError):
+            engine.iter_call_functions([FunctionCall(name='missing', parameters={})])
+        self.assertEqual(calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
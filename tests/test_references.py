@@ -0,0 +1,135 @@
+import unittest
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.references import compile_references, parse_reference_path, resolve_references
+
+class User(BaseModel):
+    name: str
+    tags: list[str]
+
+def get_user() -> User:
+    return User(name='Alice', tags=['admin', 'beta'])
+
+def search(query: str) -> list:
+    return [{'id': 1, 'title': f'{query} 1'}, {'id': 2, 'title': f'{query} 2'}]
+
+def echo(value: object) -> object:
+    return value
+
+class TestParseReferencePath(unittest.TestCase):
+    def test_paths(self):
+        self.assertEqual(parse_reference_path('user'), ('user', ()))
+        self.assertEqual(parse_reference_path('user.name'), ('user', ('name',)))
+        self.assertEqual(parse_reference_path('results[0].title'), ('results', (0, 'title')))
+        self.assertEqual(parse_reference_path('results[-1]'), ('results', (-1,)))
+        self.assertEqual(parse_reference_path('scores["a.b"]'), ('scores', ('a.b',)))
+
+    def test_invalid(self):
+        for path in ('', '.name', 'results[x]', 'results[0'):
+            with self.assertRaises(ValueError):
+                parse_reference_path(path)
+
+class TestCompileReferences(unittest.TestCase):
+    def test_explicit(self):
+        parameters = {
+            'query': 'user',
+            'filters': {'owner': {'$ref': 'user.name'}, 'ids': [1, {'$ref': 'results[0].id'}]},
+            'limit': 10
+        }
+        references = compile_references(parameters, explicit=True)
+        self.assertEqual([reference.location for reference in references], [('filters', 'owner'), ('filters', 'ids', 1)])
+        self.assertEqual([reference.name for reference in references], ['user', 'results'])
+
+    def test_implicit(self):
+        references = compile_references({'a': 'x', 'b': {'$ref': 'y'}, 'c': 1})
+        self.assertEqual([(reference.location, reference.implicit) for reference in references], [(('a',), True)])
+
+    def test_resolution_copies_only_paths(self):
+        shared = [1, 2, 3]
+        parameters = {'filters': {'owner': {'$ref': 'user'}, 'other': {'x': 1}}, 'items': shared}
+        resolved = resolve_references(parameters, compile_references(parameters, explicit=True), {'user': 'Alice'})
+        self.assertEqual(resolved['filters']['owner'], 'Alice')
+        self.assertEqual(parameters['filters']['owner'], {'$ref': 'user'})
+        self.assertIs(resolved['items'], shared)
+        self.assertIs(resolved['filters']['other'], parameters['filters']['other'])
+
+class TestExplicitReferences(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine(reference_mode='explicit')
+        self.engine.add_functions([get_user, search, echo])
+
+    def test_nested_and_attribute_access(self):
+        results = self.engine.parse_and_call_functions([
+            {'name': 'get_user', 'parameters': {}, 'returns': [{'name': 'user', 'type': 'User'}]},
+            {'name': 'search', 'parameters': {'query': 'shirts'}, 'returns': [{'name': 'results', 'type': 'list'}]},
+            {'name': 'echo', 'parameters': {'value': {
+                'owner': {'$ref': 'user.name'},
+                'first_tag': {'$ref': 'user.tags[0]'},
+                'titles': [{'$ref': 'results[0].title'}, {'$ref': 'results[-1]["title"]'}]
+            }}}
+        ])
+        self.assertEqual(results[2], {'owner': 'Alice', 'first_tag': 'admin', 'titles': ['shirts 1', 'shirts 2']})
+
+    def test_literal_strings(self):
+        self.engine.parse_and_call_functions({'name': 'search', 'parameters': {'query': 'a'}, 'returns': [{'name': 'results', 'type': 'list'}]})
+        self.assertEqual(self.engine.call_function(FunctionCall(name='echo', parameters={'value': 'results'})), 'results')
+
+    def test_parameters_not_modified(self):
+        self.engine.call_function(FunctionCall(name='get_user', parameters={}, returns=[{'name': 'user', 'type': 'User'}]))
+        function_call = FunctionCall(name='echo', parameters={'value': {'$ref': 'user.name'}})
+        self.assertEqual(self.engine.call_function(function_call), 'Alice')
+        self.assertEqual(function_call.parameters, {'value': {'$ref': 'user.name'}})
+
+    def test_missing_reference(self):
+        with self.assertRaises(KeyError):
+            self.engine.call_function(FunctionCall(name='echo', parameters={'value': {'$ref': 'missing'}}))
+        self.engine.call_function(FunctionCall(name='get_user', parameters={}, returns=[{'name': 'user', 'type': 'User'}]))
+        with self.assertRaises(KeyError):
+            self.engine.call_function(FunctionCall(name='echo', parameters={'value': {'$ref': 'user.email'}}))
+
+    def test_private_attributes(self):
+        self.engine.call_function(FunctionCall(name='get_user', parameters={}, returns=[{'name': 'user', 'type': 'User'}]))
+        self.engine.outputs['scores'] = {'_hidden': 1}
+        for path in ('user.__class__.__init__.__globals__', 'user._private', 'user.name.__class__'):
+            with self.assertRaisesRegex(KeyError, 'not found'):
+                self.engine.call_function(FunctionCall(name='echo', parameters={'value': {'$ref': path}}))
+        # Keys of mappings are not attributes
+        self.assertEqual(self.engine.call_function(FunctionCall(name='echo', parameters={'value': {'$ref': 'scores._hidden'}})), 1)
+
+    def test_parallel_dependencies(self):
+        results = self.engine.parse_and_call_functions([
+            {'name': 'search', 'parameters': {'query': 'a'}, 'returns': [{'name': 'results', 'type': 'list'}]},
+            {'name': 'echo', 'parameters': {'value': [{'$ref': 'results[1].id'}]}}
+        ], parallel=True)
+        self.assertEqual(results[1], [2])
+        self.engine.shutdown()
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            FunctionCallingEngine(reference_mode='magic')
+
+class TestImplicitReferences(unittest.TestCase):
+    def test_compatibility(self):
+        engine = FunctionCallingEngine()
+        engine.add_functions([search, echo])
+        engine.parse_and_call_functions({'name': 'search', 'parameters': {'query': 'a'}, 'returns': [{'name': 'results', 'type': 'list'}]})
+        function_call = FunctionCall(name='echo', parameters={'value': 'results'})
+        self.assertEqual(engine.call_function(function_call), search('a'))
+        self.assertEqual(function_call.parameters, {'value': 'results'})
+        self.assertEqual(engine.call_function(FunctionCall(name='echo', parameters={'value': {'$ref': 'results'}})), {'$ref': 'results'})
+
+class TestAsyncReferences(unittest.IsolatedAsyncioTestCase):
+    async def test_explicit(self):
+        engine = AsyncFunctionCallingEngine(reference_mode='explicit')
+        engine.add_functions([search, echo])
+        results = await engine.parse_and_call_functions([
+            {'name': 'search', 'parameters': {'query': 'a'}, 'returns': [{'name': 'results', 'type': 'list'}]},
+            {'name': 'echo', 'parameters': {'value': {'$ref': 'results[0].id'}}}
+        ])
+        self.assertEqual(results[1], 1)
+        engine.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import tempfile
+import shutil
+import json
+import os
+from typing import Optional
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine
+from tiny_fnc_engine.loader import scan_source
+from tiny_fnc_engine.schema import build_tool_schema, build_tool_schema_from_info, parse_docstring
+
+class Location(BaseModel):
+    city: str
+    country: str
+
+def get_weather(location: Location, unit: str = "C", days: Optional[int] = None) -> str:
+    """
+    Get the weather forecast
+    of a location.
+
+    location: Location
+        The location of the forecast.
+    unit: str
+        The temperature unit,
+        "C" or "F".
+
+    Raises:
+        ValueError: If the unit is invalid.
+    """
+    return f"Sunny in {location.city}"
+
+def search(query: str, *, limit: int = 10, **filters) -> list:
+    """Search for items.
+
+    Args:
+        query (str): The search query.
+        limit: The maximum number
+            of results.
+    """
+    return []
+
+def undocumented(a, b=1):
+    return a
+
+class TestParseDocstring(unittest.TestCase):
+    def test_repo_style(self):
+        description, parameters = parse_docstring(get_weather.__doc__, {'location', 'unit', 'days'})
+        self.assertEqual(description, 'Get the weather forecast of a location.')
+        self.assertEqual(parameters, {
+            'location': 'The location of the forecast.',
+            'unit': 'The temperature unit, "C" or "F".'
+        })
+
+    def test_google_style(self):
+        description, parameters = parse_docstring(search.__doc__, {'query', 'limit'})
+        self.assertEqual(description, 'Search for items.')
+        self.assertEqual(parameters, {'query': 'The search query.', 'limit': 'The maximum number of results.'})
+
+    def test_rest_style(self):
+        description, parameters = parse_docstring('Add numbers.\n\n:param a: The first number.\n:param b: The second.', {'a', 'b'})
+        self.assertEqual(description, 'Add numbers.')
+        self.assertEqual(parameters, {'a': 'The first number.', 'b': 'The second.'})
+
+class TestBuildToolSchema(unittest.TestCase):
+    def test_schema(self):
+        tool = build_tool_schema('get_weather', get_weather)
+        self.assertEqual(tool['type'], 'function')
+        function = tool['function']
+        self.assertEqual(function['name'], 'get_weather')
+        self.assertEqual(function['description'], 'Get the weather forecast of a location.')
+        parameters = function['parameters']
+        self.assertEqual(parameters['type'], 'object')
+        self.assertEqual(parameters['required'], ['location'])
+        self.assertEqual(parameters['properties']['unit'], {
+            'type': 'string',
+            'default': 'C',
+            'description': 'The temperature unit, "C" or "F".'
+        })
+        self.assertEqual(parameters['$defs']['Location']['required'], ['city', 'country'])
+        self.assertNotIn('title', parameters)
+        self.assertNotIn('title', parameters['properties']['unit'])
+
+    def test_keyword_only_and_var_keyword(self):
+        parameters = build_tool_schema('search', search)['function']['parameters']
+        self.assertEqual(list(parameters['properties']), ['query', 'limit'])
+        self.assertEqual(parameters['properties']['limit']['type'], 'integer')
+
+    def test_unannotated(self):
+        tool = build_tool_schema('undocumented', undocumented)
+        self.assertNotIn('description', tool['function'])
+        self.assertEqual(tool['function']['parameters']['required'], ['a'])
+
+    def test_from_info(self):
+        info, = scan_source('def f(name: str, tags: list[str], limit: Optional[int] = None, unit: Unit = "C"):\n    """Find things.\n\n    name: str\n        The name.\n    """')
+        parameters = build_tool_schema_from_info(info)['function']['parameters']
+        self.assertEqual(parameters['properties'], {
+            'name': {'type': 'string', 'description': 'The name.'},
+            'tags': {'type': 'array'},
+            'limit': {'type': 'integer'},
+            'unit': {}
+        })
+        self.assertEqual(parameters['required'], ['name', 'tags'])
+
+class TestEngineTools(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([get_weather, search, undocumented])
+
+    def test_precomputed(self):
+        entry = self.engine._get_entry('get_weather')
+        self.assertIsNotNone(entry.tool)
+        self.assertIs(self.engine.get_tools(['get_weather'])[0], entry.tool[0])
+
+    def test_get_tools(self):
+        tools = self.engine.get_tools()
+        self.assertEqual([tool['function']['name'] for tool in tools], ['get_weather', 'search', 'undocumented'])
+        self.assertEqual(json.loads(self.engine.get_tools_json()), tools)
+
+    def test_subset(self):
+        self.assertEqual(json.loads(self.engine.get_tools_json(['search'])), self.engine.get_tools(['search']))
+        self.assertEqual(self.engine.get_tools_json([]), b'[]')
+        with self.assertRaises(KeyError):
+            self.engine.get_tools(['missing'])
+
+    def test_invalidation(self):
+        search_tool = self.engine.get_tools(['search'])[0]
+
+        def get_weather(city: str) -> str:
+            return city
+
+        self.engine.add_functions([get_weather])
+        self.assertEqual(list(self.engine.get_tools(['get_weather'])[0]['function']['parameters']['properties']), ['city'])
+        self.assertIs(self.engine.get_tools(['search'])[0], search_tool)
+
+    def test_lazy_functions(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, 'tools.py'), 'w') as file:
+                file.write('import json\n\ndef count(items: list, limit: int = 10) -> int:\n    """Count items."""\n    return len(items)\n')
+            engine = FunctionCallingEngine()
+            engine.add_functions_from_directory(directory)
+            tool, = engine.get_tools()
+            self.assertEqual(tool['function']['description'], 'Count items.')
+            self.assertIsNone(engine.functions['count']._function)
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.sessions import Session, AsyncSession
+
+def helper_function(a: int, b: int) -> int:
+    return a + b
+
+def chained_calls(a: int) -> list[dict]:
+    return [
+        {'name': 'helper_function', 'parameters': {'a': a, 'b': 1}, 'returns': [{'name': 'sum', 'type': 'int'}]},
+        {'name': 'helper_function', 'parameters': {'a': 'sum', 'b': 1}, 'returns': [{'name': 'final_result', 'type': 'int'}]}
+    ]
+
+class TestSessions(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([helper_function])
+
+    def test_sessions_have_isolated_outputs(self):
+        first = self.engine.create_session()
+        second = self.engine.create_session()
+        self.assertIsInstance(first, Session)
+
+        self.assertEqual(first.parse_and_call_functions(chained_calls(1)), [2, 3])
+        self.assertEqual(second.parse_and_call_functions(chained_calls(10)), [11, 12])
+        self.assertEqual(first.outputs['final_result'], 3)
+        self.assertEqual(second.outputs['final_result'], 12)
+        self.assertEqual(self.engine.outputs, {})
+
+    def test_sessions_share_registry(self):
+        session = self.engine.create_session('user-1')
+
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        self.engine.add_functions([multiply])
+        result = session.parse_and_call_functions({'name': 'multiply', 'parameters': {'a': 3, 'b': 4}})
+        self.assertEqual(result, [12])
+
+    def test_functions_set_directly_get_one_entry(self):
+        def multiply(a: int, b: int) -> int:
+            return a * b
+
+        def negate(a: int) -> int:
+            return -a
+
+        self.engine.functions = {**self.engine.functions, 'multiply': multiply}
+        barrier = threading.Barrier(8)
+
+        def lookup(index: int):
+            barrier.wait()
+            if index == 0:
+                self.engine.add_functions([negate])
+            return self.engine._get_entry('multiply')
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            entries = list(executor.map(lookup, range(8)))
+        self.assertEqual(len(set(map(id, entries))), 1)
+        self.assertIs(self.engine._registry['multiply'], entries[0])
+        self.assertIn('negate', self.engine._registry)
+        self.assertEqual(self.engine.call_function(FunctionCall(name='negate', parameters={'a': 2})), -2)
+
+    def test_get_and_close_session(self):
+        session = self.engine.create_session('user-1')
+        self.assertIs(self.engine.get_session('user-1'), session)
+        with self.assertRaises(ValueError):
+            self.engine.create_session('user-1')
+
+        self.engine.close_session('user-1')
+        with self.assertRaises(KeyError):
+            self.engine.get_session('user-1')
+
+    def test_expire_sessions(self):
+        self.engine.create_session('short', ttl=0.05)
+        self.engine.create_session('long', ttl=60)
+        self.engine.create_session('forever')
+        time.sleep(0.1)
+
+        self.assertEqual(self.engine.expire_sessions(), 1)
+        self.assertEqual(set(self.engine.sessions), {'long', 'forever'})
+
+    def test_concurrent_sessions(self):
+        def run(a: int) -> list:
+            session = self.engine.create_session()
+            try:
+                return session.parse_and_call_functions(chained_calls(a))
+            finally:
+                self.engine.close_session(session.session_id)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(run, range(200)))
+        self.assertEqual(results, [[a + 1, a + 2] for a in range(200)])
+        self.assertEqual(self.engine.sessions, {})
+
+class TestAsyncSessions(unittest.IsolatedAsyncioTestCase):
+    async def test_async_session(self):
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([helper_function])
+        session = engine.create_session()
+        self.assertIsInstance(session, AsyncSession)
+
+        results = await session.parse_and_call_functions(chained_calls(1))
+        engine.shutdown()
+        self.assertEqual(results, [2, 3])
+        self.assertEqual(session.outputs['final_result'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+import pickle
+from multiprocessing import shared_memory
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.shared import SharedMemoryOutputStore, SharedOutput, get_handle, share, to_handles
+
+class Array:
+    """
+    Minimal array pickling its data as an out-of-band buffer, like NumPy arrays.
+    """
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce_ex__(self, protocol):
+        if protocol >= 5:
+            return Array, (pickle.PickleBuffer(self.data),)
+        return Array, (bytes(self.data),)
+
+def make_bytes(size: int) -> bytes:
+    return bytes(range(256)) * (size // 256)
+
+def make_array(size: int) -> Array:
+    return Array(bytearray(b'x' * size))
+
+def checksum(data: object) -> int:
+    return sum(memoryview(data.data if isinstance(data, Array) else data)[:1024])
+
+def segment_exists(name: str) -> bool:
+    try:
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return False
+    segment.close()
+    return True
+
+class TestSharedOutput(unittest.TestCase):
+    def test_roundtrip(self):
+        value = make_bytes(4096)
+        handle = SharedOutput.create(value, min_size=1024)
+        self.assertEqual(handle.nbytes, 4096)
+        self.assertLess(len(pickle.dumps(handle)), 1024)
+        self.assertEqual(pickle.loads(pickle.dumps(handle)).load(), value)
+        handle.unlink()
+        self.assertFalse(segment_exists(handle.segments[0][0]))
+
+    def test_array_is_not_copied(self):
+        handle = SharedOutput.create(make_array(4096), min_size=1024)
+        loaded = handle.load()
+        self.assertIsInstance(loaded.data, memoryview)
+        self.assertEqual(bytes(loaded.data[:3]), b'xxx')
+        del loaded
+        handle.unlink()
+
+    def test_min_size(self):
+        self.assertIsNone(SharedOutput.create(make_bytes(512), min_size=1024))
+        self.assertIsNone(SharedOutput.create({'a': 1}, min_size=1024))
+
+class TestSharedMemoryOutputStore(unittest.TestCase):
+    def test_small_and_unpicklable_outputs(self):
+        store = SharedMemoryOutputStore(min_size=1024)
+        store['small'] = b'abc'
+        store['function'] = lambda: None
+        self.assertEqual(store['small'], b'abc')
+        self.assertIsNone(store.handle('small'))
+        self.assertIsNone(store.handle('function'))
+        self.assertEqual(store.shared_bytes, 0)
+
+    def test_reference_counting(self):
+        first, second = SharedMemoryOutputStore(min_size=1024), SharedMemoryOutputStore(min_size=1024)
+        first['data'] = make_bytes(4096)
+        value = first['data']
+        handle = first.handle('data')
+        second['copy'] = value
+        self.assertIs(second.handle('copy'), handle)
+        self.assertEqual(first.shared_bytes, 4096)
+
+        first.close()
+        self.assertEqual(len(first), 0)
+        self.assertTrue(segment_exists(handle.segments[0][0]))
+        del second['copy']
+        self.assertFalse(segment_exists(handle.segments[0][0]))
+        self.assertIsNone(get_handle(value))
+
+    def test_overwrite(self):
+        store = SharedMemoryOutputStore(min_size=1024)
+        store['data'] = make_bytes(4096)
+        handle = store.handle('data')
+        store['data'] = 'small'
+        self.assertFalse(segment_exists(handle.segments[0][0]))
+        self.assertEqual(dict(store), {'data': 'small'})
+
+    def test_set_again_under_the_same_name(self):
+        store = SharedMemoryOutputStore(min_size=1024)
+        store['data'] = make_bytes(4096)
+        handle = store.handle('data')
+        store['data'] = store['data']
+        self.assertIs(store.handle('data'), handle)
+        self.assertTrue(segment_exists(handle.segments[0][0]))
+        self.assertIs(get_handle(store['data']), handle)
+        store.close()
+        self.assertFalse(segment_exists(handle.segments[0][0]))
+
+    def test_to_handles(self):
+        store = SharedMemoryOutputStore(min_size=1024)
+        store['data'] = make_bytes(4096)
+        parameters = {'data': store['data'], 'n': 1}
+        handles = to_handles(parameters)
+        self.assertIs(handles['data'], store.handle('data'))
+        self.assertEqual(handles['n'], 1)
+        store.close()
+        self.assertIs(to_handles(parameters), parameters)
+
+    def test_garbage_collected_values(self):
+        value = share(make_array(4096), min_size=1024)
+        handle = get_handle(value)
+        self.assertTrue(segment_exists(handle.segments[0][0]))
+        del value
+        self.assertFalse(segment_exists(handle.segments[0][0]))
+
+class TestSharedMemoryEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine(max_processes=1, shared_memory_min_size=1024)
+        self.engine.add_functions([make_bytes, make_array, checksum], executor='process')
+
+    def tearDown(self):
+        self.engine.reset_session()
+        self.engine.shutdown()
+
+    def test_outputs_passed_by_handle(self):
+        results = self.engine.call_functions([
+            FunctionCall(name='make_array', parameters={'size': 4096}, returns=[{'name': 'array', 'type': 'Array'}]),
+            FunctionCall(name='checksum', parameters={'data': 'array'}),
+            FunctionCall(name='make_bytes', parameters={'size': 4096}, returns=[{'name': 'data', 'type': 'bytes'}]),
+            FunctionCall(name='checksum', parameters={'data': 'data'})
+        ])
+        self.assertEqual(results[1], ord('x') * 1024)
+        self.assertEqual(results[3], checksum(make_bytes(4096)))
+        self.assertIsInstance(self.engine.outputs, SharedMemoryOutputStore)
+        self.assertEqual(self.engine.outputs.shared_bytes, 8192)
+
+        names = [self.engine.outputs.handle(name).segments[0][0] for name in ('array', 'data')]
+        self.engine.reset_session()
+        del results
+        for name in names:
+            self.assertFalse(segment_exists(name))
+
+    def test_unstored_outputs(self):
+        output = self.engine.call_function(FunctionCall(name='make_bytes', parameters={'size': 4096}))
+        self.assertEqual(output, make_bytes(4096))
+        self.assertIsNone(get_handle(output))
+
+    def test_parallel(self):
+        results = self.engine.call_functions([
+            FunctionCall(name='make_bytes', parameters={'size': 2048}, returns=[{'name': 'a', 'type': 'bytes'}]),
+            FunctionCall(name='make_bytes', parameters={'size': 4096}, returns=[{'name': 'b', 'type': 'bytes'}]),
+            FunctionCall(name='checksum', parameters={'data': 'b'})
+        ], parallel=True)
+        self.assertEqual(results[2], checksum(make_bytes(4096)))
+        self.assertEqual(self.engine.outputs.shared_bytes, 6144)
+
+class TestAsyncSharedMemoryEngine(unittest.IsolatedAsyncioTestCase):
+    async def test_outputs_passed_by_handle(self):
+        engine = AsyncFunctionCallingEngine(max_processes=1, shared_memory_min_size=1024)
+        engine.add_functions([make_array, checksum], executor='process')
+        results = await engine.call_functions([
+            FunctionCall(name='make_array', parameters={'size': 4096}, returns=[{'name': 'array', 'type': 'Array'}]),
+            FunctionCall(name='checksum', parameters={'data': 'array'})
+        ])
+        self.assertEqual(results[1], ord('x') * 1024)
+        self.assertIsNotNone(engine.outputs.handle('array'))
+        engine.reset_session()
+        engine.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+from pydantic import BaseModel, Field, computed_field
+
+from tiny_fnc_engine import FunctionCallingEngine, FunctionCall
+from tiny_fnc_engine.stores import BoundedOutputStore
+from tiny_fnc_engine.snapshots import (
+    SnapshotStore,
+    _ModelOutput,
+    _encode_model,
+    decode_snapshot,
+    restore_outputs,
+    snapshot_outputs
+)
+
+class User(BaseModel):
+    name: str
+    tags: list[str]
+
+class Order(BaseModel):
+    items: list[int]
+
+    @computed_field
+    @property
+    def total(self) -> int:
+        return sum(self.items)
+
+class Secret(BaseModel):
+    name: str
+    token: str = Field(exclude=True)
+
+def get_user(name: str) -> User:
+    return User(name=name, tags=['admin'])
+
+def make_buffer(size: int) -> bytearray:
+    return bytearray(b'x' * size)
+
+class TestSnapshotEncoding(unittest.TestCase):
+    def test_roundtrip(self):
+        outputs = {
+            'user': User(name='Alice', tags=['a']),
+            'order': Order(items=[1, 2]),
+            'numbers': [1, 2.5, None],
+            'data': bytearray(b'y' * (128 * 1024))
+        }
+        for compress in (False, True):
+            data, _ = snapshot_outputs(outputs, compress=compress, session_id='s1')
+            snapshot = decode_snapshot(data)
+            self.assertEqual(snapshot.outputs, outputs)
+            self.assertEqual((snapshot.session_id, snapshot.base_id, snapshot.deleted), ('s1', None, ()))
+        self.assertLess(len(snapshot_outputs(outputs, compress=True)[0]), len(snapshot_outputs(outputs)[0]))
+
+    def test_model_fast_path(self):
+        self.assertIsInstance(_encode_model(User(name='Alice', tags=[])), _ModelOutput)
+        self.assertIsInstance(_encode_model(Order(items=[1])), _ModelOutput)
+        # Excluded fields are lost in JSON, so these models are pickled
+        secret = Secret(name='a', token='t')
+        self.assertIs(_encode_model(secret), secret)
+        data, _ = snapshot_outputs({'secret': secret})
+        self.assertEqual(decode_snapshot(data).outputs['secret'].token, 't')
+
+    def test_out_of_band_buffers_are_not_copied(self):
+        data, _ = snapshot_outputs({'data': bytearray(b'z' * (256 * 1024))})
+        self.assertLess(len(data), 256 * 1024 + 1024)
+        self.assertEqual(decode_snapshot(data).outputs['data'], bytearray(b'z' * (256 * 1024)))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            decode_snapshot(b'not a snapshot')
+        data, _ = snapshot_outputs({'a': 1})
+        with self.assertRaises(ValueError):
+            decode_snapshot(data[:-70])
+
+class TestIncrementalSnapshots(unittest.TestCase):
+    def test_delta(self):
+        outputs = {'a': 1, 'b': User(name='Bob', tags=[])}
+        full, checkpoint = snapshot_outputs(outputs)
+        outputs['c'] = 'new'
+        outputs['a'] = 2
+        del outputs['b']
+        delta, checkpoint = snapshot_outputs(outputs, checkpoint)
+        snapshot = decode_snapshot(delta)
+        self.assertEqual(snapshot.outputs, {'a': 2, 'c': 'new'})
+        self.assertEqual(snapshot.deleted, ('b',))
+
+        restored, restored_checkpoint, _ = restore_outputs([full, delta])
+        self.assertEqual(restored, {'a': 2, 'c': 'new'})
+        self.assertEqual(restored_checkpoint.snapshot_id, checkpoint.snapshot_id)
+
+    def test_checkpoint_does_not_keep_outputs(self):
+        user = User(name='Bob', tags=[])
+        items = [1, 2]
+        outputs = {'user': user, 'items': items, 'same': [3]}
+        references = sys.getrefcount(items)
+        _, checkpoint = snapshot_outputs(outputs)
+        self.assertEqual(sys.getrefcount(items), references)
+        outputs['user'] = User(name='Bob', tags=[])
+        outputs['items'] = [1, 2, 3]
+        del user
+        self.assertIsNone(checkpoint.tokens['user']())
+        delta, checkpoint = snapshot_outputs(outputs, checkpoint)
+        self.assertEqual(sorted(decode_snapshot(delta).outputs), ['items', 'user'])
+
+        # Lists are compared by content, so changes in place are found
+        outputs['same'].append(4)
+        delta, _ = snapshot_outputs(outputs, checkpoint)
+        self.assertEqual(decode_snapshot(delta).outputs, {'same': [3, 4]})
+
+    def test_spilled_outputs_stay_spilled(self):
+        store = BoundedOutputStore(max_bytes=3000)
+        self.addCleanup(store.close)
+        store['a'] = 'a' * 2000
+        store['b'] = 'b' * 2000
+        self.assertEqual(store.stats.spilled, 1)
+        full, checkpoint = snapshot_outputs(store)
+        self.assertEqual(decode_snapshot(full).outputs, {'a': 'a' * 2000, 'b': 'b' * 2000})
+        self.assertEqual((store.stats.spilled, store.stats.loads), (1, 0))
+        self.assertNotIn('a' * 2000, checkpoint.tokens.values())
+
+        # Loading a spilled output back does not change it
+        self.assertEqual(store['a'], 'a' * 2000)
+        store['c'] = 'c'
+        delta, checkpoint = snapshot_outputs(store, checkpoint)
+        self.assertEqual(decode_snapshot(delta).outputs, {'c': 'c'})
+        store['b'] = 'new'
+        delta, _ = snapshot_outputs(store, checkpoint)
+        self.assertEqual(decode_snapshot(delta).outputs, {'b': 'new'})
+
+        restored, _, _ = restore_outputs([full], BoundedOutputStore(max_bytes=3000))
+        self.assertEqual(dict(restored), {'a': 'a' * 2000, 'b': 'b' * 2000})
+        restored.close()
+
+    def test_chain_is_checked(self):
+        full, checkpoint = snapshot_outputs({'a': 1})
+        delta, _ = snapshot_outputs({'a': 2}, checkpoint)
+        other, _ = snapshot_outputs({'a': 3})
+        with self.assertRaises(ValueError):
+            restore_outputs([delta])
+        with self.assertRaises(ValueError):
+            restore_outputs([other, delta])
+        with self.assertRaises(ValueError):
+            restore_outputs([])
+
+class TestSessionSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([get_user, make_buffer])
+
+    def test_restore_session(self):
+        session = self.engine.create_session('s1')
+        session.call_function(FunctionCall(name='get_user', parameters={'name': 'Alice'}, returns=[{'name': 'user', 'type': 'User'}]))
+        full = session.snapshot()
+        session.call_function(FunctionCall(name='make_buffer', parameters={'size': 100}, returns=[{'name': 'buffer', 'type': 'bytearray'}]))
+        delta = session.snapshot(incremental=True)
+        self.assertEqual(decode_snapshot(delta).outputs, {'buffer': bytearray(b'x' * 100)})
+
+        other = FunctionCallingEngine()
+        other.add_functions([get_user])
+        restored = other.restore_session([full, delta])
+        self.assertEqual(restored.session_id, 's1')
+        self.assertEqual(restored.outputs['user'], User(name='Alice', tags=['admin']))
+        self.assertIs(other.get_session('s1'), restored)
+
+        restored.outputs['answer'] = 42
+        self.assertEqual(decode_snapshot(restored.snapshot(incremental=True)).outputs, {'answer': 42})
+        restored.reset()
+        self.assertIsNone(restored.checkpoint)
+
+    def test_restore_with_new_id(self):
+        session = self.engine.create_session('s1')
+        session.outputs['a'] = 1
+        restored = self.engine.restore_session(session.snapshot(), 's2')
+        self.assertEqual(dict(restored.outputs), {'a': 1})
+        with self.assertRaises(ValueError):
+            self.engine.restore_session(session.snapshot(), 's2')
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = FunctionCallingEngine()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_checkpoint_and_restore(self):
+        for compress in (False, True):
+            store = SnapshotStore(self.directory, compress=compress)
+            session = self.engine.create_session('s1')
+            session.outputs['data'] = bytearray(b'd' * (128 * 1024))
+            store.checkpoint(session)
+            session.outputs['user'] = User(name='Alice', tags=[])
+            store.checkpoint(session)
+            self.assertEqual(len(store.paths('s1')), 2)
+
+            other = FunctionCallingEngine()
+            read = store.read
+            snapshots = []
+            store.read = lambda session_id: snapshots.extend(read(session_id)) or snapshots
+            restored = store.restore(other, 's1')
+            del store.read
+            self.assertEqual(dict(restored.outputs), dict(session.outputs))
+            self.assertTrue(all(snapshot.closed for snapshot in snapshots))
+
+            store.checkpoint(session, full=True)
+            self.assertEqual(len(store.paths('s1')), 1)
+            store.remove('s1')
+            self.assertFalse(os.path.exists(os.path.join(self.directory, 's1')))
+            self.engine.close_session('s1')
+
+    def test_missing_and_invalid_sessions(self):
+        store = SnapshotStore(self.directory)
+        with self.assertRaises(KeyError):
+            store.restore(self.engine, 'missing')
+        with self.assertRaises(ValueError):
+            store.paths('../escape')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import os
+
+from pydantic import BaseModel
+
+from tiny_fnc_engine import FunctionCallingEngine
+from tiny_fnc_engine.stores import BoundedOutputStore, approximate_size
+
+class Document(BaseModel):
+    title: str
+    content: str
+
+def make_document(size: int) -> Document:
+    return Document(title=f"doc{size}", content="x" * size)
+
+def document_length(document: Document) -> int:
+    return len(document.content)
+
+class TestApproximateSize(unittest.TestCase):
+    def test_nested_values(self):
+        self.assertGreater(approximate_size({'a': 'x' * 1000}), 1000)
+        self.assertGreater(approximate_size([b'x' * 500, b'y' * 500]), 1000)
+        self.assertGreater(approximate_size(make_document(2000)), 2000)
+
+class TestBoundedOutputStore(unittest.TestCase):
+    def test_spill_and_load(self):
+        store = BoundedOutputStore(max_bytes=3000)
+        store['a'] = 'a' * 2000
+        store['b'] = 'b' * 2000
+        self.assertEqual(store.stats.spilled, 1)
+        self.assertIn('a', store)
+        self.assertEqual(len(store), 2)
+
+        self.assertEqual(store['a'], 'a' * 2000)
+        self.assertEqual(store.stats.loads, 1)
+        self.assertEqual(store.stats.resident, 1)
+        self.assertLessEqual(store.stats.resident_bytes, 3000)
+        store.close()
+
+    def test_evict_without_spill(self):
+        store = BoundedOutputStore(max_bytes=3000, spill=False)
+        store['a'] = 'a' * 2000
+        store['b'] = 'b' * 2000
+        self.assertEqual(list(store), ['b'])
+        self.assertEqual(store.stats.evictions, 1)
+
+        # Dropped names stay known, so that referencing them fails loudly
+        self.assertIn('a', store)
+        with self.assertRaisesRegex(KeyError, 'dropped'):
+            store['a']
+        with self.assertRaisesRegex(KeyError, 'dropped'):
+            store.peek('a')
+        with self.assertRaises(KeyError):
+            store.version('a')
+        store['a'] = 'new'
+        self.assertEqual(store['a'], 'new')
+        store['c'] = 'c' * 2000
+        del store['b']
+        self.assertNotIn('b', store)
+
+    def test_peek_and_version(self):
+        store = BoundedOutputStore(max_bytes=3000)
+        store['a'] = 'a' * 2000
+        version = store.version('a')
+        store['b'] = 'b' * 2000
+        self.assertEqual(store.peek('a'), 'a' * 2000)
+        self.assertEqual((store.stats.spilled, store.stats.loads), (1, 0))
+        self.assertEqual(store['a'], 'a' * 2000)
+        self.assertEqual(store.version('a'), version)
+        store['a'] = 'new'
+        self.assertNotEqual(store.version('a'), version)
+        del store['a']
+        with self.assertRaises(KeyError):
+            store.version('a')
+        with self.assertRaises(KeyError):
+            store.peek('a')
+        store.close()
+
+    def test_close_removes_files(self):
+        store = BoundedOutputStore(max_bytes=100)
+        store['a'] = 'a' * 2000
+        directory = store._directory
+        self.assertTrue(os.listdir(directory))
+        store.close()
+        self.assertFalse(os.path.exists(directory))
+
+class TestEngineOutputStore(unittest.TestCase):
+    def test_spilled_outputs_are_referenced(self):
+        engine = FunctionCallingEngine(output_store=lambda: BoundedOutputStore(max_bytes=10_000))
+        engine.add_functions([make_document, document_length])
+        results = engine.parse_and_call_functions([
+            {'name': 'make_document', 'parameters': {'size': 8000}, 'returns': [{'name': 'first', 'type': 'Document'}]},
+            {'name': 'make_document', 'parameters': {'size': 9000}, 'returns': [{'name': 'second', 'type': 'Document'}]},
+            {'name': 'document_length', 'parameters': {'document': 'first'}, 'returns': [{'name': 'length', 'type': 'int'}]}
+        ])
+        self.assertEqual(results[2], 8000)
+        self.assertGreater(engine.outputs.stats.loads, 0)
+
+        store = engine.outputs
+        engine.reset_session()
+        self.assertEqual(len(store), 0)
+        self.assertIsInstance(engine.outputs, BoundedOutputStore)
+        self.assertEqual(engine.outputs, {})
+
+    def test_dropped_outputs_are_not_passed_as_strings(self):
+        engine = FunctionCallingEngine(output_store=lambda: BoundedOutputStore(max_bytes=10_000, spill=False))
+        engine.add_functions([make_document, document_length])
+        with self.assertRaisesRegex(KeyError, "'first' was dropped"):
+            engine.parse_and_call_functions([
+                {'name': 'make_document', 'parameters': {'size': 8000}, 'returns': [{'name': 'first', 'type': 'Document'}]},
+                {'name': 'make_document', 'parameters': {'size': 9000}, 'returns': [{'name': 'second', 'type': 'Document'}]},
+                {'name': 'document_length', 'parameters': {'document': 'first'}, 'returns': [{'name': 'length', 'type': 'int'}]}
+            ])
+
+if __name__ == '__main__':
+    unittest.main()
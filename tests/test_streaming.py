@@ -0,0 +1,132 @@
+import unittest
+import asyncio
+import time
+import json
+
+from tiny_fnc_engine import FunctionCallingEngine, AsyncFunctionCallingEngine
+from tiny_fnc_engine.streaming import IncrementalJSONParser, ToolCallDeltaAccumulator
+
+def helper_function(a: int, b: int) -> int:
+    return a + b
+
+def chunk_text(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+FUNCTION_CALLS = [
+    {'name': 'helper_function', 'parameters': {'a': 2, 'b': 3}, 'returns': [{'name': 'sum', 'type': 'int'}]},
+    {'name': 'helper_function', 'parameters': {'a': 'sum', 'b': 4}, 'returns': [{'name': 'final_result', 'type': 'int'}]}
+]
+
+class TestIncrementalJSONParser(unittest.TestCase):
+    def test_feed_array(self):
+        parser = IncrementalJSONParser()
+        text = "```json\n" + json.dumps(FUNCTION_CALLS) + "\n```"
+        objects = []
+        for chunk in chunk_text(text, 7):
+            objects.extend(parser.feed(chunk))
+        self.assertEqual(objects, FUNCTION_CALLS)
+
+    def test_feed_object_with_braces_in_strings(self):
+        parser = IncrementalJSONParser()
+        call = {'name': 'echo', 'parameters': {'text': 'a } tricky \\" {string'}}
+        objects = []
+        for chunk in chunk_text(json.dumps(call), 3):
+            objects.extend(parser.feed(chunk))
+        self.assertEqual(objects, [call])
+
+    def test_object_emitted_when_closed(self):
+        parser = IncrementalJSONParser()
+        text = json.dumps(FUNCTION_CALLS)
+        first_end = len(json.dumps(FUNCTION_CALLS[0])) + 1
+        self.assertEqual(parser.feed(text[:first_end]), [FUNCTION_CALLS[0]])
+        self.assertEqual(parser.feed(text[first_end:]), [FUNCTION_CALLS[1]])
+
+class TestToolCallDeltaAccumulator(unittest.TestCase):
+    def test_feed_deltas(self):
+        accumulator = ToolCallDeltaAccumulator()
+        deltas = [
+            {'index': 0, 'id': 'call_1', 'type': 'function', 'function': {'name': 'get_weather', 'arguments': ''}},
+            {'index': 0, 'function': {'arguments': '{"location": '}},
+            {'index': 0, 'function': {'arguments': '"Paris"}'}},
+            {'index': 1, 'id': 'call_2', 'type': 'function', 'function': {'name': 'get_time', 'arguments': ''}}
+        ]
+        completed = []
+        for delta in deltas:
+            completed.extend(accumulator.feed(delta))
+        self.assertEqual(len(completed), 1)
+        self.assertEqual(completed[0]['function'], {'name': 'get_weather', 'arguments': {'location': 'Paris'}})
+
+        remaining = accumulator.close()
+        self.assertEqual(remaining[0]['id'], 'call_2')
+        self.assertEqual(remaining[0]['function']['arguments'], {})
+
+class TestStreamAndCallFunctions(unittest.TestCase):
+    def setUp(self):
+        self.engine = FunctionCallingEngine()
+        self.engine.add_functions([helper_function])
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def test_stream_and_call_functions(self):
+        chunks = chunk_text(json.dumps(FUNCTION_CALLS), 5)
+        results = self.engine.stream_and_call_functions(iter(chunks))
+        self.assertEqual(results, [5, 9])
+        self.assertEqual(self.engine.outputs['final_result'], 9)
+
+    def test_calls_start_before_stream_ends(self):
+        started = []
+
+        def slow_tool(x: int) -> int:
+            started.append(time.perf_counter())
+            time.sleep(0.1)
+            return x
+
+        def chunks():
+            yield json.dumps([{'name': 'slow_tool', 'parameters': {'x': 1}}])[:-1]
+            time.sleep(0.2)
+            yield "]"
+
+        self.engine.add_functions([slow_tool])
+        start = time.perf_counter()
+        results = self.engine.stream_and_call_functions(chunks())
+        self.assertEqual(results, [1])
+        self.assertLess(started[0] - start, 0.15)
+
+    def test_invalid_streams(self):
+        text = json.dumps(FUNCTION_CALLS)
+        for chunks in (
+            chunk_text(text[:len(text) * 3 // 4], 5),
+            ['not json at all'],
+            [text, ' trailing'],
+            [text[:-1], '] {}']
+        ):
+            with self.assertRaises(json.JSONDecodeError):
+                self.engine.stream_and_call_functions(iter(chunks))
+        self.assertEqual(self.engine.stream_and_call_functions(['```json\n', text, '\n``` \n']), [5, 9])
+
+    def test_stream_openai_deltas(self):
+        deltas = [
+            [{'index': 0, 'id': 'call_1', 'type': 'function', 'function': {'name': 'helper_function', 'arguments': '{"a": 1,'}}],
+            [{'index': 0, 'function': {'arguments': ' "b": 2}'}}]
+        ]
+        self.assertEqual(self.engine.stream_and_call_functions(deltas), [3])
+
+class TestAsyncStreamAndCallFunctions(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_and_call_functions_async_iterator(self):
+        engine = AsyncFunctionCallingEngine()
+        engine.add_functions([helper_function])
+
+        async def chunks():
+            for chunk in chunk_text(json.dumps(FUNCTION_CALLS), 4):
+                await asyncio.sleep(0)
+                yield chunk
+
+        results = await engine.stream_and_call_functions(chunks())
+        self.assertEqual(results, [5, 9])
+        with self.assertRaises(json.JSONDecodeError):
+            await engine.stream_and_call_functions(['[{"name": "helper_function", "param'])
+        engine.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
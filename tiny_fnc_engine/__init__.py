@@ -1 +1,2 @@
-from tiny_fnc_engine.engine import FunctionCallingEngine, Parameter, ValidParameter, FunctionCall, OpenAIToolCall, OpenAIFunction
\ No newline at end of file
+from tiny_fnc_engine.engine import FunctionCallingEngine, Parameter, ValidParameter, FunctionCall, OpenAIToolCall, OpenAIFunction, BatchResult, CallResult, PlanError, PlanReport, PlanValidationError
+from tiny_fnc_engine.async_engine import AsyncFunctionCallingEngine
\ No newline at end of file
@@ -0,0 +1,792 @@
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional, Sequence, Union
+from collections.abc import MutableMapping
+from concurrent.futures import CancelledError
+from functools import partial
+import threading
+import asyncio
+import inspect
+import time
+
+from tiny_fnc_engine.engine import (
+    BatchResult,
+    CallResult,
+    FunctionCallingEngine,
+    FunctionCall,
+    PlanReport,
+    ValidOutput,
+    _DependencyTracker,
+    _RegistryEntry,
+    _summarize_results
+)
+from tiny_fnc_engine.cache import MISSING
+from tiny_fnc_engine.calls import CompactCall
+from tiny_fnc_engine.json_backend import JSONInput
+from tiny_fnc_engine.limits import Deadline, get_call_timeout, make_timeout_error
+from tiny_fnc_engine.shared import load
+from tiny_fnc_engine.sessions import AsyncSession
+from tiny_fnc_engine.streaming import StreamParser
+
+class AsyncCallResults:
+    """
+    Asynchronous iterator over the results of a plan of
+    function calls, returned by iter_call_functions of the
+    AsyncFunctionCallingEngine. Yields a CallResult as soon
+    as each call finishes. Once a call fails, the remaining
+    calls are cancelled and the iteration ends.
+
+    function_calls: Sequence[Union[FunctionCall, CompactCall]]
+        The function calls of the plan, CompactCall objects
+        if the engine parsed the plan.
+    results: AsyncIterator[CallResult]
+        The results of the calls, in completion order.
+    """
+    def __init__(self, function_calls: Sequence[Union[FunctionCall, CompactCall]], results: AsyncIterator[CallResult]):
+        self.function_calls = function_calls
+        self.finished: list[CallResult] = []
+        self._results = results
+
+    def __aiter__(self) -> "AsyncCallResults":
+        return self
+
+    async def __anext__(self) -> CallResult:
+        result = await self._results.__anext__()
+        self.finished.append(result)
+        return result
+
+    async def aclose(self) -> None:
+        """
+        Stop the iteration, cancelling the remaining calls.
+        """
+        await self._results.aclose()
+
+    async def summary(self) -> list[ValidOutput]:
+        """
+        Wait for the remaining calls and return the outputs
+        in the order of the function calls, or raise the
+        error of the first failed call, like call_functions.
+        """
+        async for _ in self:
+            pass
+        return _summarize_results(self.finished)
+
+class AsyncFunctionCallingEngine(FunctionCallingEngine):
+    """
+    Asyncio counterpart of the FunctionCallingEngine.
+    Coroutine functions are awaited on the running event
+    loop, while other functions run on their executor, the
+    thread pool of the engine by default, so that they do
+    not block the event loop.
+    Function calls that do not depend on each other are
+    awaited at the same time with asyncio.gather.
+    """
+    session_class = AsyncSession
+
+    async def _run_function(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict,
+            deadline: Optional[Deadline] = None
+        ) -> ValidOutput:
+        """
+        Run a function without blocking the event loop,
+        using the cache of the function if it has one.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict
+            The resolved parameters of the function.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        key, output = self._get_cached(entry, parameters)
+        if output is not MISSING:
+            return output
+
+        if entry.batcher is not None:
+            output = await asyncio.wrap_future(self._submit_batched(entry, parameters, deadline))
+        elif entry.limiter is None and entry.timeout is None and deadline is None:
+            output = await self._run_uncached(entry, parameters)
+        else:
+            output = await self._run_limited(entry, parameters, deadline)
+        if key is not None:
+            entry.cache.set(key, output)
+        return output
+
+    async def _run_limited(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict,
+            deadline: Optional[Deadline]
+        ) -> ValidOutput:
+        """
+        Run a function once a slot of its concurrency limit is
+        free, raising a FunctionTimeoutError if the timeout of
+        the function, or the deadline of its plan, expires first.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict
+            The resolved parameters of the function.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+
+        Raises:
+            FunctionTimeoutError: If the call timed out.
+            ConcurrencyLimitError: If the queue of the limit is full.
+        """
+        timeout, scope = get_call_timeout(entry.timeout, deadline)
+        expires = time.monotonic() + timeout if timeout is not None else None
+        if timeout is not None and timeout <= 0:
+            raise make_timeout_error(entry.name, entry.timeout, deadline, scope)
+
+        limiter = entry.limiter
+        if limiter is not None and not await limiter.acquire_async(timeout):
+            raise make_timeout_error(entry.name, entry.timeout, deadline, scope)
+        try:
+            if expires is None:
+                return await self._run_uncached(entry, parameters)
+
+            # Waited on separately, so that TimeoutErrors raised by the function pass through
+            task = asyncio.ensure_future(self._run_uncached(entry, parameters))
+            try:
+                done, _ = await asyncio.wait({task}, timeout=max(expires - time.monotonic(), 0.0))
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            if not done:
+                task.cancel()
+                raise make_timeout_error(entry.name, entry.timeout, deadline, scope)
+            return task.result()
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    async def _run_uncached(self, entry: _RegistryEntry, parameters: dict) -> ValidOutput:
+        function = entry.function
+        if inspect.iscoroutinefunction(function):
+            return await function(**parameters)
+
+        if entry.executor == "inline":
+            output = function(**parameters)
+        else:
+            loop = asyncio.get_running_loop()
+            if entry.executor == "process":
+                function, parameters = self._get_process_call(entry, parameters)
+                output = load(await loop.run_in_executor(self._get_process_pool(), partial(function, **parameters)))
+            else:
+                output = await loop.run_in_executor(self._get_thread_pool(), partial(function, **parameters))
+        if inspect.isawaitable(output):
+            output = await output
+        return output
+
+    async def _call_function(
+            self,
+            function_call: FunctionCall,
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None
+        ) -> ValidOutput:
+        """
+        Call a function with the outputs of a session.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        instrumentation = self.instrumentation
+        span = instrumentation.start_call(function_call) if instrumentation is not None else None
+        try:
+            entry = self._get_entry(function_call.name)
+            parameters = entry.bind(self._resolve_parameters(function_call, outputs))
+            if span is not None:
+                span.mark("resolve")
+
+            output = await self._run_function(entry, parameters, deadline)
+            if span is not None:
+                span.mark("execute")
+
+            self._store_outputs(function_call, output, outputs)
+        except Exception as e:
+            if span is not None:
+                instrumentation.fail_call(span, e)
+            raise
+
+        if span is not None:
+            span.mark("store")
+            instrumentation.finish_call(span, output)
+        return output
+
+    async def call_function(self, function_call: FunctionCall) -> ValidOutput:
+        """
+        Call a function from the engine.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        """
+        return await self._call_function(function_call, self.outputs)
+
+    async def _call_function_after(
+            self,
+            function_call: FunctionCall,
+            dependencies: list[asyncio.Future],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> ValidOutput:
+        """
+        Call a function once the calls it depends on have finished.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        dependencies: list[asyncio.Future]
+            The tasks of the calls the function call depends on.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan of the call, if any.
+        """
+        if dependencies:
+            await asyncio.gather(*dependencies)
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError(f"The plan was cancelled before calling {function_call.name}()")
+        return await self._call_function(function_call, outputs, deadline)
+
+    async def _call_batch(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None
+        ) -> list[ValidOutput]:
+        """
+        Call coalesced function calls as one batch call with
+        the outputs of a session, and store each output under
+        the returns of its function call.
+
+        function_calls: Sequence[FunctionCall]
+            The coalesced function calls.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the calls, if any.
+        """
+        instrumentation = self.instrumentation
+        spans = [instrumentation.start_call(function_call) for function_call in function_calls] if instrumentation is not None else []
+        try:
+            entry, keys, results, parameters = self._prepare_batch(function_calls, outputs)
+            for span in spans:
+                span.mark("resolve")
+            if parameters is not None:
+                self._merge_batch(entry, keys, results, await self._run_function(entry.batch, parameters, deadline))
+            for span in spans:
+                span.mark("execute")
+            for function_call, output in zip(function_calls, results):
+                self._store_outputs(function_call, output, outputs)
+        except Exception as e:
+            for span in spans:
+                instrumentation.fail_call(span, e)
+            raise
+
+        for span, output in zip(spans, results):
+            span.mark("store")
+            instrumentation.finish_call(span, output)
+        return results
+
+    async def _call_batch_after(
+            self,
+            function_calls: Sequence[FunctionCall],
+            dependencies: list[asyncio.Future],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> list[ValidOutput]:
+        """
+        Call coalesced function calls once the calls they depend on have finished.
+
+        function_calls: Sequence[FunctionCall]
+            The coalesced function calls.
+        dependencies: list[asyncio.Future]
+            The tasks of the calls the function calls depend on.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the calls, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan of the calls, if any.
+        """
+        if dependencies:
+            await asyncio.gather(*dependencies)
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError(f"The plan was cancelled before calling {function_calls[0].name}()")
+        return await self._call_batch(function_calls, outputs, deadline)
+
+    @staticmethod
+    async def _get_batch_output(batch: asyncio.Future, position: int) -> ValidOutput:
+        return (await batch)[position]
+
+    async def _reuse_output(
+            self,
+            function_call: FunctionCall,
+            original: asyncio.Future,
+            outputs: MutableMapping[str, ValidOutput]
+        ) -> ValidOutput:
+        """
+        Store the output of an identical earlier call under the
+        returns of a duplicate function call.
+
+        function_call: FunctionCall
+            The duplicate function call.
+        original: asyncio.Future
+            The task of the call it duplicates.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        """
+        output = await original
+        self._store_outputs(function_call, output, outputs)
+        return output
+
+    async def _call_functions(
+            self,
+            function_calls: list[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional[PlanReport] = None
+        ) -> list[ValidOutput]:
+        """
+        Call multiple functions with the outputs of a session.
+
+        function_calls: list[FunctionCall]
+            The function calls to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        optimization: Optional[PlanReport]
+            The calls that do not run, see call_functions.
+
+        Raises:
+            PlanValidationError: If the plan fails the preflight check.
+            ValueError: If the optimization was made for another plan.
+        """
+        self._check_optimization(function_calls, optimization)
+        self._preflight(function_calls, outputs)
+        deadline = self._get_deadline(timeout)
+        tasks = self._create_tasks(function_calls, outputs, deadline, cancel_event, optimization)
+        return await self._gather(tasks)
+
+    async def call_functions(
+            self,
+            function_calls: list[FunctionCall],
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional[PlanReport] = None
+        ) -> list[ValidOutput]:
+        """
+        Call multiple functions from the engine. Calls that
+        do not depend on each other run concurrently, and the
+        outputs are returned in the order of the function calls.
+
+        function_calls: list[FunctionCall]
+            The function calls to be executed.
+        timeout: Optional[float]
+            The number of seconds after which the plan fails
+            with a FunctionTimeoutError whose scope is "plan".
+            Defaults to the plan_timeout of the engine.
+        cancel_event: Optional[threading.Event]
+            An event that can be set, e.g. from another thread,
+            to cancel the plan. Calls that have not started yet
+            are skipped and the plan raises a
+            concurrent.futures.CancelledError. Cancelling the
+            awaiting task cancels the running calls as well.
+        optimization: Optional[PlanReport]
+            The report of optimize_function_calls for the plan.
+            Duplicate calls then get the output of the call they
+            duplicate, which is stored under their own returns,
+            and pruned calls are skipped, their output is None.
+
+        Raises:
+            ValueError: If the optimization was made for another plan.
+        """
+        return await self._call_functions(function_calls, self.outputs, timeout, cancel_event, optimization)
+
+    def _iter_call_functions(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> AsyncCallResults:
+        """
+        Call multiple functions with the outputs of a session,
+        yielding their results in completion order.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+
+        Raises:
+            PlanValidationError: If the plan fails the preflight check.
+        """
+        self._preflight(function_calls, outputs)
+        deadline = self._get_deadline(timeout)
+        results = self._iter_tasks(function_calls, outputs, deadline, cancel_event)
+        return AsyncCallResults(function_calls, results)
+
+    async def _iter_tasks(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> AsyncIterator[CallResult]:
+        """
+        Schedule the tasks of a plan and yield their results
+        as they finish. The remaining tasks are cancelled
+        after the first failed call, or if the iteration stops.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan, if any.
+        """
+        tasks = self._create_tasks(function_calls, outputs, deadline, cancel_event)
+        indices = {task: index for index, task in enumerate(tasks)}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=indices.__getitem__):
+                    index = indices[task]
+                    error = task.exception()
+                    output = task.result() if error is None else None
+                    yield CallResult(index, function_calls[index], output, error)
+                    if error is not None:
+                        return
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def iter_call_functions(
+            self,
+            function_calls: Sequence[FunctionCall],
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> AsyncCallResults:
+        """
+        Call multiple functions from the engine, yielding a
+        CallResult as soon as each call finishes, for use with
+        async for. Calls that do not depend on each other run
+        concurrently and are yielded in completion order. Errors
+        are yielded rather than raised, and awaiting summary()
+        returns the outputs or raises the first error, like
+        call_functions.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        """
+        return self._iter_call_functions(function_calls, self.outputs, timeout, cancel_event)
+
+    def iter_parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> AsyncCallResults:
+        """
+        Parse function calls and yield their results in
+        completion order, see iter_call_functions. The
+        function_call of each result is a CompactCall.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        """
+        function_calls = self._parse_input(function_calls, verbose)
+        return self._iter_call_functions(function_calls, self.outputs, timeout, cancel_event)
+
+    def _create_tasks(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional[PlanReport] = None
+        ) -> list[asyncio.Future]:
+        """
+        Create the tasks of the function calls of a plan. Each
+        group of coalesced calls runs as one batch task, and
+        the task of each call waits for its own output.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls of the plan.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan, if any.
+        optimization: Optional[PlanReport]
+            The calls that do not run, if any.
+        """
+        coalescing = self._coalesce(function_calls, optimization)
+        if coalescing is None:
+            tracker = _DependencyTracker()
+            tasks = []
+            for function_call in function_calls:
+                tasks.append(self._schedule(function_call, tracker, tasks, outputs, deadline, cancel_event))
+            return tasks
+
+        # Created in dependency order, so that dependencies have a task
+        tasks: list[Optional[asyncio.Future]] = [None] * len(function_calls)
+        duplicates, pruned = (optimization.duplicates, set(optimization.pruned)) if optimization is not None else ({}, ())
+        for index in coalescing.order:
+            group = coalescing.batches.get(index)
+            if index in pruned:
+                tasks[index] = asyncio.get_running_loop().create_future()
+                tasks[index].set_result(None)
+            elif index in duplicates:
+                tasks[index] = asyncio.ensure_future(self._reuse_output(
+                    function_calls[index],
+                    tasks[duplicates[index]],
+                    outputs
+                ))
+            elif group is None:
+                tasks[index] = asyncio.ensure_future(self._call_function_after(
+                    function_calls[index],
+                    [tasks[i] for i in sorted(coalescing.dependencies[index])],
+                    outputs,
+                    deadline,
+                    cancel_event
+                ))
+            elif index == group[0]:
+                dependencies = set().union(*(coalescing.dependencies[i] for i in group))
+                batch = asyncio.ensure_future(self._call_batch_after(
+                    [function_calls[i] for i in group],
+                    [tasks[i] for i in sorted(dependencies)],
+                    outputs,
+                    deadline,
+                    cancel_event
+                ))
+                for position, i in enumerate(group):
+                    tasks[i] = asyncio.ensure_future(self._get_batch_output(batch, position))
+        return tasks
+
+    def _schedule(
+            self,
+            function_call: FunctionCall,
+            tracker: _DependencyTracker,
+            tasks: list[asyncio.Future],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> asyncio.Future:
+        """
+        Create the task of the next function call of a plan.
+
+        function_call: FunctionCall
+            The function call to be scheduled.
+        tracker: _DependencyTracker
+            The dependency tracker of the plan.
+        tasks: list[asyncio.Future]
+            The tasks of the earlier function calls of the plan.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan, if any.
+        """
+        dependencies = tracker.add(self._get_references(function_call), function_call.returns)
+        return asyncio.ensure_future(self._call_function_after(
+            function_call,
+            [tasks[i] for i in sorted(dependencies)],
+            outputs,
+            deadline,
+            cancel_event
+        ))
+
+    @staticmethod
+    async def _gather(tasks: list[asyncio.Future]) -> list[ValidOutput]:
+        """
+        Wait for the tasks of a plan and return their outputs.
+        If a task fails, the remaining tasks are cancelled.
+
+        tasks: list[asyncio.Future]
+            The tasks of the plan.
+        """
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            # Cancel the remaining calls before propagating the error
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> list[ValidOutput]:
+        """
+        Parse and call either a single function call or
+        a list of function calls.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        """
+        function_calls = self._parse_input(function_calls, verbose)
+        return await self._call_functions(function_calls, self.outputs, timeout, cancel_event)
+
+    async def batch_parse_and_call_functions(
+            self,
+            responses: Iterable[Union[dict, list[dict], JSONInput]],
+            max_concurrency: Optional[int] = None
+        ) -> list[BatchResult]:
+        """
+        Parse and call the function calls of many independent
+        LLM responses, each with its own outputs, see
+        FunctionCallingEngine.batch_parse_and_call_functions.
+        The responses run concurrently on the event loop.
+
+        responses: Iterable[Union[dict, list[dict], JSONInput]]
+            The responses, each as accepted by parse_and_call_functions.
+        max_concurrency: Optional[int]
+            The maximum number of responses running at the
+            same time. Unlimited if None.
+        """
+        responses = list(responses)
+        if self.instrumentation is not None:
+            plans = self._instrument_parse(self._parse_batch, responses)
+        else:
+            plans = self._parse_batch(responses)
+
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+
+        async def run(index: int, plan: Union[list[FunctionCall], Exception]) -> BatchResult:
+            if semaphore is None:
+                return await self._run_batch_item(index, plan)
+            async with semaphore:
+                return await self._run_batch_item(index, plan)
+
+        return list(await asyncio.gather(*(run(index, plan) for index, plan in enumerate(plans))))
+
+    async def _run_batch_item(self, index: int, plan: Union[list[FunctionCall], Exception]) -> BatchResult:
+        """
+        Call the function calls of one response of a batch
+        with outputs of its own.
+
+        index: int
+            The index of the response in the batch.
+        plan: Union[list[FunctionCall], Exception]
+            The parsed function calls of the response,
+            or the error raised while parsing it.
+        """
+        if isinstance(plan, Exception):
+            return BatchResult(index, None, plan)
+
+        outputs = self.output_store()
+        try:
+            return BatchResult(index, await self._call_functions(plan, outputs), None)
+        except Exception as e:
+            return BatchResult(index, None, e)
+        finally:
+            close = getattr(outputs, "close", None)
+            if close is not None:
+                close()
+
+    async def stream_and_call_functions(
+            self,
+            chunks: Union[AsyncIterable[Union[str, dict, list]], Iterable[Union[str, dict, list]]],
+            verbose: bool = False
+        ) -> list[ValidOutput]:
+        """
+        Parse and call function calls from a streamed LLM
+        response. Each function call starts as soon as its
+        JSON object is closed and the calls it depends on
+        have finished, while the response is still streaming.
+
+        chunks: Union[AsyncIterable, Iterable]
+            Chunks of the JSON text of the response, or
+            OpenAI "tool_calls" deltas (or lists of deltas).
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        return await self._stream_and_call_functions(chunks, self.outputs, verbose)
+
+    async def _stream_and_call_functions(
+            self,
+            chunks: Union[AsyncIterable[Union[str, dict, list]], Iterable[Union[str, dict, list]]],
+            outputs: MutableMapping[str, ValidOutput],
+            verbose: bool = False
+        ) -> list[ValidOutput]:
+        """
+        Parse and call function calls from a streamed
+        LLM response with the outputs of a session.
+
+        chunks: Union[AsyncIterable, Iterable]
+            The chunks of the response.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        parser = StreamParser(self.json_backend.loads)
+        tracker = _DependencyTracker()
+        tasks = []
+
+        def submit(calls: list[dict]) -> None:
+            for function_call in self._decode_and_parse_input(calls):
+                if verbose:
+                    self._print_function_call(function_call)
+                tasks.append(self._schedule(function_call, tracker, tasks, outputs))
+
+        try:
+            if hasattr(chunks, "__aiter__"):
+                async for chunk in chunks:
+                    submit(parser.feed(chunk))
+            else:
+                for chunk in chunks:
+                    submit(parser.feed(chunk))
+            submit(parser.close())
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return await self._gather(tasks)
@@ -0,0 +1,184 @@
+from typing import Any, Callable, NamedTuple, Optional
+from concurrent.futures import CancelledError, Future
+from functools import partial
+import threading
+import time
+
+from tiny_fnc_engine.instrumentation import Histogram
+from tiny_fnc_engine.limits import timers
+
+# Default number of seconds a call waits for others to join its batch
+DEFAULT_MAX_WAIT = 0.002
+
+class BatchStats(NamedTuple):
+    """
+    Counters of a MicroBatcher.
+
+    batches: int
+        The number of batch calls made.
+    calls: int
+        The number of calls sent in these batches.
+    full_batches: int
+        The number of batches flushed because they reached
+        max_batch_size, the others waited for max_wait.
+    max_batch_size: int
+        The maximum number of calls in a batch.
+    mean_delay: float
+        The mean number of seconds calls waited in the queue.
+    p99_delay: float
+        The estimated 99th percentile of the queueing delay.
+    max_delay: float
+        The longest queueing delay, in seconds.
+    """
+    batches: int
+    calls: int
+    full_batches: int
+    max_batch_size: int
+    mean_delay: float
+    p99_delay: float
+    max_delay: float
+
+    @property
+    def fill_ratio(self) -> float:
+        """
+        The mean fraction of max_batch_size used by the batches.
+        """
+        return self.calls / (self.batches * self.max_batch_size) if self.batches else 0.0
+
+class MicroBatcher:
+    """
+    Thread-safe queue grouping the calls of one function, e.g.
+    from concurrent sessions, into batch calls. A batch is
+    sent once it holds max_batch_size calls, or max_wait
+    seconds after its first call was queued, whichever comes
+    first, and each call gets its own output back through
+    its future. Expired batches are sent from the timer
+    thread of the engine, so the run function must not block.
+
+    run: Callable[[list[dict[str, Any]]], Future]
+        The function starting a batch call with the list of
+        the parameters of its calls, returning a future of
+        the list of their outputs in the same order.
+    max_batch_size: int
+        The maximum number of calls in a batch.
+    max_wait: float
+        The maximum number of seconds a call waits for
+        other calls before its batch is sent.
+    """
+    def __init__(
+            self,
+            run: Callable[[list[dict[str, Any]]], Future],
+            max_batch_size: int,
+            max_wait: float = DEFAULT_MAX_WAIT
+        ):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be positive")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative")
+        self.run = run
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: list[tuple[dict[str, Any], Future, float]] = []
+        self._timer: Optional[list] = None
+        self._batch: Optional[object] = None
+        self._lock = threading.Lock()
+        self._batches = self._calls = self._full_batches = 0
+        self._delays = Histogram()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(self, parameters: dict[str, Any]) -> Future:
+        """
+        Queue a call and return the future of its output.
+
+        parameters: dict[str, Any]
+            The parameters of the call.
+        """
+        future = Future()
+        with self._lock:
+            self._queue.append((parameters, future, time.perf_counter()))
+            if len(self._queue) >= self.max_batch_size:
+                calls = self._take()
+            else:
+                if self._timer is None:
+                    batch = self._batch = object()
+                    self._timer = timers.schedule(self.max_wait, partial(self._expire, batch))
+                calls = None
+        if calls is not None:
+            self._send(calls, full=True)
+        return future
+
+    def flush(self) -> None:
+        """
+        Send the queued calls without waiting for max_wait.
+        """
+        with self._lock:
+            calls = self._take()
+        if calls:
+            self._send(calls, full=False)
+
+    @property
+    def stats(self) -> BatchStats:
+        with self._lock:
+            delays = self._delays
+            return BatchStats(
+                self._batches,
+                self._calls,
+                self._full_batches,
+                self.max_batch_size,
+                delays.mean,
+                delays.quantile(0.99),
+                delays.max
+            )
+
+    def _take(self) -> list[tuple[dict[str, Any], Future, float]]:
+        calls, self._queue = self._queue, []
+        if self._timer is not None:
+            timers.cancel(self._timer)
+            self._timer = self._batch = None
+        return calls
+
+    def _expire(self, batch: object) -> None:
+        with self._lock:
+            if self._batch is not batch:
+                # The batch was already sent
+                return
+            calls = self._take()
+        self._send(calls, full=False)
+
+    def _send(self, calls: list[tuple[dict[str, Any], Future, float]], full: bool) -> None:
+        # Calls cancelled while queued, e.g. by a cancelled asyncio task, are dropped
+        calls = [call for call in calls if call[1].set_running_or_notify_cancel()]
+        if not calls:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._calls += len(calls)
+            self._full_batches += full
+            for _, _, queued in calls:
+                self._delays.observe(now - queued)
+        try:
+            execution = self.run([parameters for parameters, _, _ in calls])
+        except Exception as e:
+            execution = Future()
+            execution.set_exception(e)
+        execution.add_done_callback(partial(self._scatter, calls))
+
+    @staticmethod
+    def _scatter(calls: list[tuple[dict[str, Any], Future, float]], execution: Future) -> None:
+        if execution.cancelled():
+            error = CancelledError("The batch call was cancelled")
+        else:
+            error = execution.exception()
+        if error is None:
+            outputs = execution.result()
+            if not isinstance(outputs, (list, tuple)) or len(outputs) != len(calls):
+                size = len(outputs) if isinstance(outputs, (list, tuple)) else type(outputs).__name__
+                error = ValueError(f"The batch call must return a list of {len(calls)} outputs, got {size}")
+        for i, (_, future, _) in enumerate(calls):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(outputs[i])
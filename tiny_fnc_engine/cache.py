@@ -0,0 +1,229 @@
+from typing import Any, Callable, Hashable, NamedTuple, Optional, Union
+from collections import OrderedDict
+import threading
+import hashlib
+import time
+import json
+
+from pydantic import BaseModel
+
+# Sentinel returned by ResultCache.get on a miss
+MISSING = object()
+
+class CacheStats(NamedTuple):
+    """
+    Counters of a cache.
+
+    hits: int
+        The number of lookups that found a value.
+    misses: int
+        The number of lookups that did not find a value.
+    evictions: int
+        The number of values removed because the cache
+        was full or because they expired.
+    size: int
+        The number of values currently in the cache.
+    """
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of lookups that found a value.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+class ResultCache:
+    """
+    Thread-safe cache with LRU and TTL eviction.
+
+    maxsize: int
+        The maximum number of values in the cache. When
+        the cache is full, the least recently used value
+        is evicted.
+    ttl: Optional[float]
+        The number of seconds after which a value expires.
+        Values never expire if None.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._values: OrderedDict[Hashable, tuple[Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Get a value from the cache, or MISSING if the
+        key is not in the cache or its value expired.
+
+        key: Hashable
+            The key of the value.
+        """
+        with self._lock:
+            item = self._values.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._values.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._values[key]
+                self._evictions += 1
+            self._misses += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value in the cache.
+
+        key: Hashable
+            The key of the value.
+        value: Any
+            The value to be stored.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._values[key] = (expires_at, value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self._evictions += 1
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Remove the values whose keys match a predicate, e.g.
+        the outputs of a function that was registered again.
+        The counters are kept.
+
+        predicate: Callable[[Hashable], bool]
+            Whether the value of a key is removed.
+        """
+        with self._lock:
+            for key in [key for key in self._values if predicate(key)]:
+                del self._values[key]
+
+    def clear(self) -> None:
+        """
+        Remove all values from the cache. The counters are kept.
+        """
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        The counters of the cache.
+        """
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._values))
+
+def _canonical_form(value: Any, path: set[int]) -> Any:
+    """
+    Convert a value to the JSON value serialized by
+    canonicalize. Values JSON has no type for are tagged
+    with a single key starting with a NUL character, which
+    is escaped in the keys of dictionaries, so that e.g. a
+    tuple and a list, or {1: x} and {"1": x}, differ.
+
+    value: Any
+        The value to be converted.
+    path: set[int]
+        The ids of the containers being converted, to
+        detect circular references.
+
+    Raises:
+        TypeError: If the value cannot be serialized.
+        ValueError: If the value contains itself.
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if id(value) in path:
+        raise ValueError("Cannot canonicalize a circular reference")
+    path.add(id(value))
+    try:
+        if isinstance(value, dict):
+            if all(type(key) is str for key in value):
+                return {
+                    "\0" + key if key.startswith("\0") else key: _canonical_form(item, path)
+                    for key, item in value.items()
+                }
+            items = sorted((canonicalize(key), _canonical_form(item, path)) for key, item in value.items())
+            return {"\0dict": [list(item) for item in items]}
+        if isinstance(value, list):
+            return [_canonical_form(item, path) for item in value]
+        if isinstance(value, tuple):
+            return {"\0tuple": [_canonical_form(item, path) for item in value]}
+        if isinstance(value, BaseModel):
+            model = type(value)
+            return {"\0model": [f"{model.__module__}.{model.__qualname__}", _canonical_form(value.model_dump(mode="json"), path)]}
+        if isinstance(value, (set, frozenset)):
+            return {"\0set": sorted(canonicalize(item) for item in value)}
+        if isinstance(value, (bytes, bytearray)):
+            return {"\0bytes": bytes(value).hex()}
+    finally:
+        path.discard(id(value))
+    raise TypeError(f"Cannot canonicalize value of type {type(value).__name__}")
+
+def canonicalize(value: Any) -> str:
+    """
+    Serialize a value to canonical JSON, with sorted keys,
+    Pydantic models dumped together with their class, and
+    tuples, sets, bytes and dictionaries with keys other
+    than strings tagged with their type.
+
+    value: Any
+        The value to be serialized.
+
+    Raises:
+        TypeError: If the value cannot be serialized.
+        ValueError: If the value contains itself.
+    """
+    return json.dumps(_canonical_form(value, set()), sort_keys=True, separators=(",", ":"))
+
+def make_cache_key(
+        name: str,
+        parameters: dict[str, Any],
+        version: Hashable = None
+    ) -> Optional[tuple[str, Hashable, bytes]]:
+    """
+    Make the cache key of a function call from the name of
+    the function, the version of its registration and the
+    hash of its canonical parameters. Returns None if the
+    parameters cannot be canonicalized.
+
+    name: str
+        The name of the function.
+    parameters: dict[str, Any]
+        The resolved parameters of the function call.
+    version: Hashable
+        The version of the registered function, so that a
+        function registered again under the same name does
+        not get the outputs of the previous one.
+    """
+    try:
+        canonical = canonicalize(parameters)
+    except (TypeError, ValueError):
+        return None
+    return name, version, hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+def make_plan_key(raw: Union[str, bytes, bytearray, memoryview]) -> bytes:
+    """
+    Make the plan cache key of raw JSON input, the hash
+    of its bytes, so that equal str and bytes share a key.
+
+    raw: Union[str, bytes, bytearray, memoryview]
+        The raw JSON input.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(raw, digest_size=16).digest()
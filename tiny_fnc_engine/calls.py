@@ -0,0 +1,149 @@
+from typing import Any, NamedTuple, Optional
+
+# Parameter values accepted without Pydantic, the types JSON decodes to
+_JSON_VALUE_TYPES = frozenset((str, int, float, bool, dict, list))
+
+class CallReturn(NamedTuple):
+    """
+    Return value of a CompactCall, the counterpart of the
+    Parameter model.
+
+    name: str
+        The name the output is stored under.
+    type: str
+        The type of the output.
+    """
+    name: str
+    type: str
+
+class CompactCall:
+    """
+    Immutable function call used on the execution path of
+    parsed plans instead of the FunctionCall model, with the
+    same name, parameters and returns attributes. Building
+    one from decoded JSON with from_dict checks the same
+    schema as FunctionCall without copying the parameters,
+    in about half the time of validating the model, and
+    allocates a fraction of its objects. The compiled
+    references of the engine are kept in a slot, as with
+    FunctionCall.
+
+    name: str
+        The name of the function.
+    parameters: dict[str, Any]
+        The parameters of the function, which must not be
+        modified after the call was built.
+    returns: Optional[tuple[CallReturn, ...]]
+        The return values of the function, if any.
+    """
+    __slots__ = ("name", "parameters", "returns", "_references")
+
+    def __init__(
+            self,
+            name: str,
+            parameters: dict[str, Any],
+            returns: Optional[tuple[CallReturn, ...]] = None
+        ):
+        _set_name(self, name)
+        _set_parameters(self, parameters)
+        _set_returns(self, returns)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CompactCall":
+        """
+        Build a call from a decoded JSON function call,
+        checking it against the FunctionCall schema. Only
+        values JSON decodes to are accepted: other values,
+        such as Pydantic models or tuples, which the model
+        may accept or coerce, raise a TypeError, so that the
+        caller can validate them with FunctionCall instead.
+
+        data: dict
+            The function call, with a name, parameters and
+            optional returns. Other keys are ignored.
+
+        Raises:
+            TypeError: If a field is missing or has another type.
+        """
+        if type(data) is not dict:
+            raise TypeError("A function call must be a dictionary")
+        name = data.get("name")
+        parameters = data.get("parameters")
+        if type(name) is not str or type(parameters) is not dict:
+            raise TypeError("A function call needs a str name and dict parameters")
+        for key, value in parameters.items():
+            if type(key) is not str or type(value) not in _JSON_VALUE_TYPES:
+                raise TypeError(f"Parameter {key!r} is not a JSON value")
+
+        returns = data.get("returns")
+        if returns is not None:
+            if type(returns) is not list:
+                raise TypeError("The returns of a function call must be a list")
+            compact_returns = []
+            for return_value in returns:
+                if type(return_value) is not dict:
+                    raise TypeError("A return value must be a dictionary")
+                return_name = return_value.get("name")
+                return_type = return_value.get("type")
+                if type(return_name) is not str or type(return_type) is not str:
+                    raise TypeError("A return value needs a str name and type")
+                compact_returns.append(_tuple_new(CallReturn, (return_name, return_type)))
+            returns = tuple(compact_returns)
+
+        call = _new(cls)
+        _set_name(call, name)
+        _set_parameters(call, parameters)
+        _set_returns(call, returns)
+        return call
+
+    @classmethod
+    def from_model(cls, function_call: Any) -> "CompactCall":
+        """
+        Build a call from a validated FunctionCall.
+
+        function_call: FunctionCall
+            The function call model.
+        """
+        returns = function_call.returns
+        if returns is not None:
+            returns = tuple(CallReturn(return_value.name, return_value.type) for return_value in returns)
+        return cls(function_call.name, function_call.parameters, returns)
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Get the fields of the call, e.g. to build a FunctionCall.
+        """
+        returns = self.returns
+        return {
+            "name": self.name,
+            "parameters": self.parameters,
+            "returns": [return_value._asdict() for return_value in returns] if returns is not None else None
+        }
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return (self.name, self.parameters, self.returns) == (other.name, other.parameters, other.returns)
+
+    # Parameters are mutable dictionaries
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(name={self.name!r}, parameters={self.parameters!r}, returns={self.returns!r})"
+
+    def __reduce__(self) -> tuple:
+        # The compiled references are not pickled
+        return (type(self), (self.name, self.parameters, self.returns))
+
+# Slot setters bypassing __setattr__
+_set_name = CompactCall.__dict__["name"].__set__
+_set_parameters = CompactCall.__dict__["parameters"].__set__
+_set_returns = CompactCall.__dict__["returns"].__set__
+_new = object.__new__
+_tuple_new = tuple.__new__
@@ -1,15 +1,42 @@
-from typing import Optional, Union
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, Union
+from collections.abc import MutableMapping
+from collections import Counter, deque
+import typing
+from concurrent.futures import CancelledError, Future, InvalidStateError, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait
+from functools import partial
+from types import ModuleType
 import importlib.util
+import itertools
+import inspect
+import threading
+import uuid
+import mmap
 import os
-import json
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pydantic_core import SchemaValidator
+
+from tiny_fnc_engine.batching import DEFAULT_MAX_WAIT, BatchStats, MicroBatcher
+from tiny_fnc_engine.calls import CompactCall
+from tiny_fnc_engine.cache import MISSING, ResultCache, canonicalize, make_cache_key, make_plan_key
+from tiny_fnc_engine.instrumentation import Instrumentation, Span
+from tiny_fnc_engine.json_backend import JSON_TYPES, JSONInput, get_json_backend
+from tiny_fnc_engine.limits import ConcurrencyLimiter, Deadline, get_call_timeout, make_timeout_error, timers
+from tiny_fnc_engine.loader import FunctionInfo, ToolManifest, find_source_files
+from tiny_fnc_engine.references import REFERENCE_MODES, Reference, compile_references, resolve_references
+from tiny_fnc_engine.snapshots import SnapshotInput, restore_outputs
+from tiny_fnc_engine.shared import SharedCall, SharedMemoryOutputStore, ensure_tracker, load, to_handles
+from tiny_fnc_engine.schema import build_tool_schema, build_tool_schema_from_info, serialize_tool_schema
+from tiny_fnc_engine.sessions import Session
+from tiny_fnc_engine.streaming import StreamParser
 
 # Declare type aliases
 ValidParameter = Union[str, int, float, bool, dict, list, BaseModel]
 ValidOutput = ValidParameter
 
 # Declare constants
+EXECUTORS = ("inline", "thread", "process")
+BATCH_CHUNK_SIZE = 256
 INVALID_FUNCTION_CALL_ERROR = """
 The function call is invalid. The parameter must be a either a
 dictionary or a list of dictionaries, following a JSON schema
@@ -61,7 +88,18 @@ class FunctionCall(BaseModel):
         support the "returns" field, this schema 
         will still be valid.
 
+    With the "explicit" reference mode of the engine,
+    parameters reference earlier outputs at any depth with
+    {"$ref": "name"}, including keys, attributes and indices
+    of the outputs, e.g. {"$ref": "user.name"} or
+    {"$ref": "results[0]"}. The references are compiled on
+    the first call, so the parameters must not be modified
+    after the function call was called.
     """
+    # Slot of the compiled references, which unlike a private
+    # attribute adds nothing to the construction of the model
+    __slots__ = ("_references",)
+
     name: str
     parameters: dict[str, ValidParameter]
     returns: Optional[list[Parameter]] = None
@@ -93,6 +131,582 @@ class OpenAIToolCall(BaseModel):
     function: OpenAIFunction
     type: str
 
+class BatchResult(NamedTuple):
+    """
+    Result of one response of a batch.
+
+    index: int
+        The index of the response in the batch.
+    results: Optional[list[ValidOutput]]
+        The outputs of the function calls of the response,
+        or None if the response failed.
+    error: Optional[Exception]
+        The error raised while parsing or calling the
+        function calls of the response, if any.
+    """
+    index: int
+    results: Optional[list[ValidOutput]]
+    error: Optional[Exception]
+
+class CallResult(NamedTuple):
+    """
+    Result of one function call of a plan, yielded by
+    iter_call_functions as soon as the call finishes.
+
+    index: int
+        The index of the function call in the plan.
+    function_call: Union[FunctionCall, CompactCall]
+        The function call. Plans parsed by the engine, e.g.
+        by iter_parse_and_call_functions, are made of
+        CompactCall objects, which have the name, parameters
+        and returns of a FunctionCall but not its Pydantic
+        methods; FunctionCall(**call.to_dict()) converts one.
+    output: Optional[ValidOutput]
+        The output of the function call, or None if it failed.
+    error: Optional[Exception]
+        The error raised by the function call, if any.
+    """
+    index: int
+    function_call: Union[FunctionCall, CompactCall]
+    output: Optional[ValidOutput]
+    error: Optional[Exception]
+
+class PlanError(NamedTuple):
+    """
+    Problem of one function call found by the preflight
+    check of a plan.
+
+    index: int
+        The index of the function call in the plan.
+    name: str
+        The name of the called function.
+    message: str
+        The description of the problem.
+    """
+    index: int
+    name: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"call {self.index} to {self.name}(): {self.message}"
+
+class PlanValidationError(ValueError, KeyError, TypeError):
+    """
+    Error raised before any function of a plan runs when
+    function calls of the plan are invalid, e.g. call an
+    unknown function or reference an output that no earlier
+    call returns, with every problem found in the plan. It
+    is also a KeyError and a TypeError, the errors the calls
+    would raise without the check, so that handlers of
+    unknown functions or bad arguments still catch it.
+
+    errors: list[PlanError]
+        The problems of the plan, in plan order.
+    """
+    def __init__(self, errors: list[PlanError]):
+        self.errors = errors
+        super().__init__(f"Invalid plan, {len(errors)} error(s): " + "; ".join(map(str, errors)))
+
+    # KeyError would quote the message
+    __str__ = ValueError.__str__
+
+    def __reduce__(self) -> tuple:
+        return type(self), (self.errors,)
+
+class PlanReport(NamedTuple):
+    """
+    Calls of a plan that do not need to run, found by
+    optimize_function_calls.
+
+    calls: tuple[str, ...]
+        The names of the called functions, in plan order.
+    duplicates: dict[int, int]
+        The calls reusing the output of an identical earlier
+        call, mapped to the index of that call.
+    pruned: tuple[int, ...]
+        The indices of the calls skipped because their
+        outputs are not used.
+    fingerprints: tuple[tuple, ...]
+        The name, canonical parameters and returns of each
+        call, checked before the report is applied to a plan.
+    """
+    calls: tuple[str, ...]
+    duplicates: dict[int, int]
+    pruned: tuple[int, ...]
+    fingerprints: tuple[tuple, ...]
+
+    @property
+    def eliminated(self) -> int:
+        """
+        The number of calls that do not run.
+        """
+        return len(self.duplicates) + len(self.pruned)
+
+    def summary(self) -> str:
+        """
+        Describe the eliminated calls, one per line.
+        """
+        lines = [f"{self.eliminated} of {len(self.calls)} calls eliminated"]
+        for index, original in sorted(self.duplicates.items()):
+            lines.append(f"call {index} to {self.calls[index]}() reuses the output of call {original}")
+        for index in self.pruned:
+            lines.append(f"call {index} to {self.calls[index]}() is pruned, its output is unused")
+        return "\n".join(lines)
+
+def _summarize_results(results: list[CallResult]) -> list[ValidOutput]:
+    """
+    Get the outputs of the finished calls of a plan in the
+    order of the calls, raising the error of the first
+    failed call instead, like call_functions.
+
+    results: list[CallResult]
+        The results of the plan, in completion order.
+    """
+    results = sorted(results, key=lambda result: result.index)
+    for result in results:
+        if result.error is not None:
+            raise result.error
+    return [result.output for result in results]
+
+class CallResults:
+    """
+    Iterator over the results of a plan of function calls,
+    returned by iter_call_functions. Yields a CallResult as
+    soon as each call finishes, so that partial results can
+    be used before the whole plan is done. Once a call fails,
+    the calls that have not started yet are skipped and not
+    yielded, and the iteration ends after the running calls.
+
+    function_calls: Sequence[Union[FunctionCall, CompactCall]]
+        The function calls of the plan, CompactCall objects
+        if the engine parsed the plan.
+    results: Iterator[CallResult]
+        The results of the calls, in completion order.
+    """
+    def __init__(self, function_calls: Sequence[Union[FunctionCall, CompactCall]], results: Iterator[CallResult]):
+        self.function_calls = function_calls
+        self.finished: list[CallResult] = []
+        self._results = results
+
+    def __iter__(self) -> "CallResults":
+        return self
+
+    def __next__(self) -> CallResult:
+        result = next(self._results)
+        self.finished.append(result)
+        return result
+
+    def close(self) -> None:
+        """
+        Stop the iteration, skipping the calls that have not started yet.
+        """
+        self._results.close()
+
+    def summary(self) -> list[ValidOutput]:
+        """
+        Wait for the remaining calls and return the outputs
+        in the order of the function calls, or raise the
+        error of the first failed call, like call_functions.
+        """
+        for _ in self:
+            pass
+        return _summarize_results(self.finished)
+
+# Reads the compiled references of a function call without the __getattr__ of Pydantic
+_REFERENCES_SLOT = FunctionCall.__dict__["_references"]
+_COMPACT_REFERENCES_SLOT = CompactCall.__dict__["_references"]
+
+def _compact_call(call: dict) -> CompactCall:
+    """
+    Build the CompactCall of a decoded function call. Calls
+    with values other than those JSON decodes to are
+    validated with the FunctionCall model instead, so that
+    the same calls are accepted as by parse_function_calls.
+
+    call: dict
+        The function call to be parsed.
+
+    Raises:
+        ValueError: If the function call is invalid.
+    """
+    try:
+        return CompactCall.from_dict(call)
+    except TypeError:
+        pass
+    try:
+        return CompactCall.from_model(FunctionCall(**call))
+    except Exception:
+        raise ValueError(INVALID_FUNCTION_CALL_ERROR) from None
+
+def _load_module(file_path: str) -> ModuleType:
+    """
+    Load a module from a specified .py file.
+
+    file_path: str
+        The path to the .py file to be loaded.
+    """
+    # Use importlib.util to load the module
+    module_name = os.path.basename(file_path).split('.')[0]
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Modules loaded by _ModuleFunction, per process
+_loaded_modules: dict[str, ModuleType] = {}
+_loaded_modules_lock = threading.Lock()
+
+class _ModuleFunction:
+    """
+    Picklable reference to a function defined in a .py file.
+    The file is loaded once in the process calling the
+    function, which lets functions loaded with
+    add_functions_from_file run in worker processes, and
+    lazily loaded functions import their file on first call.
+    """
+    __slots__ = ("file_path", "name", "_function")
+
+    def __init__(self, file_path: str, name: str):
+        self.file_path = file_path
+        self.name = name
+        self._function: Optional[callable] = None
+
+    def __getstate__(self) -> tuple[str, str]:
+        return self.file_path, self.name
+
+    def __setstate__(self, state: tuple[str, str]) -> None:
+        self.file_path, self.name = state
+        self._function = None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, _ModuleFunction):
+            return NotImplemented
+        return (self.file_path, self.name) == (other.file_path, other.name)
+
+    def __hash__(self) -> int:
+        return hash((self.file_path, self.name))
+
+    def load(self) -> callable:
+        """
+        Get the function, loading its file if needed.
+        """
+        if self._function is None:
+            with _loaded_modules_lock:
+                module = _loaded_modules.get(self.file_path)
+                if module is None:
+                    module = _loaded_modules[self.file_path] = _load_module(self.file_path)
+            self._function = getattr(module, self.name)
+        return self._function
+
+    def __call__(self, *args, **kwargs) -> ValidOutput:
+        return self.load()(*args, **kwargs)
+
+# Versions of the registry entries of this process
+_next_entry_version = itertools.count(1).__next__
+
+def _is_cache_key_of(entry: "_RegistryEntry", key: object) -> bool:
+    return type(key) is tuple and len(key) == 3 and key[0] == entry.name and key[1] == entry.version
+
+class _RegistryEntry:
+    """
+    Registration details of a function in the engine,
+    compiled once when the function is added so that
+    calls do not need to introspect the function.
+
+    name: str
+        The name of the function.
+    function: callable
+        The registered function.
+    executor: Optional[str]
+        Where the function runs, one of EXECUTORS. None runs
+        the function inline for sequential calls and on the
+        thread pool for parallel calls.
+    target: callable
+        The picklable callable sent to worker processes.
+    cache: Optional[ResultCache]
+        The cache of the outputs of the function, if any.
+    validate: bool
+        Whether to bind and validate the parameters of
+        calls against the signature of the function.
+    timeout: Optional[float]
+        The number of seconds after which calls of the
+        function fail with a FunctionTimeoutError, if any.
+    limiter: Optional[ConcurrencyLimiter]
+        The limit of concurrent calls of the function, if any.
+    pure: bool
+        Whether the output of the function only depends on
+        its parameters, and calling it has no side effects.
+
+    Each entry gets a new version, which is part of the
+    cache keys of its outputs.
+    """
+    __slots__ = (
+        "name", "function", "executor", "target", "cache",
+        "timeout", "limiter", "signature", "required", "allowed",
+        "validators", "tool", "batch", "batcher", "pure", "version"
+    )
+
+    def __init__(
+            self,
+            name: str,
+            function: callable,
+            executor: Optional[str] = None,
+            target: Optional[callable] = None,
+            cache: Optional[ResultCache] = None,
+            validate: bool = True,
+            timeout: Optional[float] = None,
+            limiter: Optional[ConcurrencyLimiter] = None,
+            pure: bool = False
+        ):
+        self.name = name
+        self.function = function
+        self.executor = executor
+        self.target = target if target is not None else function
+        self.cache = cache
+        self.timeout = timeout
+        self.limiter = limiter
+        self.signature: Optional[inspect.Signature] = None
+        self.required: frozenset[str] = frozenset()
+        self.allowed: Optional[frozenset[str]] = None
+        self.validators: tuple[tuple[str, SchemaValidator], ...] = ()
+        self.tool: Optional[tuple[dict, bytes]] = None
+        self.batch: Optional[_BatchEntry] = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.pure = pure
+        self.version = _next_entry_version()
+        if validate:
+            self._compile(function)
+
+    def _compile(self, function: callable) -> None:
+        """
+        Cache the signature of the function and build a
+        TypeAdapter for each of its annotated parameters.
+
+        function: callable
+            The function to be introspected.
+        """
+        try:
+            signature = inspect.signature(function)
+        except (TypeError, ValueError):
+            # Some builtins have no signature, their calls are not validated
+            return
+        try:
+            hints = typing.get_type_hints(function)
+        except Exception:
+            hints = {}
+
+        required, allowed, validators = set(), set(), []
+        for name, parameter in signature.parameters.items():
+            if parameter.kind is inspect.Parameter.VAR_KEYWORD:
+                allowed = None
+                continue
+            if parameter.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.VAR_POSITIONAL):
+                continue
+            if allowed is not None:
+                allowed.add(name)
+            if parameter.default is inspect.Parameter.empty:
+                required.add(name)
+            annotation = hints.get(name)
+            if annotation is not None and annotation is not typing.Any:
+                try:
+                    # The core validator skips the Python-level overhead of TypeAdapter
+                    validators.append((name, TypeAdapter(annotation).validator))
+                except Exception:
+                    # Types Pydantic cannot validate are passed as is
+                    pass
+
+        self.required = frozenset(required)
+        self.allowed = frozenset(allowed) if allowed is not None else None
+        self.validators = tuple(validators)
+        # Set last, as bind skips validation until the signature is set
+        self.signature = signature
+
+    @property
+    def validates(self) -> bool:
+        """
+        Whether calls of the function are validated.
+        """
+        return self.signature is not None
+
+    def get_tool(self) -> tuple[dict, bytes]:
+        """
+        Get the OpenAI tool schema of the function, as a
+        dictionary and as JSON bytes, building it once.
+        """
+        tool = self.tool
+        if tool is None:
+            schema = self._build_tool_schema()
+            tool = self.tool = (schema, serialize_tool_schema(schema))
+        return tool
+
+    def _build_tool_schema(self) -> dict:
+        return build_tool_schema(self.name, self.function)
+
+    def bind(self, parameters: dict[str, ValidParameter]) -> dict[str, ValidParameter]:
+        """
+        Check the parameters of a call against the signature of
+        the function and coerce them to the annotated types, e.g.
+        dictionaries to Pydantic models. The given dictionary is
+        copied before a value is replaced.
+
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the call.
+
+        Raises:
+            TypeError: If parameters are missing or unexpected.
+            ValueError: If a parameter does not match its annotation.
+        """
+        if self.signature is None:
+            return parameters
+
+        missing = self.required.difference(parameters)
+        if missing:
+            raise TypeError(f"{self.name}() missing required argument(s): {', '.join(sorted(missing))}")
+        if self.allowed is not None and not self.allowed.issuperset(parameters):
+            unexpected = set(parameters).difference(self.allowed)
+            raise TypeError(f"{self.name}() got unexpected argument(s): {', '.join(sorted(unexpected))}")
+
+        bound = parameters
+        for name, validator in self.validators:
+            if name not in parameters:
+                continue
+            value = parameters[name]
+            try:
+                coerced = validator.validate_python(value)
+            except ValidationError as e:
+                raise ValueError(f"Invalid argument {name!r} for {self.name}(): {e}") from e
+            if coerced is not value:
+                if bound is parameters:
+                    bound = dict(parameters)
+                bound[name] = coerced
+        return bound
+
+class _LazyRegistryEntry(_RegistryEntry):
+    """
+    Registry entry of a function found by scanning the
+    source of its module. The module is imported, and the
+    function compiled, on the first call of the function.
+
+    name: str
+        The name of the function.
+    function: _ModuleFunction
+        The lazy reference to the function.
+    info: FunctionInfo
+        The scanned signature of the function.
+    executor: Optional[str]
+        Where the function runs, one of EXECUTORS.
+    cache: Optional[ResultCache]
+        The cache of the outputs of the function, if any.
+    validate: bool
+        Whether to bind and validate the parameters of calls.
+    timeout: Optional[float]
+        The timeout of calls of the function, if any.
+    limiter: Optional[ConcurrencyLimiter]
+        The limit of concurrent calls of the function, if any.
+    """
+    __slots__ = ("info", "pending", "compile_lock")
+
+    def __init__(
+            self,
+            name: str,
+            function: _ModuleFunction,
+            info: FunctionInfo,
+            executor: Optional[str] = None,
+            cache: Optional[ResultCache] = None,
+            validate: bool = True,
+            timeout: Optional[float] = None,
+            limiter: Optional[ConcurrencyLimiter] = None
+        ):
+        super().__init__(
+            name,
+            function,
+            executor=executor,
+            cache=cache,
+            validate=False,
+            timeout=timeout,
+            limiter=limiter
+        )
+        self.info = info
+        self.pending = validate
+        self.compile_lock = threading.Lock()
+        # Known before the import, e.g. to check calls ahead of time
+        self.required = frozenset(info.required)
+        self.allowed = frozenset(info.parameters) if not info.var_keyword else None
+
+    @property
+    def validates(self) -> bool:
+        return self.pending or self.signature is not None
+
+    def _build_tool_schema(self) -> dict:
+        # Built from the scan, so that the module is not imported
+        return build_tool_schema_from_info(self.info)
+
+    def bind(self, parameters: dict[str, ValidParameter]) -> dict[str, ValidParameter]:
+        if self.pending:
+            with self.compile_lock:
+                if self.pending:
+                    self._compile(self.function.load())
+                    self.pending = False
+        return super().bind(parameters)
+
+class _BatchEntry(_RegistryEntry):
+    """
+    Registry entry of the batch implementation of a function,
+    which is called once with the list of the parameters of
+    coalesced calls and returns the list of their outputs.
+    It runs on the executor of the function, and shares its
+    timeout and concurrency limit.
+
+    name: str
+        The name of the function.
+    function: callable
+        The batch implementation.
+    executor: Optional[str]
+        Where the batch implementation runs, one of EXECUTORS.
+    timeout: Optional[float]
+        The timeout of the batch calls, if any.
+    limiter: Optional[ConcurrencyLimiter]
+        The limit of concurrent calls of the function, if any.
+
+    Raises:
+        TypeError: If the batch implementation takes no parameter.
+    """
+    __slots__ = ("parameter",)
+
+    def __init__(
+            self,
+            name: str,
+            function: callable,
+            executor: Optional[str] = None,
+            timeout: Optional[float] = None,
+            limiter: Optional[ConcurrencyLimiter] = None
+        ):
+        super().__init__(name, function, executor=executor, validate=False, timeout=timeout, limiter=limiter)
+        try:
+            parameters = list(inspect.signature(function).parameters)
+        except (TypeError, ValueError):
+            parameters = []
+        if not parameters:
+            raise TypeError(f"The batch implementation of {name}() must take the list of calls as its first parameter")
+        # The list is passed by keyword, like the parameters of other calls
+        self.parameter = parameters[0]
+
+class _Coalescing(NamedTuple):
+    """
+    Calls of a plan that run as batch calls.
+
+    batches: dict[int, tuple[int, ...]]
+        The indices of the calls coalesced with each call, by index.
+    dependencies: list[set[int]]
+        The indices of the calls each call depends on.
+    order: list[int]
+        The indices of the calls by depth in the dependency
+        graph, so that calls come after their dependencies.
+    """
+    batches: dict[int, tuple[int, ...]]
+    dependencies: list[set[int]]
+    order: list[int]
+
 class FunctionCallingEngine:
     """
     Engine to call functions extracted 
@@ -100,154 +714,2603 @@ class FunctionCallingEngine:
     an isolated environment. The engine
     will store the functions and their
     outputs in memory. 
+
+    The functions are shared by any number of sessions
+    created with create_session, which each own their
+    outputs. Registering functions replaces the function
+    dictionaries instead of mutating them, so sessions
+    calling functions from other threads always see a
+    consistent registry.
+
+    max_workers: Optional[int]
+        The maximum number of threads used to run
+        independent function calls in parallel and
+        functions registered with the "thread" executor.
+        Defaults to the ThreadPoolExecutor default.
+    max_processes: Optional[int]
+        The maximum number of processes used to run
+        functions registered with the "process" executor.
+        Defaults to the ProcessPoolExecutor default.
+    cache_size: int
+        The maximum number of outputs in the shared cache
+        of functions registered with cache=True.
+    cache_ttl: Optional[float]
+        The number of seconds after which outputs in the
+        shared cache expire. Outputs never expire if None.
+    output_store: Optional[Callable[[], MutableMapping]]
+        Factory of the mapping that stores the outputs of a
+        session, e.g. a BoundedOutputStore with a memory budget.
+        Defaults to a plain dictionary.
+    instrumentation: Optional[Instrumentation]
+        Hooks and metrics around parsing and function calls.
+        Disabled if None.
+    json_backend: Optional[str]
+        The JSON decoder of the engine, one of "orjson",
+        "msgspec" or "json". Defaults to "json", as orjson
+        and msgspec reject NaN, Infinity and integers
+        beyond 64 bits.
+    plan_timeout: Optional[float]
+        The default number of seconds after which a plan of
+        function calls fails with a FunctionTimeoutError,
+        see call_functions. Plans have no timeout if None.
+    reference_mode: str
+        How parameters reference the outputs of earlier calls.
+        In the "implicit" mode, top-level string parameters
+        equal to the name of an output are replaced by the
+        output. In the "explicit" mode, {"$ref": "name"}
+        objects at any depth are replaced by the output, or
+        a key, attribute or index of it as in "user.name" or
+        "results[0]", while strings are always passed as is.
+    plan_cache_size: int
+        The maximum number of parsed plans kept in the plan
+        cache, keyed by a hash of the raw JSON they were parsed
+        from, so that byte-identical responses skip decoding and
+        validation. Cached plans are tuples of function calls
+        shared by every response they are parsed from, so
+        functions must not modify their arguments in place.
+        Disabled if 0.
+    shared_memory_min_size: Optional[int]
+        If set, outputs with buffers of at least this many bytes,
+        such as NumPy arrays or bytes, are kept in shared memory
+        and passed to and from functions running on the process
+        pool by handle instead of being pickled and copied. The
+        outputs of sessions are then stored in a
+        SharedMemoryOutputStore by default, which removes the
+        shared memory of its outputs on reset.
+    preflight: bool
+        Whether plans are checked before their first function
+        call runs, so that an invalid call at the end of a plan
+        raises a PlanValidationError listing every problem of
+        the plan instead of failing after the calls before it
+        ran. See validate_function_calls. In the "implicit"
+        reference mode, a string naming no output is passed
+        as is, so references cannot be checked and a call
+        whose argument depends on one still runs.
     """
-    def __init__(self):
+    def __init__(
+            self,
+            max_workers: Optional[int] = None,
+            max_processes: Optional[int] = None,
+            cache_size: int = 1024,
+            cache_ttl: Optional[float] = None,
+            output_store: Optional[Callable[[], MutableMapping]] = None,
+            instrumentation: Optional[Instrumentation] = None,
+            json_backend: Optional[str] = None,
+            plan_timeout: Optional[float] = None,
+            reference_mode: str = "implicit",
+            plan_cache_size: int = 0,
+            shared_memory_min_size: Optional[int] = None,
+            preflight: bool = True
+        ):
+        if reference_mode not in REFERENCE_MODES:
+            raise ValueError(f"Invalid reference mode {reference_mode!r}, expected one of {REFERENCE_MODES}")
         self.functions: dict[str, callable] = {}
-        self.outputs: dict[str, ValidOutput] = {}
+        self.instrumentation = instrumentation
+        self.json_backend = get_json_backend(json_backend)
+        self.shared_memory_min_size = shared_memory_min_size
+        if output_store is None:
+            if shared_memory_min_size is not None:
+                output_store = partial(SharedMemoryOutputStore, shared_memory_min_size)
+            else:
+                output_store = dict
+        self.output_store = output_store
+        self.outputs: MutableMapping[str, ValidOutput] = self.output_store()
+        self.max_workers = max_workers
+        self.max_processes = max_processes
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.plan_timeout = plan_timeout
+        self.reference_mode = reference_mode
+        self.plan_cache = ResultCache(plan_cache_size) if plan_cache_size > 0 else None
+        self.preflight = preflight
+        self.sessions: dict[str, Session] = {}
+        self._registry: dict[str, _RegistryEntry] = {}
+        # Names of the functions with a batch implementation
+        self._batched: frozenset[str] = frozenset()
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # Class of the sessions created by create_session
+    session_class = Session
 
     def reset_session(self) -> None:
         """
-        Reset the session of the engine.
+        Reset the session of the engine. The cache
+        of function outputs is kept.
+        """
+        close = getattr(self.outputs, "close", None)
+        if close is not None:
+            close()
+        self.outputs = self.output_store()
+
+    def create_session(self, session_id: Optional[str] = None, ttl: Optional[float] = None) -> Session:
+        """
+        Create a session that shares the functions of the
+        engine but has its own outputs.
+
+        session_id: Optional[str]
+            The ID of the session. A random ID is generated if None.
+        ttl: Optional[float]
+            The number of idle seconds after which the session
+            expires. Sessions never expire if None.
+
+        Raises:
+            ValueError: If a session with the same ID exists.
+        """
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        session = self.session_class(self, session_id, ttl)
+        with self._lock:
+            if session_id in self.sessions:
+                raise ValueError(f"Session {session_id} already exists")
+            self.sessions[session_id] = session
+        return session
+
+    def restore_session(
+            self,
+            snapshots: Union[SnapshotInput, Iterable[SnapshotInput]],
+            session_id: Optional[str] = None,
+            ttl: Optional[float] = None
+        ) -> Session:
+        """
+        Create a session with the outputs of snapshots taken
+        with session.snapshot, e.g. in another process. Further
+        incremental snapshots of the session apply to the last
+        of the snapshots.
+
+        snapshots: Union[SnapshotInput, Iterable[SnapshotInput]]
+            A full snapshot, or a full snapshot followed by
+            the incremental snapshots taken after it.
+        session_id: Optional[str]
+            The ID of the session. Defaults to the ID of the
+            session the snapshots were taken from.
+        ttl: Optional[float]
+            The number of idle seconds after which the session
+            expires. Sessions never expire if None.
+
+        Raises:
+            ValueError: If the snapshots are invalid or do not
+                apply to each other, or if a session with the
+                same ID exists.
+        """
+        if isinstance(snapshots, (bytes, bytearray, memoryview, mmap.mmap)):
+            snapshots = [snapshots]
+        outputs = self.output_store()
+        try:
+            outputs, checkpoint, snapshot_session_id = restore_outputs(snapshots, outputs)
+            session = self.create_session(session_id or snapshot_session_id, ttl)
+        except BaseException:
+            close = getattr(outputs, "close", None)
+            if close is not None:
+                close()
+            raise
+        session.close()
+        session.outputs = outputs
+        session.checkpoint = checkpoint
+        return session
+
+    def get_session(self, session_id: str) -> Session:
+        """
+        Get a session of the engine and mark it as used.
+
+        session_id: str
+            The ID of the session.
+
+        Raises:
+            KeyError: If the session does not exist or expired.
+        """
+        session = self.sessions.get(session_id)
+        if session is None or session.expired:
+            if session is not None:
+                self.close_session(session_id)
+            raise KeyError(f"Session {session_id} not found")
+        session.touch()
+        return session
+
+    def close_session(self, session_id: str) -> None:
+        """
+        Close a session of the engine and release its outputs.
+        Closing a session that does not exist does nothing.
+
+        session_id: str
+            The ID of the session.
+        """
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def expire_sessions(self) -> int:
+        """
+        Close the sessions that have been idle for longer
+        than their TTL, and return how many were closed.
+        """
+        with self._lock:
+            expired = [session for session in self.sessions.values() if session.expired]
+            for session in expired:
+                del self.sessions[session.session_id]
+        for session in expired:
+            session.close()
+        return len(expired)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down the thread and process pools of the engine.
+        The pools are recreated when they are needed again.
+
+        wait: bool
+            Whether to wait for running calls to finish.
+        """
+        for entry in self._registry.values():
+            if entry.batcher is not None:
+                # Send the queued calls while the pools are up
+                entry.batcher.flush()
+        with self._lock:
+            pools = [self._thread_pool, self._process_pool]
+            self._thread_pool = self._process_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        """
+        Get the thread pool of the engine, creating it if needed.
+        """
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="tiny_fnc_engine"
+                )
+            return self._thread_pool
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """
+        Get the process pool of the engine, creating it if needed.
+        """
+        with self._lock:
+            if self._process_pool is None:
+                if self.shared_memory_min_size is not None:
+                    ensure_tracker()
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_processes)
+            return self._process_pool
+
+    def _get_process_call(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter]
+        ) -> tuple[callable, dict[str, ValidParameter]]:
+        """
+        Get the callable and parameters sent to a worker process
+        for a call, passing shared outputs by handle if enabled.
+        Outputs of the callable go through shared.load.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        """
+        if self.shared_memory_min_size is None:
+            return entry.target, parameters
+        return SharedCall(entry.target, self.shared_memory_min_size), to_handles(parameters)
+
+    @staticmethod
+    def _check_executor(executor: Optional[str]) -> None:
+        if executor is not None and executor not in EXECUTORS:
+            raise ValueError(f"Executor must be one of {EXECUTORS}, got {executor!r}")
+
+    def _get_entry(self, name: str) -> _RegistryEntry:
+        """
+        Get the registry entry of a function.
+
+        name: str
+            The name of the function.
+
+        Raises:
+            KeyError: If the function is not in the engine.
+        """
+        try:
+            function = self.functions[name]
+        except KeyError:
+            raise KeyError(f"Function {name}() is not in the engine") from None
+        entry = self._registry.get(name)
+        if entry is None or entry.function is not function:
+            # The function was set on self.functions directly
+            with self._lock:
+                # Another thread may have published the entry meanwhile
+                entry = self._registry.get(name)
+                if entry is None or entry.function is not function:
+                    entry = _RegistryEntry(name, function)
+                    self._registry = registry = {**self._registry, name: entry}
+                    self._batched = frozenset(key for key, other in registry.items() if other.batch is not None)
+        return entry
+
+    def _register(self, entries: list[_RegistryEntry], build_tools: bool = True) -> None:
+        """
+        Publish registry entries by replacing the function
+        dictionaries, so that concurrent calls never see a
+        partially updated registry.
+
+        entries: list[_RegistryEntry]
+            The registry entries to be published.
+        build_tools: bool
+            Whether to build the tool schemas of the entries now.
         """
-        self.outputs = {}
+        if build_tools:
+            for entry in entries:
+                entry.get_tool()
+        with self._lock:
+            functions, registry = dict(self.functions), dict(self._registry)
+            replaced = [registry[entry.name] for entry in entries if entry.name in registry]
+            for entry in entries:
+                functions[entry.name] = entry.function
+                registry[entry.name] = entry
+            self._registry = registry
+            self._batched = frozenset(name for name, entry in registry.items() if entry.batch is not None)
+            self.functions = functions
+        # Cached outputs of replaced functions can no longer be hit
+        for entry in replaced:
+            if entry.cache is not None:
+                entry.cache.discard_where(partial(_is_cache_key_of, entry))
+
+    def _get_cache(self, cache: Union[bool, ResultCache]) -> Optional[ResultCache]:
+        if isinstance(cache, ResultCache):
+            return cache
+        return self.cache if cache else None
+
+    @staticmethod
+    def _get_limiter(max_concurrency: Optional[Union[int, ConcurrencyLimiter]]) -> Optional[ConcurrencyLimiter]:
+        if max_concurrency is None or isinstance(max_concurrency, ConcurrencyLimiter):
+            return max_concurrency
+        return ConcurrencyLimiter(max_concurrency)
     
-    def add_functions(self, functions: list[callable]) -> None:
+    def add_functions(
+            self,
+            functions: list[callable],
+            executor: Optional[str] = None,
+            cache: Union[bool, ResultCache] = False,
+            validate: bool = True,
+            timeout: Optional[float] = None,
+            max_concurrency: Optional[Union[int, ConcurrencyLimiter]] = None,
+            batch_functions: Optional[dict[str, callable]] = None,
+            max_batch_size: Optional[int] = None,
+            max_batch_wait: float = DEFAULT_MAX_WAIT,
+            pure: bool = False
+        ) -> None:
         """
-        Add functions to the engine.
+        Add functions to the engine. The signature and type
+        hints of each function are introspected once here,
+        so that calls can be validated without introspection.
 
         functions: list[callable]
             List of functions to be added to the engine.
+        executor: Optional[str]
+            Where the functions run when called: "inline" in
+            the calling thread, "thread" on the thread pool or
+            "process" on the process pool of the engine. Functions
+            sent to the process pool, and their parameters and
+            outputs, must be picklable.
+        cache: Union[bool, ResultCache]
+            Whether to cache the outputs of the functions, keyed
+            by a hash of their resolved parameters. True uses the
+            shared cache of the engine, while a ResultCache gives
+            the functions their own cache. Only use this for pure
+            functions, as cached outputs are returned as is.
+        validate: bool
+            Whether to check the parameters of calls against the
+            signatures of the functions, and coerce them to the
+            annotated types (e.g. dictionaries to Pydantic models).
+        timeout: Optional[float]
+            The number of seconds after which a call of one of the
+            functions fails with a FunctionTimeoutError. Functions
+            with a timeout run on the thread pool when they would
+            run inline, so that the caller can stop waiting. The
+            thread itself cannot be interrupted and keeps running
+            the function until it returns.
+        max_concurrency: Optional[Union[int, ConcurrencyLimiter]]
+            The maximum number of calls of each function running
+            at the same time, across all sessions of the engine.
+            Further calls wait for a slot in first-in first-out
+            order. An int gives each function its own limit, while
+            a ConcurrencyLimiter is shared by the functions, e.g.
+            to protect a backend they all call, and can bound the
+            queue of waiting calls. Unlimited if None.
+        batch_functions: Optional[dict[str, callable]]
+            Batch implementations of some of the functions, by
+            name. A batch implementation takes the list of the
+            validated parameters of several calls, as dictionaries,
+            and returns the list of their outputs in the same order.
+            Calls to the same function in a plan that do not depend
+            on each other are coalesced into one call of its batch
+            implementation, e.g. to embed ten passages in one
+            request, and each output is stored under the returns
+            of its own call. Batch calls run on the executor of
+            the function, and count as one call for its timeout
+            and concurrency limit.
+        max_batch_size: Optional[int]
+            If set, every call of a function with a batch
+            implementation, from any session, waits in a queue
+            until max_batch_size calls are queued or it waited
+            for max_batch_wait seconds, and the queued calls
+            are sent together as one batch call on the thread
+            pool, or the process pool with the "process"
+            executor. See get_batch_stats for the fill ratio
+            and queueing delay of the batches.
+        max_batch_wait: float
+            The maximum number of seconds a call waits for
+            other calls to join its batch.
+        pure: bool
+            Whether the outputs of the functions only depend on
+            their parameters, and calling them has no side
+            effects, so that optimize_function_calls may merge
+            identical calls and skip calls with unused outputs.
+
+        Raises:
+            ValueError: If a batch implementation has no function,
+                or if max_batch_size is not positive.
+            TypeError: If a batch implementation takes no parameter,
+                or if a queued batch implementation is a coroutine function.
+        """
+        self._check_executor(executor)
+        cache = self._get_cache(cache)
+        entries = [
+            _RegistryEntry(
+                function.__name__,
+                function,
+                executor=executor,
+                cache=cache,
+                validate=validate,
+                timeout=timeout,
+                limiter=self._get_limiter(max_concurrency),
+                pure=pure
+            )
+            for function in functions
+        ]
+        if batch_functions:
+            unknown = set(batch_functions).difference(entry.name for entry in entries)
+            if unknown:
+                raise ValueError(f"Batch implementations without a function: {', '.join(sorted(unknown))}")
+            for entry in entries:
+                batch_function = batch_functions.get(entry.name)
+                if batch_function is not None:
+                    entry.batch = _BatchEntry(entry.name, batch_function, executor, timeout, entry.limiter)
+                    if max_batch_size is not None:
+                        entry.batcher = self._create_batcher(entry, batch_function, max_batch_size, max_batch_wait)
+        self._register(entries)
+
+    def _create_batcher(
+            self,
+            entry: _RegistryEntry,
+            batch_function: callable,
+            max_batch_size: int,
+            max_batch_wait: float
+        ) -> MicroBatcher:
+        """
+        Create the queue grouping the calls of a function
+        into calls of its batch implementation.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        batch_function: callable
+            The batch implementation of the function.
+        max_batch_size: int
+            The maximum number of calls in a batch.
+        max_batch_wait: float
+            The maximum number of seconds a call waits for a batch.
+
+        Raises:
+            TypeError: If the batch implementation is a coroutine function.
+        """
+        if inspect.iscoroutinefunction(batch_function):
+            raise TypeError(f"The queued batch implementation of {entry.name}() must not be a coroutine function")
+        # Batches are sent from the timer thread, which must not run them
+        executor = "process" if entry.executor == "process" else "thread"
+        batch = _BatchEntry(entry.name, batch_function, executor, entry.timeout, entry.limiter)
+        return MicroBatcher(partial(self._submit_batch_calls, batch), max_batch_size, max_batch_wait)
+
+    def _submit_batch_calls(self, entry: _BatchEntry, calls: list[dict[str, ValidParameter]]) -> Future:
+        return self._submit(entry, {entry.parameter: calls})
+
+    def get_batch_stats(self) -> dict[str, BatchStats]:
         """
-        for function in functions:
-            self.functions[function.__name__] = function
+        Get the counters of the batches of each function
+        registered with max_batch_size, by name.
+        """
+        return {name: entry.batcher.stats for name, entry in self._registry.items() if entry.batcher is not None}
 
-    def add_functions_from_file(self, file_path: str) -> None:
+    def add_functions_from_file(
+            self,
+            file_path: str,
+            executor: Optional[str] = None,
+            cache: Union[bool, ResultCache] = False,
+            validate: bool = True,
+            lazy: bool = False,
+            manifest: Optional[Union[str, ToolManifest]] = None,
+            timeout: Optional[float] = None,
+            max_concurrency: Optional[Union[int, ConcurrencyLimiter]] = None
+        ) -> None:
         """
         Add functions to the engine from a specified .py file.
 
         file_path: str
             The path to the .py file containing the functions to be added.
+        executor: Optional[str]
+            Where the functions run when called, see add_functions.
+            Worker processes load the file themselves.
+        cache: Union[bool, ResultCache]
+            Whether to cache the outputs of the functions, see add_functions.
+        validate: bool
+            Whether to validate the parameters of calls, see add_functions.
+        lazy: bool
+            Whether to scan the source of the file instead of
+            running it, see add_functions_from_directory.
+        manifest: Optional[Union[str, ToolManifest]]
+            The manifest of scanned files for lazy loading,
+            or the path of its JSON file.
+        timeout: Optional[float]
+            The timeout of calls of the functions, see add_functions.
+        max_concurrency: Optional[Union[int, ConcurrencyLimiter]]
+            The limit of concurrent calls of the functions, see add_functions.
 
         Raises:
             FileNotFoundError: If the specified file does not exist.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File {file_path} not found")
+        self._check_executor(executor)
+        if lazy:
+            self._add_lazy_functions([file_path], executor, cache, validate, manifest, timeout, max_concurrency)
+            return
+        cache = self._get_cache(cache)
 
-        # Use importlib.util to load the module
-        module_name = os.path.basename(file_path).split('.')[0]
-        spec = importlib.util.spec_from_file_location(module_name, file_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        module = _load_module(file_path)
 
         # Get the user defined functions
-        for name, obj in module.__dict__.items():
-            if callable(obj) and not name.startswith("__") and name != "add_functions_from_file":
-                self.functions[name] = obj
-
-    def call_function(self, function_call: FunctionCall) -> ValidOutput:
-        """
-        Call a function from the engine.
+        self._register([
+            _RegistryEntry(
+                name,
+                obj,
+                executor=executor,
+                target=_ModuleFunction(os.path.abspath(file_path), name),
+                cache=cache,
+                validate=validate,
+                timeout=timeout,
+                limiter=self._get_limiter(max_concurrency)
+            )
+            for name, obj in module.__dict__.items()
+            if callable(obj) and not name.startswith("__") and name != "add_functions_from_file"
+        ])
 
-        function_call: FunctionCall
-            The function call to be executed.
+    def add_functions_from_directory(
+            self,
+            directory: str,
+            pattern: str = "**/*.py",
+            executor: Optional[str] = None,
+            cache: Union[bool, ResultCache] = False,
+            validate: bool = True,
+            manifest: Optional[Union[str, ToolManifest]] = None,
+            timeout: Optional[float] = None,
+            max_concurrency: Optional[Union[int, ConcurrencyLimiter]] = None
+        ) -> None:
         """
-        # Get the function and its parameters
-        function = self.functions[function_call.name]
-        parameters = function_call.parameters  # This is already a dict, no need to process it
-
-        # Check if any of the parameters are outputs from previous functions
-        for key, value in parameters.items():
-            if isinstance(value, str) and value in self.outputs:
-                parameters[key] = self.outputs[value]
+        Add the functions of the .py files of a directory to
+        the engine without importing them. The source of each
+        file is scanned with ast for public functions defined
+        at its top level, and a lazy stub is registered for
+        each of them, which imports the file on the first call
+        of one of its functions. Imported names, classes and
+        names starting with an underscore are not registered,
+        and neither are files and directories starting with an
+        underscore, such as __init__.py.
 
-        # Call the function
-        output = function(**parameters)  # Use ** to unpack the dictionary as keyword arguments
+        directory: str
+            The directory containing the .py files.
+        pattern: str
+            The glob pattern of the files, relative to the
+            directory. Subdirectories are searched by default.
+        executor: Optional[str]
+            Where the functions run when called, see add_functions.
+        cache: Union[bool, ResultCache]
+            Whether to cache the outputs of the functions, see add_functions.
+        validate: bool
+            Whether to validate the parameters of calls, see add_functions.
+            Validation is compiled when a function is first called.
+        manifest: Optional[Union[str, ToolManifest]]
+            The manifest of scanned files, or the path of its
+            JSON file, which is written after the scan. Files
+            that did not change since they were saved in the
+            manifest are not scanned again.
+        timeout: Optional[float]
+            The timeout of calls of the functions, see add_functions.
+        max_concurrency: Optional[Union[int, ConcurrencyLimiter]]
+            The limit of concurrent calls of the functions, see add_functions.
 
-        # Store the output
-        if function_call.returns:
-            if len(function_call.returns) == 1:
-                self.outputs[function_call.returns[0].name] = output
-            else:
-                for i, return_value in enumerate(function_call.returns):
-                    self.outputs[return_value.name] = output[i]
-        
-        return output
-    
-    def call_functions(self, function_calls: list[FunctionCall]) -> list[ValidOutput]:
+        Raises:
+            NotADirectoryError: If the directory does not exist.
+            SyntaxError: If a file cannot be parsed.
         """
-        Call multiple functions from the engine.
+        self._check_executor(executor)
+        self._add_lazy_functions(
+            find_source_files(directory, pattern),
+            executor,
+            cache,
+            validate,
+            manifest,
+            timeout,
+            max_concurrency
+        )
 
-        function_calls: list[FunctionCall]
-            The function calls to be executed.
+    def _add_lazy_functions(
+            self,
+            file_paths: list[str],
+            executor: Optional[str],
+            cache: Union[bool, ResultCache],
+            validate: bool,
+            manifest: Optional[Union[str, ToolManifest]],
+            timeout: Optional[float] = None,
+            max_concurrency: Optional[Union[int, ConcurrencyLimiter]] = None
+        ) -> None:
         """
-        outputs = []
-        for function_call in function_calls:
-            output = self.call_function(function_call)
-            outputs.append(output)
-        return outputs
-    
-    def _convert_openai_tool_call(self, tool_call: dict) -> FunctionCall:
-        """
-        Convert an OpenAI tool call to a FunctionCall.
+        Register lazy stubs for the functions of source files.
 
-        tool_call: dict
-            The OpenAI tool call to be converted.
+        file_paths: list[str]
+            The paths of the source files.
+        executor: Optional[str]
+            Where the functions run when called.
+        cache: Union[bool, ResultCache]
+            Whether to cache the outputs of the functions.
+        validate: bool
+            Whether to validate the parameters of calls.
+        manifest: Optional[Union[str, ToolManifest]]
+            The manifest of scanned files, or the path of its JSON file.
+        timeout: Optional[float]
+            The timeout of calls of the functions.
+        max_concurrency: Optional[Union[int, ConcurrencyLimiter]]
+            The limit of concurrent calls of the functions.
         """
-        function = tool_call['function']
-        arguments = json.loads(function['arguments']) if isinstance(function['arguments'], str) else function['arguments']
-        return FunctionCall(
-            name=function['name'],
-            parameters=arguments,
-            returns=None  # OpenAI tool calls do not specify returns
-        )
+        if not isinstance(manifest, ToolManifest):
+            manifest = ToolManifest(manifest)
+        cache = self._get_cache(cache)
 
-    def parse_function_calls(self, function_calls: Union[dict, list[dict]]) -> list[FunctionCall]:
-        """
-        Parse either a single function call or
-        a list of function calls.
+        entries = []
+        for file_path in file_paths:
+            file_path = os.path.abspath(file_path)
+            for info in manifest.scan(file_path):
+                entries.append(_LazyRegistryEntry(
+                    info.name,
+                    _ModuleFunction(file_path, info.name),
+                    info,
+                    executor=executor,
+                    cache=cache,
+                    validate=validate,
+                    timeout=timeout,
+                    limiter=self._get_limiter(max_concurrency)
+                ))
+        manifest.save()
+        self._register(entries)
 
-        function_calls: Union[dict, list[dict]]
-            The function call(s) to be parsed.
+    def get_tools(self, names: Optional[Iterable[str]] = None) -> list[dict]:
         """
-        if isinstance(function_calls, dict):
-            function_calls = [function_calls]
-        elif not isinstance(function_calls, list):
-            raise TypeError("Input must be a dictionary or a list of dictionaries")
+        Get the OpenAI tool schemas of functions, to be passed
+        as the "tools" of a chat completion request. Schemas are
+        built from the signature, type hints, Pydantic models and
+        docstring of each function when it is added, and shared
+        between calls, so they must not be modified.
 
-        parsed_calls = []
-        for call in function_calls:
-            if 'id' in call and 'function' in call and 'type' in call:
-                parsed_calls.append(self._convert_openai_tool_call(call))
-            else:
-                try:
-                    parsed_calls.append(FunctionCall(**call))
-                except Exception:
-                    raise ValueError(INVALID_FUNCTION_CALL_ERROR)
-        
-        return parsed_calls
+        names: Optional[Iterable[str]]
+            The names of the functions, e.g. the tools allowed in
+            a session. Defaults to all functions of the engine.
 
-    def parse_and_call_functions(
-            self, 
-            function_calls: Union[dict, list[dict], str],
-            verbose: bool = False
-        ) -> list[ValidOutput]:
+        Raises:
+            KeyError: If a function is not in the engine.
         """
-        Parse and call either a single function call or
-        a list of function calls.
+        return [entry.get_tool()[0] for entry in self._get_tool_entries(names)]
 
-        function_calls: Union[dict, list[dict]]
-            The function call(s) to be parsed and called.
+    def get_tools_json(self, names: Optional[Iterable[str]] = None) -> bytes:
         """
-        if isinstance(function_calls, str): 
-            function_calls = json.loads(function_calls)
+        Get the OpenAI tool schemas of functions as a JSON
+        array, joined from the pre-serialized schema of each
+        function without serializing them again.
 
-        function_calls = self.parse_function_calls(function_calls)
+        names: Optional[Iterable[str]]
+            The names of the functions, see get_tools.
 
-        if verbose:
+        Raises:
+            KeyError: If a function is not in the engine.
+        """
+        return b"[" + b",".join(entry.get_tool()[1] for entry in self._get_tool_entries(names)) + b"]"
+
+    def _get_tool_entries(self, names: Optional[Iterable[str]]) -> list[_RegistryEntry]:
+        if names is None:
+            names = list(self.functions)
+        return [self._get_entry(name) for name in names]
+
+    def _resolve_parameters(
+            self,
+            function_call: FunctionCall,
+            outputs: MutableMapping[str, ValidOutput]
+        ) -> dict[str, ValidParameter]:
+        """
+        Replace the parameters of a function call that
+        reference outputs of previous function calls.
+        The parameters of the function call are not modified.
+
+        function_call: FunctionCall
+            The function call whose parameters are resolved.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+
+        Raises:
+            KeyError: If an explicit reference cannot be resolved.
+        """
+        parameters = function_call.parameters
+        if self.reference_mode == "implicit":
+            # Top-level strings are resolved directly, compiling and
+            # caching them would cost more than the lookups
+            resolved = None
+            for key, value in parameters.items():
+                if isinstance(value, str) and value in outputs:
+                    if resolved is None:
+                        resolved = dict(parameters)
+                    resolved[key] = outputs[value]
+            return parameters if resolved is None else resolved
+        references = self._compile_references(function_call)
+        if not references:
+            return parameters
+        return resolve_references(parameters, references, outputs)
+
+    def _compile_references(self, function_call: FunctionCall) -> tuple[Reference, ...]:
+        """
+        Get the references of a function call in the reference
+        mode of the engine, compiled on the first call.
+
+        function_call: FunctionCall
+            The function call to be compiled.
+
+        Raises:
+            ValueError: If a reference path is invalid.
+        """
+        explicit = self.reference_mode == "explicit"
+        slot = _COMPACT_REFERENCES_SLOT if type(function_call) is CompactCall else _REFERENCES_SLOT
+        try:
+            compiled_explicit, references = slot.__get__(function_call)
+            if compiled_explicit is explicit:
+                return references
+        except AttributeError:
+            pass
+        references = compile_references(function_call.parameters, explicit)
+        slot.__set__(function_call, (explicit, references))
+        return references
+
+    def _get_references(self, function_call: FunctionCall) -> set[str]:
+        """
+        Get the output names a function call may reference.
+
+        function_call: FunctionCall
+            The function call to be inspected.
+        """
+        return {reference.name for reference in self._compile_references(function_call)}
+
+    def _store_outputs(
+            self,
+            function_call: FunctionCall,
+            output: ValidOutput,
+            outputs: MutableMapping[str, ValidOutput]
+        ) -> None:
+        """
+        Store the output of a function call under its return names.
+
+        function_call: FunctionCall
+            The function call that produced the output.
+        output: ValidOutput
+            The output of the function call.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        """
+        if function_call.returns:
+            if len(function_call.returns) == 1:
+                outputs[function_call.returns[0].name] = output
+            else:
+                for i, return_value in enumerate(function_call.returns):
+                    outputs[return_value.name] = output[i]
+
+    def _get_cached(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter]
+        ) -> tuple[Optional[tuple], ValidOutput]:
+        """
+        Look up the cached output of a function call. Returns
+        the cache key, or None if the output is not cacheable,
+        and the cached output, or MISSING on a cache miss.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        """
+        if entry.cache is None:
+            return None, MISSING
+        key = make_cache_key(entry.name, parameters, entry.version)
+        if key is None:
+            return None, MISSING
+        return key, entry.cache.get(key)
+
+    @staticmethod
+    def _cache_output(entry: _RegistryEntry, key: tuple, future: Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            entry.cache.set(key, future.result())
+
+    def _submit(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter],
+            deadline: Optional[Deadline] = None
+        ) -> Future:
+        """
+        Submit a function to its executor, the thread pool by default.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        key, output = self._get_cached(entry, parameters)
+        if output is not MISSING:
+            future = Future()
+            future.set_result(output)
+            return future
+
+        if entry.batcher is not None:
+            future = self._submit_batched(entry, parameters, deadline)
+        elif entry.limiter is None and entry.timeout is None and deadline is None:
+            future = self._start(entry, parameters, entry.executor)
+        else:
+            future = self._submit_limited(entry, parameters, deadline)
+
+        if key is not None:
+            future.add_done_callback(partial(self._cache_output, entry, key))
+        return future
+
+    def _start(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter],
+            executor: Optional[str]
+        ) -> Future:
+        """
+        Start a function on an executor.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        executor: Optional[str]
+            Where the function runs, the thread pool if None.
+        """
+        if executor == "process":
+            target, parameters = self._get_process_call(entry, parameters)
+            future = self._get_process_pool().submit(target, **parameters)
+            if self.shared_memory_min_size is None:
+                return future
+            return self._load_shared(future)
+        if executor == "inline":
+            future = Future()
+            try:
+                future.set_result(entry.function(**parameters))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return self._get_thread_pool().submit(entry.function, **parameters)
+
+    @staticmethod
+    def _load_shared(execution: Future) -> Future:
+        """
+        Chain the future of a worker process call to a future
+        of its output, loaded from shared memory if needed.
+
+        execution: Future
+            The future of the call.
+        """
+        future = Future()
+
+        def done(execution: Future) -> None:
+            if execution.cancelled():
+                future.cancel()
+                future.set_running_or_notify_cancel()
+                return
+            try:
+                future.set_result(load(execution.result()))
+            except BaseException as e:
+                future.set_exception(e)
+
+        execution.add_done_callback(done)
+        return future
+
+    @staticmethod
+    def _submit_batched(
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter],
+            deadline: Optional[Deadline] = None
+        ) -> Future:
+        """
+        Queue a call of a function for its next batch call.
+        The batch call runs under the timeout and concurrency
+        limit of the function, and the deadline of the plan
+        is checked before the call is queued.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        if deadline is not None and deadline.remaining() <= 0:
+            future = Future()
+            future.set_exception(make_timeout_error(entry.name, entry.timeout, deadline, "plan"))
+            return future
+        return entry.batcher.submit(parameters)
+
+    def _submit_limited(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter],
+            deadline: Optional[Deadline]
+        ) -> Future:
+        """
+        Submit a function once a slot of its concurrency limit is
+        free, and fail the returned future with a FunctionTimeoutError
+        if the timeout of the function, or the deadline of its plan,
+        expires first. No thread is blocked while waiting.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+
+        Raises:
+            ConcurrencyLimitError: If the queue of the limit is full.
+        """
+        timeout, scope = get_call_timeout(entry.timeout, deadline)
+        result = Future()
+        if timeout is not None and timeout <= 0:
+            result.set_exception(make_timeout_error(entry.name, entry.timeout, deadline, scope))
+            return result
+
+        limiter = entry.limiter
+        started: list[Future] = []
+
+        def finish(execution: Future) -> None:
+            if limiter is not None:
+                limiter.release()
+            if execution.cancelled():
+                return
+            try:
+                if execution.exception() is not None:
+                    result.set_exception(execution.exception())
+                else:
+                    result.set_result(execution.result())
+            except InvalidStateError:
+                # The call timed out in the meantime
+                pass
+
+        def start(queued: bool) -> None:
+            if result.done():
+                # The call timed out while waiting for its slot
+                if limiter is not None:
+                    limiter.release()
+                return
+            executor = entry.executor
+            if executor in (None, "inline") and (queued or timeout is not None):
+                # Neither the releasing thread nor the caller may block on the function
+                executor = "thread"
+            try:
+                execution = self._start(entry, parameters, executor)
+            except Exception as e:
+                execution = Future()
+                execution.set_exception(e)
+            started.append(execution)
+            execution.add_done_callback(finish)
+
+        def expire() -> None:
+            if waiter is not None:
+                limiter.withdraw(waiter)
+            for execution in started:
+                execution.cancel()
+            try:
+                result.set_exception(make_timeout_error(entry.name, entry.timeout, deadline, scope))
+            except InvalidStateError:
+                pass
+
+        waiter = limiter.request(partial(start, True)) if limiter is not None else None
+        if waiter is None:
+            start(False)
+        if timeout is not None and not result.done():
+            timer = timers.schedule(timeout, expire)
+            result.add_done_callback(lambda _: timers.cancel(timer))
+        return result
+
+    def _execute(
+            self,
+            entry: _RegistryEntry,
+            parameters: dict[str, ValidParameter],
+            deadline: Optional[Deadline] = None
+        ) -> ValidOutput:
+        """
+        Run a function on its executor and wait for the output.
+        Functions without an executor run inline.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        parameters: dict[str, ValidParameter]
+            The resolved parameters of the function.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        if (
+            entry.executor in ("thread", "process") or entry.timeout is not None
+            or deadline is not None or entry.batcher is not None
+        ):
+            return self._submit(entry, parameters, deadline).result()
+
+        key, output = self._get_cached(entry, parameters)
+        if output is MISSING:
+            limiter = entry.limiter
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                output = entry.function(**parameters)  # Use ** to unpack the dictionary as keyword arguments
+            finally:
+                if limiter is not None:
+                    limiter.release()
+            if key is not None:
+                entry.cache.set(key, output)
+        return output
+
+    def _submit_call(
+            self,
+            function_call: FunctionCall,
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None
+        ) -> Future:
+        """
+        Resolve the parameters of a function call and
+        submit it with _submit.
+
+        function_call: FunctionCall
+            The function call to be submitted.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        entry = self._get_entry(function_call.name)
+        parameters = entry.bind(self._resolve_parameters(function_call, outputs))
+        return self._submit(entry, parameters, deadline)
+
+    def _call_function(
+            self,
+            function_call: FunctionCall,
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None
+        ) -> ValidOutput:
+        """
+        Call a function with the outputs of a session.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the call, if any.
+        """
+        instrumentation = self.instrumentation
+        span = instrumentation.start_call(function_call) if instrumentation is not None else None
+        try:
+            # Get the function and its parameters
+            entry = self._get_entry(function_call.name)
+            parameters = entry.bind(self._resolve_parameters(function_call, outputs))
+            if span is not None:
+                span.mark("resolve")
+
+            # Call the function
+            output = self._execute(entry, parameters, deadline)
+            if span is not None:
+                span.mark("execute")
+
+            # Store the output
+            self._store_outputs(function_call, output, outputs)
+        except Exception as e:
+            if span is not None:
+                instrumentation.fail_call(span, e)
+            raise
+
+        if span is not None:
+            span.mark("store")
+            instrumentation.finish_call(span, output)
+        return output
+
+    def optimize_function_calls(
+            self,
+            function_calls: Sequence[FunctionCall],
+            prune: bool = False,
+            keep: Optional[Iterable[int]] = None
+        ) -> PlanReport:
+        """
+        Find the calls of a plan to pure functions that do not
+        need to run, without calling anything. Pass the report
+        to call_functions to skip them. A call is a duplicate
+        of an earlier identical call if it calls the same pure
+        function with the same canonical parameters, and its
+        references name the outputs of the same calls, so its
+        output is reused and stored under its own returns.
+        With prune, calls to pure functions whose outputs are
+        not used by the kept calls, directly or through other
+        calls, are skipped and neither stored nor returned.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls of the plan.
+        prune: bool
+            Whether to skip the pure calls whose outputs are unused.
+        keep: Optional[Iterable[int]]
+            The indices of the calls whose outputs the caller
+            needs, when pruning. Defaults to the last call.
+            Calls to functions that are not pure are always kept.
+
+        Raises:
+            ValueError: If a reference path is invalid.
+        """
+        pure = [
+            function_call.name in self.functions and self._get_entry(function_call.name).pure
+            for function_call in function_calls
+        ]
+        duplicates: dict[int, int] = {}
+        originals: dict[tuple, int] = {}
+        producers: list[set[int]] = []
+        writers: dict[str, int] = {}
+        for index, function_call in enumerate(function_calls):
+            references = self._compile_references(function_call)
+            # The latest earlier call returning each referenced name, None for the session outputs
+            sources = [writers.get(reference.name) for reference in references]
+            producers.append({source for source in sources if source is not None})
+            if pure[index]:
+                key = self._get_plan_key(function_call, references, sources, duplicates)
+                if key is not None:
+                    original = originals.setdefault(key, index)
+                    if original != index:
+                        duplicates[index] = original
+            for return_value in function_call.returns or ():
+                writers[return_value.name] = index
+
+        pruned: tuple[int, ...] = ()
+        if prune and function_calls:
+            live = set(keep) if keep is not None else {len(function_calls) - 1}
+            live.update(index for index, is_pure in enumerate(pure) if not is_pure)
+            # Producers come before the calls using them
+            for index in reversed(range(len(function_calls))):
+                if index in live:
+                    live.update(producers[index])
+                    if index in duplicates:
+                        live.add(duplicates[index])
+            pruned = tuple(index for index in range(len(function_calls)) if index not in live)
+            duplicates = {index: original for index, original in duplicates.items() if index in live}
+        return PlanReport(
+            tuple(function_call.name for function_call in function_calls),
+            duplicates,
+            pruned,
+            self._fingerprint_calls(function_calls)
+        )
+
+    @staticmethod
+    def _get_plan_key(
+            function_call: FunctionCall,
+            references: tuple[Reference, ...],
+            sources: list[Optional[int]],
+            duplicates: dict[int, int]
+        ) -> Optional[tuple]:
+        """
+        Make the key under which identical calls of a plan are
+        merged, or None if the parameters cannot be canonicalized.
+        References to the outputs of earlier calls are replaced
+        by the index of the call and the accessors, since the
+        same output can be stored under different names.
+
+        function_call: FunctionCall
+            The function call.
+        references: tuple[Reference, ...]
+            The compiled references of the call.
+        sources: list[Optional[int]]
+            The index of the call returning each referenced
+            output, None for the outputs of the session.
+        duplicates: dict[int, int]
+            The earlier duplicate calls, whose outputs are the
+            outputs of their originals.
+        """
+        placeholders: dict[str, dict] = {}
+        replaced = []
+        for reference, source in zip(references, sources):
+            if source is not None:
+                token = f"\0{len(placeholders)}"
+                placeholders[token] = {"$output": duplicates.get(source, source), "accessors": list(reference.accessors)}
+                replaced.append(reference._replace(name=token, implicit=True))
+        parameters = resolve_references(function_call.parameters, tuple(replaced), placeholders)
+        try:
+            return (function_call.name, canonicalize(parameters))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _fingerprint_calls(function_calls: Sequence[FunctionCall]) -> tuple[tuple, ...]:
+        """
+        Get the name, parameters and returns of each call of a
+        plan, with the parameters canonicalized as for merging
+        duplicates, or kept as is if they cannot be.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls of the plan.
+        """
+        fingerprints = []
+        for function_call in function_calls:
+            try:
+                parameters = canonicalize(function_call.parameters)
+            except (TypeError, ValueError):
+                parameters = function_call.parameters
+            returns = function_call.returns
+            if returns is not None:
+                returns = tuple((return_value.name, return_value.type) for return_value in returns)
+            fingerprints.append((function_call.name, parameters, returns))
+        return tuple(fingerprints)
+
+    @classmethod
+    def _check_optimization(cls, function_calls: Sequence[FunctionCall], optimization: Optional[PlanReport]) -> None:
+        if optimization is not None and optimization.fingerprints != cls._fingerprint_calls(function_calls):
+            raise ValueError("The optimization report was made for another plan")
+
+    def _coalesce(
+            self,
+            function_calls: Sequence[FunctionCall],
+            optimization: Optional[PlanReport] = None
+        ) -> Optional[_Coalescing]:
+        """
+        Find the calls of a plan that run as batch calls: calls
+        to a function with a batch implementation at the same
+        depth of the dependency graph of the plan, so that none
+        of them depends on another. Returns None if there are
+        none, unless calls of the plan are optimized away, whose
+        dependencies are needed as well.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls of the plan.
+        optimization: Optional[PlanReport]
+            The calls that do not run, if any, which are not coalesced.
+        """
+        skipped = set(optimization.duplicates).union(optimization.pruned) if optimization is not None else ()
+        names = set()
+        if self._batched:
+            batched = self._batched
+            counts = Counter(
+                function_call.name for index, function_call in enumerate(function_calls)
+                if function_call.name in batched and index not in skipped
+            )
+            names = {name for name, count in counts.items() if count > 1 and self._get_entry(name).batch is not None}
+        if not names and not skipped:
+            return None
+        duplicates = optimization.duplicates if optimization is not None else {}
+
+        tracker = _DependencyTracker()
+        dependencies: list[set[int]] = []
+        depths: list[int] = []
+        groups: dict[tuple[str, int], list[int]] = {}
+        for index, function_call in enumerate(function_calls):
+            call_dependencies = tracker.add(self._get_references(function_call), function_call.returns)
+            if index in duplicates:
+                call_dependencies.add(duplicates[index])
+            depth = 1 + max((depths[i] for i in call_dependencies), default=-1)
+            dependencies.append(call_dependencies)
+            depths.append(depth)
+            if function_call.name in names and index not in skipped:
+                groups.setdefault((function_call.name, depth), []).append(index)
+
+        batches = {}
+        for indices in groups.values():
+            if len(indices) > 1:
+                group = tuple(indices)
+                for index in group:
+                    batches[index] = group
+        if not batches and not skipped:
+            return None
+        return _Coalescing(batches, dependencies, sorted(range(len(function_calls)), key=depths.__getitem__))
+
+    def _prepare_batch(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput]
+        ) -> tuple[_RegistryEntry, list[Optional[tuple]], list[ValidOutput], Optional[dict[str, list]]]:
+        """
+        Resolve the parameters of coalesced function calls and
+        look up their cached outputs. Returns the registry entry
+        of the function, the cache keys and the outputs of the
+        calls, MISSING on a cache miss, and the parameters of
+        the batch call, or None if all the outputs are cached.
+
+        function_calls: Sequence[FunctionCall]
+            The coalesced function calls.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        """
+        entry = self._get_entry(function_calls[0].name)
+        keys, results, calls = [], [], []
+        for function_call in function_calls:
+            parameters = entry.bind(self._resolve_parameters(function_call, outputs))
+            key, output = self._get_cached(entry, parameters)
+            keys.append(key)
+            results.append(output)
+            if output is MISSING:
+                calls.append(parameters)
+        if not calls:
+            return entry, keys, results, None
+        return entry, keys, results, {entry.batch.parameter: calls}
+
+    @staticmethod
+    def _merge_batch(
+            entry: _RegistryEntry,
+            keys: list[Optional[tuple]],
+            results: list[ValidOutput],
+            output: ValidOutput
+        ) -> list[ValidOutput]:
+        """
+        Fill the outputs missing from the results of coalesced
+        function calls with the output of their batch call,
+        and cache them.
+
+        entry: _RegistryEntry
+            The registry entry of the function.
+        keys: list[Optional[tuple]]
+            The cache keys of the calls.
+        results: list[ValidOutput]
+            The outputs of the calls, MISSING if not cached.
+        output: ValidOutput
+            The output of the batch call.
+
+        Raises:
+            ValueError: If the batch call did not return one output per call.
+        """
+        missing = [i for i, result in enumerate(results) if result is MISSING]
+        if not isinstance(output, (list, tuple)) or len(output) != len(missing):
+            size = len(output) if isinstance(output, (list, tuple)) else type(output).__name__
+            raise ValueError(f"The batch implementation of {entry.name}() must return a list of {len(missing)} outputs, got {size}")
+        for i, result in zip(missing, output):
+            results[i] = result
+            if keys[i] is not None:
+                entry.cache.set(keys[i], result)
+        return results
+
+    def _submit_batch(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None
+        ) -> Future:
+        """
+        Submit coalesced function calls as one batch call, and
+        return a future of the list of their outputs.
+
+        function_calls: Sequence[FunctionCall]
+            The coalesced function calls.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the calls, if any.
+        """
+        entry, keys, results, parameters = self._prepare_batch(function_calls, outputs)
+        future = Future()
+        if parameters is None:
+            future.set_result(results)
+            return future
+
+        def done(execution: Future) -> None:
+            if execution.cancelled():
+                future.cancel()
+                future.set_running_or_notify_cancel()
+                return
+            try:
+                future.set_result(self._merge_batch(entry, keys, results, execution.result()))
+            except BaseException as e:
+                future.set_exception(e)
+
+        self._submit(entry.batch, parameters, deadline).add_done_callback(done)
+        return future
+
+    def _call_batch(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None
+        ) -> list[ValidOutput]:
+        """
+        Call coalesced function calls as one batch call with
+        the outputs of a session, and store each output under
+        the returns of its function call.
+
+        function_calls: Sequence[FunctionCall]
+            The coalesced function calls.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan of the calls, if any.
+        """
+        instrumentation = self.instrumentation
+        spans = [instrumentation.start_call(function_call) for function_call in function_calls] if instrumentation is not None else []
+        try:
+            entry, keys, results, parameters = self._prepare_batch(function_calls, outputs)
+            for span in spans:
+                span.mark("resolve")
+            if parameters is not None:
+                self._merge_batch(entry, keys, results, self._execute(entry.batch, parameters, deadline))
+            for span in spans:
+                span.mark("execute")
+            for function_call, output in zip(function_calls, results):
+                self._store_outputs(function_call, output, outputs)
+        except Exception as e:
+            for span in spans:
+                instrumentation.fail_call(span, e)
+            raise
+
+        for span, output in zip(spans, results):
+            span.mark("store")
+            instrumentation.finish_call(span, output)
+        return results
+
+    def _call_coalesced(
+            self,
+            function_calls: Sequence[FunctionCall],
+            coalescing: _Coalescing,
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional[PlanReport] = None
+        ) -> list[ValidOutput]:
+        """
+        Call functions one after the other in dependency order,
+        running each group of coalesced calls as one batch call.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        coalescing: _Coalescing
+            The coalesced calls of the plan.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan, if any.
+        optimization: Optional[PlanReport]
+            The calls that do not run, if any.
+        """
+        duplicates, pruned = (optimization.duplicates, set(optimization.pruned)) if optimization is not None else ({}, ())
+        results = [None] * len(function_calls)
+        for index in coalescing.order:
+            if index in pruned:
+                continue
+            if index in duplicates:
+                results[index] = results[duplicates[index]]
+                self._store_outputs(function_calls[index], results[index], outputs)
+                continue
+            group = coalescing.batches.get(index)
+            if group is not None and index != group[0]:
+                # Called with the first call of its group
+                continue
+            function_call = function_calls[index]
+            if cancel_event is not None and cancel_event.is_set():
+                raise CancelledError(f"The plan was cancelled before calling {function_call.name}()")
+            if group is None:
+                results[index] = self._call_function(function_call, outputs, deadline)
+            else:
+                batch = self._call_batch([function_calls[i] for i in group], outputs, deadline)
+                for i, output in zip(group, batch):
+                    results[i] = output
+        return results
+
+    def call_function(self, function_call: FunctionCall) -> ValidOutput:
+        """
+        Call a function from the engine.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        """
+        return self._call_function(function_call, self.outputs)
+
+    def _check_function_calls(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput]
+        ) -> list[PlanError]:
+        """
+        Check a plan before any of its function calls runs,
+        without importing lazily loaded functions. Returns
+        the problems of the plan in plan order, if any.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls of the plan.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        """
+        producers: dict[str, int] = {}
+        for index, function_call in enumerate(function_calls):
+            for return_value in function_call.returns or ():
+                producers.setdefault(return_value.name, index)
+
+        errors = []
+        functions = self.functions
+        explicit = self.reference_mode == "explicit"
+        for index, function_call in enumerate(function_calls):
+            name = function_call.name
+            if name not in functions:
+                errors.append(PlanError(index, name, "unknown function"))
+            else:
+                entry = self._get_entry(name)
+                if entry.validates:
+                    parameters = function_call.parameters
+                    missing = entry.required.difference(parameters)
+                    if missing:
+                        errors.append(PlanError(index, name, f"missing required argument(s): {', '.join(sorted(missing))}"))
+                    if entry.allowed is not None and not entry.allowed.issuperset(parameters):
+                        unexpected = set(parameters).difference(entry.allowed)
+                        errors.append(PlanError(index, name, f"unexpected argument(s): {', '.join(sorted(unexpected))}"))
+
+            # Implicit references are plain strings unless they name an output,
+            # so there is nothing to check, nor to compile, in the "implicit" mode
+            if not explicit:
+                continue
+            try:
+                references = self._compile_references(function_call)
+            except ValueError as e:
+                errors.append(PlanError(index, name, str(e)))
+                continue
+            for reference in references:
+                if reference.name in outputs:
+                    continue
+                producer = producers.get(reference.name)
+                if producer is None:
+                    errors.append(PlanError(index, name, f"reference {reference.path!r} names no output"))
+                elif producer >= index:
+                    errors.append(PlanError(index, name, f"reference {reference.path!r} is only returned by call {producer}"))
+        return errors
+
+    def _preflight(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput]
+        ) -> None:
+        """
+        Check a plan before any of its function calls runs,
+        if the preflight check of the engine is enabled.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls of the plan.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+
+        Raises:
+            PlanValidationError: If function calls of the plan are invalid.
+        """
+        if self.preflight:
+            errors = self._check_function_calls(function_calls, outputs)
+            if errors:
+                raise PlanValidationError(errors)
+
+    def validate_function_calls(self, function_calls: Sequence[FunctionCall]) -> list[PlanError]:
+        """
+        Check function calls against the functions and outputs
+        of the engine without calling them: every function must
+        exist, every call must pass the required arguments and no
+        unexpected ones, and every explicit reference must name
+        a stored output or one returned by an earlier call.
+        Implicit references are not checked: in the "implicit"
+        reference mode, a string naming no output is a valid
+        argument. Argument types are checked when the calls run,
+        since referenced outputs are not known before. Returns
+        every problem found, or an empty list if the plan is valid.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be checked.
+        """
+        return self._check_function_calls(function_calls, self.outputs)
+
+    def _get_deadline(self, timeout: Optional[float]) -> Optional[Deadline]:
+        """
+        Get the deadline of a plan starting now.
+
+        timeout: Optional[float]
+            The timeout of the plan. Defaults to the
+            plan_timeout of the engine if None.
+        """
+        timeout = timeout if timeout is not None else self.plan_timeout
+        return Deadline.after(timeout) if timeout is not None else None
+
+    def _call_functions(
+            self,
+            function_calls: list[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            parallel: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional[PlanReport] = None
+        ) -> list[ValidOutput]:
+        """
+        Call multiple functions with the outputs of a session.
+
+        function_calls: list[FunctionCall]
+            The function calls to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        optimization: Optional[PlanReport]
+            The calls that do not run, see call_functions.
+
+        Raises:
+            PlanValidationError: If the plan fails the preflight check.
+            ValueError: If the optimization was made for another plan.
+        """
+        self._check_optimization(function_calls, optimization)
+        self._preflight(function_calls, outputs)
+        deadline = self._get_deadline(timeout)
+        coalescing = self._coalesce(function_calls, optimization)
+        if parallel:
+            batches = coalescing.batches if coalescing is not None else None
+            scheduler = _CallScheduler(self, outputs, deadline, cancel_event, batches, optimization)
             for function_call in function_calls:
-                print(f"Calling function: {function_call.name}")
-                print(f"Parameters: {function_call.parameters}")
-                print(f"Returns: {function_call.returns}")
+                scheduler.submit(function_call)
+            return scheduler.results()
+        if coalescing is not None:
+            return self._call_coalesced(function_calls, coalescing, outputs, deadline, cancel_event, optimization)
+
+        results = []
+        for function_call in function_calls:
+            if cancel_event is not None and cancel_event.is_set():
+                raise CancelledError(f"The plan was cancelled before calling {function_call.name}()")
+            output = self._call_function(function_call, outputs, deadline)
+            results.append(output)
+        return results
+    
+    def call_functions(
+            self,
+            function_calls: list[FunctionCall],
+            parallel: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional[PlanReport] = None
+        ) -> list[ValidOutput]:
+        """
+        Call multiple functions from the engine.
+
+        function_calls: list[FunctionCall]
+            The function calls to be executed.
+        parallel: bool
+            Whether to run function calls that do not depend
+            on each other at the same time on the thread pool
+            of the engine. The outputs are returned in the
+            order of the function calls either way.
+        timeout: Optional[float]
+            The number of seconds after which the plan fails
+            with a FunctionTimeoutError whose scope is "plan",
+            and its remaining calls are not started. Defaults
+            to the plan_timeout of the engine.
+        cancel_event: Optional[threading.Event]
+            An event that can be set from another thread to
+            cancel the plan. Calls that have not started yet
+            are skipped, running calls finish, and the plan
+            raises a concurrent.futures.CancelledError.
+        optimization: Optional[PlanReport]
+            The report of optimize_function_calls for the plan.
+            Duplicate calls then get the output of the call they
+            duplicate, which is stored under their own returns,
+            and pruned calls are skipped, their output is None.
+
+        Raises:
+            ValueError: If the optimization was made for another plan.
+        """
+        return self._call_functions(function_calls, self.outputs, parallel, timeout, cancel_event, optimization)
+    
+    def _iter_call_functions(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            parallel: bool = True,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> CallResults:
+        """
+        Call multiple functions with the outputs of a session,
+        yielding their results in completion order.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+
+        Raises:
+            PlanValidationError: If the plan fails the preflight check.
+        """
+        self._preflight(function_calls, outputs)
+        deadline = self._get_deadline(timeout)
+        if parallel:
+            coalescing = self._coalesce(function_calls)
+            batches = coalescing.batches if coalescing is not None else None
+            scheduler = _CallScheduler(self, outputs, deadline, cancel_event, batches)
+            for function_call in function_calls:
+                scheduler.submit(function_call)
+            results = self._iter_scheduled(scheduler)
+        else:
+            results = self._iter_sequential(function_calls, outputs, deadline, cancel_event)
+        return CallResults(function_calls, results)
+
+    @staticmethod
+    def _iter_scheduled(scheduler: "_CallScheduler") -> Iterator[CallResult]:
+        """
+        Yield the results of the calls of a scheduler as they finish.
+
+        scheduler: _CallScheduler
+            The scheduler running the calls.
+        """
+        indices = {future: index for index, future in enumerate(scheduler.futures)}
+        try:
+            for future in as_completed(scheduler.futures):
+                if future.cancelled():
+                    continue
+                index = indices[future]
+                error = future.exception()
+                output = future.result() if error is None else None
+                yield CallResult(index, scheduler.function_calls[index], output, error)
+        finally:
+            # Calls that have not started when the iteration stops are skipped
+            with scheduler.lock:
+                scheduler._fail()
+
+    def _iter_sequential(
+            self,
+            function_calls: Sequence[FunctionCall],
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> Iterator[CallResult]:
+        """
+        Call functions one after the other, yielding each result.
+        The iteration stops after the first failed call.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        deadline: Optional[Deadline]
+            The deadline of the plan, if any.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the plan, if any.
+        """
+        for index, function_call in enumerate(function_calls):
+            try:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CancelledError(f"The plan was cancelled before calling {function_call.name}()")
+                output = self._call_function(function_call, outputs, deadline)
+            except Exception as e:
+                yield CallResult(index, function_call, None, e)
+                return
+            yield CallResult(index, function_call, output, None)
+
+    def iter_call_functions(
+            self,
+            function_calls: Sequence[FunctionCall],
+            parallel: bool = True,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> CallResults:
+        """
+        Call multiple functions from the engine, yielding a
+        CallResult as soon as each call finishes instead of
+        returning once all of them are done. Calls that do not
+        depend on each other run on the thread pool and are
+        yielded in completion order, while calls referencing
+        earlier outputs still wait for them. Errors are yielded
+        rather than raised, and summary() returns the outputs
+        or raises the first error, like call_functions.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+            If False, the calls run one after the other, each
+            when the previous result has been consumed.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        """
+        return self._iter_call_functions(function_calls, self.outputs, parallel, timeout, cancel_event)
+
+    def _convert_openai_tool_call(self, tool_call: dict) -> FunctionCall:
+        """
+        Convert an OpenAI tool call to a FunctionCall.
+
+        tool_call: dict
+            The OpenAI tool call to be converted.
+        """
+        return FunctionCall(**self._get_openai_fields(tool_call))
+
+    def _get_openai_fields(self, tool_call: dict) -> dict:
+        """
+        Get the FunctionCall fields of an OpenAI tool call.
+
+        tool_call: dict
+            The OpenAI tool call to be converted.
+        """
+        function = tool_call['function']
+        arguments = function['arguments']
+        if isinstance(arguments, JSON_TYPES):
+            arguments = self.json_backend.loads(arguments)
+        return {
+            'name': function['name'],
+            'parameters': arguments,
+            'returns': None  # OpenAI tool calls do not specify returns
+        }
+
+    def parse_function_calls(self, function_calls: Union[dict, list[dict]]) -> list[FunctionCall]:
+        """
+        Parse either a single function call or
+        a list of function calls.
+
+        function_calls: Union[dict, list[dict]]
+            The function call(s) to be parsed.
+        """
+        if self.instrumentation is not None:
+            return self._instrument_parse(self._parse_function_calls, function_calls)
+        return self._parse_function_calls(function_calls)
+
+    def _instrument_parse(self, parse: Callable, function_calls: object) -> list[FunctionCall]:
+        """
+        Run a parse function inside a parse span.
+
+        parse: Callable
+            The parse function.
+        function_calls: object
+            The input of the parse function.
+        """
+        span = self.instrumentation.start_parse()
+        try:
+            parsed = parse(function_calls)
+        except Exception as e:
+            self.instrumentation.finish_parse(span, e)
+            raise
+        self.instrumentation.finish_parse(span)
+        return parsed
+
+    def _parse_function_calls(
+            self,
+            function_calls: Union[dict, list[dict]],
+            compact: bool = False
+        ) -> Union[list[FunctionCall], list[CompactCall]]:
+        """
+        Parse function calls, see parse_function_calls.
+
+        function_calls: Union[dict, list[dict]]
+            The function call(s) to be parsed.
+        compact: bool
+            Whether to return CompactCall objects, as the
+            engine does for the plans it parses and runs,
+            which are also the function_call of the results
+            of iter_parse_and_call_functions.
+        """
+        if isinstance(function_calls, dict):
+            function_calls = [function_calls]
+        elif not isinstance(function_calls, list):
+            raise TypeError("Input must be a dictionary or a list of dictionaries")
+
+        if compact:
+            return [
+                _compact_call(self._get_openai_fields(call))
+                if 'id' in call and 'function' in call and 'type' in call
+                else _compact_call(call)
+                for call in function_calls
+            ]
+
+        parsed_calls = []
+        for call in function_calls:
+            if 'id' in call and 'function' in call and 'type' in call:
+                parsed_calls.append(self._convert_openai_tool_call(call))
+            else:
+                try:
+                    parsed_calls.append(FunctionCall(**call))
+                except Exception:
+                    raise ValueError(INVALID_FUNCTION_CALL_ERROR)
+        
+        return parsed_calls
+
+    def _parse_input(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False
+        ) -> Sequence[FunctionCall]:
+        """
+        Parse the raw input of parse_and_call_functions. Raw
+        JSON is looked up in the plan cache first, if enabled.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed.
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        plan_cache = self.plan_cache
+        if plan_cache is not None and isinstance(function_calls, JSON_TYPES):
+            key = make_plan_key(function_calls)
+            plan = plan_cache.get(key)
+            if plan is MISSING:
+                plan = tuple(self._decode_and_parse_input(function_calls))
+                plan_cache.set(key, plan)
+            function_calls = plan
+        else:
+            function_calls = self._decode_and_parse_input(function_calls)
+
+        if verbose:
+            for function_call in function_calls:
+                self._print_function_call(function_call)
+
+        return function_calls
+
+    def _decode_and_parse_input(self, function_calls: Union[dict, list[dict], JSONInput]) -> list[CompactCall]:
+        if self.instrumentation is not None:
+            return self._instrument_parse(self._decode_and_parse, function_calls)
+        return self._decode_and_parse(function_calls)
+
+    def _decode_and_parse(self, function_calls: Union[dict, list[dict], JSONInput]) -> list[CompactCall]:
+        """
+        Decode JSON input and parse the function calls in it.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed.
+        """
+        if isinstance(function_calls, JSON_TYPES):
+            function_calls = self.json_backend.loads(function_calls)
+
+        return self._parse_function_calls(function_calls, compact=True)
+
+    @staticmethod
+    def _print_function_call(function_call: Union[FunctionCall, CompactCall]) -> None:
+        returns = function_call.returns
+        if type(function_call) is CompactCall and returns is not None:
+            # Printed as the returns of the FunctionCall model
+            returns = [Parameter(name=return_value.name, type=return_value.type) for return_value in returns]
+        print(f"Calling function: {function_call.name}")
+        print(f"Parameters: {function_call.parameters}")
+        print(f"Returns: {returns}")
+
+    def parse_and_call_functions(
+            self, 
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            parallel: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> list[ValidOutput]:
+        """
+        Parse and call either a single function call or
+        a list of function calls.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called, or
+            their JSON as str, bytes, bytearray or memoryview.
+        verbose: bool
+            Whether to print the parsed function calls.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        """
+        function_calls = self._parse_input(function_calls, verbose)
+        return self._call_functions(function_calls, self.outputs, parallel, timeout, cancel_event)
+
+    def iter_parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            parallel: bool = True,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> CallResults:
+        """
+        Parse function calls and yield their results in
+        completion order, see iter_call_functions. The
+        function_call of each result is a CompactCall.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see call_functions.
+        """
+        function_calls = self._parse_input(function_calls, verbose)
+        return self._iter_call_functions(function_calls, self.outputs, parallel, timeout, cancel_event)
+
+    def batch_parse_and_call_functions(
+            self,
+            responses: Iterable[Union[dict, list[dict], JSONInput]],
+            executor: str = "thread",
+            chunk_size: Optional[int] = None
+        ) -> list[BatchResult]:
+        """
+        Parse and call the function calls of many independent
+        LLM responses. Each response gets its own outputs, so
+        responses cannot reference each other's outputs, and
+        a failing response does not abort the batch.
+
+        The responses are split into chunks, and the function
+        calls of each chunk are validated in one pass before
+        they run, which keeps the number of parsed function
+        calls alive at a time bounded. The function calls of
+        each response run in order.
+
+        responses: Iterable[Union[dict, list[dict], JSONInput]]
+            The responses, each as accepted by parse_and_call_functions.
+        executor: str
+            Where the chunks run: "inline" one after the other,
+            "thread" on a thread pool of max_workers threads, or
+            "process" on the process pool of the engine, which
+            scales with the number of cores. With "process", the
+            registered functions and the outputs must be picklable,
+            functions run inline in the worker processes, and
+            neither the cache nor the instrumentation of the
+            engine is used.
+        chunk_size: Optional[int]
+            The number of responses per chunk. Defaults to a
+            quarter of the responses per worker, up to
+            BATCH_CHUNK_SIZE.
+
+        Raises:
+            ValueError: If the executor is invalid.
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Executor must be one of {EXECUTORS}, got {executor!r}")
+        responses = list(responses)
+        if chunk_size is None:
+            workers = (self.max_processes if executor == "process" else self.max_workers) or os.cpu_count() or 1
+            chunk_size = min(BATCH_CHUNK_SIZE, max(1, -(-len(responses) // (workers * 4))))
+        starts = range(0, len(responses), chunk_size)
+        chunks = [responses[start:start + chunk_size] for start in starts]
+
+        if executor == "inline":
+            chunk_results = map(self._run_batch_chunk, chunks)
+        elif executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tiny_fnc_engine_batch")
+            with pool:
+                chunk_results = list(pool.map(self._run_batch_chunk, chunks))
+        else:
+            functions = tuple(
+                (entry.name, entry.target, entry.validates)
+                for entry in map(self._get_entry, self.functions)
+            )
+            pool = self._get_process_pool()
+            futures = [
+                pool.submit(_run_batch_chunk, functions, self.json_backend.name, self.reference_mode, self.preflight, chunk)
+                for chunk in chunks
+            ]
+            chunk_results = map(self._get_chunk_results, futures, chunks)
+
+        results = []
+        for start, chunk in zip(starts, chunk_results):
+            results.extend(result._replace(index=start + result.index) for result in chunk)
+        return results
+
+    @staticmethod
+    def _get_chunk_results(future: Future, chunk: list) -> list[BatchResult]:
+        """
+        Get the results of a chunk run in a worker process. If
+        the chunk failed as a whole, e.g. because an output is
+        not picklable, each response of the chunk gets the error.
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            return [BatchResult(index, None, e) for index in range(len(chunk))]
+
+    def _run_batch_chunk(self, responses: list[Union[dict, list[dict], JSONInput]]) -> list[BatchResult]:
+        """
+        Parse and call the function calls of a chunk of a batch.
+
+        responses: list[Union[dict, list[dict], JSONInput]]
+            The responses of the chunk.
+        """
+        if self.instrumentation is not None:
+            plans = self._instrument_parse(self._parse_batch, responses)
+        else:
+            plans = self._parse_batch(responses)
+        return [self._run_batch_item(index, plan) for index, plan in enumerate(plans)]
+
+    def _parse_batch(
+            self,
+            responses: list[Union[dict, list[dict], JSONInput]]
+        ) -> list[Union[list[CompactCall], Exception]]:
+        """
+        Parse the function calls of many responses into
+        CompactCall objects. Returns the function calls of
+        each response, or the error it raised. Raw JSON found
+        in the plan cache, or repeated within the batch, is
+        only parsed once.
+
+        responses: list[Union[dict, list[dict], JSONInput]]
+            The responses to be parsed.
+        """
+        plan_cache = self.plan_cache
+        plans: list[Union[list[CompactCall], Exception]] = [[] for _ in responses]
+        errors: dict[int, Exception] = {}
+        cached: dict[int, Union[tuple[CompactCall, ...], int]] = {}
+        keys: dict[bytes, int] = {}
+        for index, response in enumerate(responses):
+            if plan_cache is not None and isinstance(response, JSON_TYPES):
+                key = make_plan_key(response)
+                if key in keys:
+                    # Parsed earlier in the batch, by the response at that index
+                    cached[index] = keys[key]
+                    continue
+                plan = plan_cache.get(key)
+                if plan is not MISSING:
+                    cached[index] = plan
+                    continue
+                keys[key] = index
+            try:
+                if isinstance(response, JSON_TYPES):
+                    response = self.json_backend.loads(response)
+                # Checking each call with CompactCall.from_dict is faster than
+                # validating the whole batch with a FunctionCall TypeAdapter
+                plans[index] = self._parse_function_calls(response, compact=True)
+            except Exception as e:
+                errors[index] = e
+
+        for index, error in errors.items():
+            plans[index] = error
+        for key, index in keys.items():
+            if index not in errors:
+                plans[index] = tuple(plans[index])
+                plan_cache.set(key, plans[index])
+        for index, plan in cached.items():
+            plans[index] = plans[plan] if isinstance(plan, int) else plan
+        return plans
+
+    def _run_batch_item(self, index: int, plan: Union[list[FunctionCall], Exception]) -> BatchResult:
+        """
+        Call the function calls of one response of a batch
+        with outputs of its own.
+
+        index: int
+            The index of the response in the batch.
+        plan: Union[list[FunctionCall], Exception]
+            The parsed function calls of the response,
+            or the error raised while parsing it.
+        """
+        if isinstance(plan, Exception):
+            return BatchResult(index, None, plan)
+
+        outputs = self.output_store()
+        try:
+            return BatchResult(index, self._call_functions(plan, outputs), None)
+        except Exception as e:
+            return BatchResult(index, None, e)
+        finally:
+            close = getattr(outputs, "close", None)
+            if close is not None:
+                close()
+
+    def stream_and_call_functions(
+            self,
+            chunks: Iterable[Union[str, dict, list]],
+            verbose: bool = False
+        ) -> list[ValidOutput]:
+        """
+        Parse and call function calls from a streamed LLM
+        response. Each function call is dispatched as soon
+        as its JSON object is closed, so tools run while the
+        response is still being generated. Function calls
+        run in parallel once the calls they depend on have
+        finished, as with call_functions(parallel=True).
+
+        chunks: Iterable[Union[str, dict, list]]
+            Chunks of the JSON text of the response, or
+            OpenAI "tool_calls" deltas (or lists of deltas).
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        return self._stream_and_call_functions(chunks, self.outputs, verbose)
+
+    def _stream_and_call_functions(
+            self,
+            chunks: Iterable[Union[str, dict, list]],
+            outputs: MutableMapping[str, ValidOutput],
+            verbose: bool = False
+        ) -> list[ValidOutput]:
+        """
+        Parse and call function calls from a streamed
+        LLM response with the outputs of a session.
+
+        chunks: Iterable[Union[str, dict, list]]
+            The chunks of the response.
+        outputs: MutableMapping[str, ValidOutput]
+            The outputs of the session.
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        parser = StreamParser(self.json_backend.loads)
+        scheduler = _CallScheduler(self, outputs)
+
+        def submit(calls: list[dict]) -> None:
+            for function_call in self._decode_and_parse_input(calls):
+                if verbose:
+                    self._print_function_call(function_call)
+                scheduler.submit(function_call)
+
+        try:
+            for chunk in chunks:
+                submit(parser.feed(chunk))
+            submit(parser.close())
+        except BaseException:
+            # Calls waiting for others are not started, as in the async engine
+            with scheduler.lock:
+                scheduler._fail()
+            raise
+
+        return scheduler.results()
+
+
+# Engine of the last batch chunk run by a worker process,
+# reused while the registered functions do not change
+_batch_engine: Optional[tuple[tuple, FunctionCallingEngine]] = None
+
+def _run_batch_chunk(
+        functions: tuple[tuple[str, callable, bool], ...],
+        json_backend: str,
+        reference_mode: str,
+        preflight: bool,
+        responses: list[Union[dict, list[dict], JSONInput]]
+    ) -> list[BatchResult]:
+    """
+    Run a chunk of a batch in a worker process.
+
+    functions: tuple[tuple[str, callable, bool], ...]
+        The name, picklable callable and validate flag
+        of each function registered in the engine.
+    json_backend: str
+        The name of the JSON backend of the engine.
+    reference_mode: str
+        The reference mode of the engine.
+    preflight: bool
+        Whether the engine checks plans before they run.
+    responses: list[Union[dict, list[dict], JSONInput]]
+        The responses of the chunk.
+    """
+    global _batch_engine
+    key = (functions, json_backend, reference_mode, preflight)
+    if _batch_engine is None or _batch_engine[0] != key:
+        engine = FunctionCallingEngine(json_backend=json_backend, reference_mode=reference_mode, preflight=preflight)
+        engine._register([
+            _RegistryEntry(
+                name,
+                target.load() if isinstance(target, _ModuleFunction) else target,
+                executor="inline",
+                target=target,
+                validate=validate
+            )
+            for name, target, validate in functions
+        ], build_tools=False)
+        _batch_engine = (key, engine)
+    return _batch_engine[1]._run_batch_chunk(responses)
+
+class _DependencyTracker:
+    """
+    Tracks which earlier function calls of a plan each
+    function call depends on.
+
+    A call depends on the latest earlier call producing
+    an output it references, and on earlier calls that
+    read or write an output it overwrites, so the stored
+    outputs end up the same as with sequential execution.
+    Calls are added in plan order, which means that
+    dependencies always point to earlier calls.
+    """
+    def __init__(self):
+        self.count = 0
+        self.writers: dict[str, int] = {}
+        self.readers: dict[str, list[int]] = {}
+
+    def add(self, references: set[str], returns: Optional[list[Parameter]]) -> set[int]:
+        """
+        Add the next function call of the plan and
+        return the indices of the calls it depends on.
+
+        references: set[str]
+            The output names the function call may reference.
+        returns: Optional[list[Parameter]]
+            The return values of the function call.
+        """
+        index = self.count
+        self.count += 1
+
+        names = [return_value.name for return_value in returns or []]
+        dependencies = {self.writers[name] for name in references if name in self.writers}
+        for name in names:
+            if name in self.writers:
+                dependencies.add(self.writers[name])
+            dependencies.update(self.readers.pop(name, ()))
+        for name in references:
+            self.readers.setdefault(name, []).append(index)
+        for name in names:
+            self.writers[name] = index
+
+        dependencies.discard(index)
+        return dependencies
+
+
+class _CallScheduler:
+    """
+    Runs function calls on the thread pool of an engine
+    as soon as the calls they depend on have finished.
+    Calls are not started once the plan is cancelled.
+    Coalesced calls wait for each other and run as one
+    batch call once all of them are ready.
+
+    Launching and finishing calls are steps run one after
+    the other from a queue, since the done callbacks of
+    inline or cached calls run as soon as they are added,
+    and would otherwise recurse once per call of a chain.
+    """
+    def __init__(
+            self,
+            engine: FunctionCallingEngine,
+            outputs: MutableMapping[str, ValidOutput],
+            deadline: Optional[Deadline] = None,
+            cancel_event: Optional[threading.Event] = None,
+            batches: Optional[dict[int, tuple[int, ...]]] = None,
+            optimization: Optional[PlanReport] = None
+        ):
+        self.engine = engine
+        self.outputs = outputs
+        self.deadline = deadline
+        self.cancel_event = cancel_event
+        self.lock = threading.RLock()
+        self.function_calls: list[FunctionCall] = []
+        self.futures: list[Future] = []
+        self.pending: dict[int, set[int]] = {}
+        self.dependents: dict[int, list[int]] = {}
+        self.tracker = _DependencyTracker()
+        self.spans: dict[int, Span] = {}
+        self.batches = batches or {}
+        self.ready: dict[tuple[int, ...], list[int]] = {}
+        self.duplicates = optimization.duplicates if optimization is not None else {}
+        self.pruned = frozenset(optimization.pruned) if optimization is not None else frozenset()
+        self.steps: deque[tuple[tuple[int, ...], Callable[[], None]]] = deque()
+        self.running = False
+        self.failed = False
+
+    def submit(self, function_call: FunctionCall) -> Future:
+        """
+        Schedule a function call after the calls it depends on.
+
+        function_call: FunctionCall
+            The function call to be scheduled.
+        """
+        with self.lock:
+            index = len(self.function_calls)
+            future = Future()
+            self.function_calls.append(function_call)
+            self.futures.append(future)
+
+            dependencies = self.tracker.add(
+                self.engine._get_references(function_call),
+                function_call.returns
+            )
+            if index in self.duplicates:
+                dependencies.add(self.duplicates[index])
+            dependencies = {i for i in dependencies if not self.futures[i].done()}
+            if self.failed:
+                self._cancel(future)
+            elif index in self.pruned:
+                future.set_result(None)
+            elif dependencies:
+                self.pending[index] = dependencies
+                for dependency in dependencies:
+                    self.dependents.setdefault(dependency, []).append(index)
+            else:
+                self._run((index,), partial(self._launch, index))
+        return future
+
+    def results(self) -> list[ValidOutput]:
+        """
+        Wait for all scheduled calls and return their outputs
+        in submission order, raising the first error if any.
+        """
+        wait(self.futures)
+        for future in self.futures:
+            if not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+        return [future.result() for future in self.futures]
+
+    def _run(self, indices: tuple[int, ...], step: Callable[[], None]) -> None:
+        """
+        Queue a step and run the queued steps, unless they
+        are already running further up the stack. An error
+        raised by a step fails the calls it was run for.
+
+        indices: tuple[int, ...]
+            The indices of the calls of the step.
+        step: Callable[[], None]
+            The step to be run.
+        """
+        with self.lock:
+            self.steps.append((indices, step))
+            if self.running:
+                return
+            self.running = True
+            try:
+                while self.steps:
+                    indices, step = self.steps.popleft()
+                    try:
+                        step()
+                    except Exception as e:
+                        for index in indices:
+                            if not self.futures[index].done():
+                                self.futures[index].set_exception(e)
+                        self._fail()
+            finally:
+                self.running = False
+
+    def _on_done(self, index: int, execution: Future) -> None:
+        self._run((index,), partial(self._finish, index, execution))
+
+    def _on_batch_done(self, group: tuple[int, ...], execution: Future) -> None:
+        self._run(group, partial(self._finish_batch, group, execution))
+
+    def _launch(self, index: int) -> None:
+        original = self.duplicates.get(index)
+        if original is not None:
+            # Stored under the returns of the duplicate by _finish
+            self._finish(index, self.futures[original])
+            return
+
+        group = self.batches.get(index)
+        if group is not None:
+            ready = self.ready.setdefault(group, [])
+            ready.append(index)
+            if len(ready) == len(group):
+                del self.ready[group]
+                self._launch_batch(group)
+            return
+
+        instrumentation = self.engine.instrumentation
+        function_call = self.function_calls[index]
+        try:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise CancelledError(f"The plan was cancelled before calling {function_call.name}()")
+            if instrumentation is not None:
+                span = self.spans[index] = instrumentation.start_call(function_call)
+            execution = self.engine._submit_call(function_call, self.outputs, self.deadline)
+            if instrumentation is not None:
+                span.mark("resolve")
+        except Exception as e:
+            execution = Future()
+            execution.set_exception(e)
+        execution.add_done_callback(partial(self._on_done, index))
+
+    def _launch_batch(self, group: tuple[int, ...]) -> None:
+        instrumentation = self.engine.instrumentation
+        function_calls = [self.function_calls[index] for index in group]
+        try:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise CancelledError(f"The plan was cancelled before calling {function_calls[0].name}()")
+            if instrumentation is not None:
+                for index, function_call in zip(group, function_calls):
+                    self.spans[index] = instrumentation.start_call(function_call)
+            execution = self.engine._submit_batch(function_calls, self.outputs, self.deadline)
+            if instrumentation is not None:
+                for index in group:
+                    self.spans[index].mark("resolve")
+        except Exception as e:
+            execution = Future()
+            execution.set_exception(e)
+        execution.add_done_callback(partial(self._on_batch_done, group))
+
+    def _finish_batch(self, group: tuple[int, ...], execution: Future) -> None:
+        # Each call of the batch finishes with its own output
+        for position, index in enumerate(group):
+            member = Future()
+            try:
+                member.set_result(execution.result()[position])
+            except BaseException as e:
+                member.set_exception(e)
+            self._finish(index, member)
+
+    def _finish(self, index: int, execution: Future) -> None:
+        future = self.futures[index]
+        span = self.spans.pop(index, None)
+        try:
+            try:
+                output = execution.result()
+                if span is not None:
+                    span.mark("execute")
+                self.engine._store_outputs(self.function_calls[index], output, self.outputs)
+            except Exception as e:
+                if span is not None:
+                    self.engine.instrumentation.fail_call(span, e)
+                raise
+            if span is not None:
+                span.mark("store")
+                self.engine.instrumentation.finish_call(span, output)
+        except Exception as e:
+            # Errors of the hooks fail the call as well, as in sequential plans
+            future.set_exception(e)
+            self._fail()
+            return
+
+        future.set_result(output)
+        for dependent in self.dependents.pop(index, ()):
+            dependencies = self.pending.get(dependent)
+            if dependencies is None:
+                continue
+            dependencies.discard(index)
+            if not dependencies:
+                del self.pending[dependent]
+                self._run((dependent,), partial(self._launch, dependent))
+
+    def _fail(self) -> None:
+        # Calls that have not started yet are cancelled
+        self.failed = True
+        for index in self.pending:
+            self._cancel(self.futures[index])
+        self.pending.clear()
+        for ready in self.ready.values():
+            for index in ready:
+                self._cancel(self.futures[index])
+        self.ready.clear()
 
-        return self.call_functions(function_calls)
+    @staticmethod
+    def _cancel(future: Future) -> None:
+        # Notify waiters as well, so that wait() does not block on the future
+        future.cancel()
+        future.set_running_or_notify_cancel()
@@ -0,0 +1,361 @@
+from typing import Any, Callable, Optional
+from collections import deque
+import threading
+import bisect
+import time
+import os
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+    0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0
+)
+
+# Phases of a function call with a latency histogram
+CALL_PHASES = ("resolve", "execute", "store", "total")
+
+# Number of span dictionaries kept by an exporter without a sink
+MAX_OTEL_SPANS = 10_000
+
+class Span:
+    """
+    Timing record of one parse or one function call, passed
+    to the hooks and exporters of an Instrumentation.
+
+    name: str
+        The name of the function, or "parse_function_calls".
+    kind: str
+        Either "call" or "parse".
+    function_call: Optional[Any]
+        The function call, for call spans.
+    output: Any
+        The output of the function call, once it succeeded.
+    error: Optional[BaseException]
+        The error raised, if any.
+    durations: dict[str, float]
+        The duration of each phase in seconds.
+    """
+    __slots__ = (
+        "name", "kind", "function_call", "output", "error", "durations",
+        "start_time_ns", "end_time_ns", "_phase_start", "_start"
+    )
+
+    def __init__(self, name: str, kind: str, function_call: Optional[Any] = None):
+        self.name = name
+        self.kind = kind
+        self.function_call = function_call
+        self.output = None
+        self.error: Optional[BaseException] = None
+        self.durations: dict[str, float] = {}
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+        self._start = self._phase_start = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """
+        Record the end of a phase, which started at
+        the end of the previous phase.
+
+        phase: str
+            The name of the phase.
+        """
+        now = time.perf_counter()
+        self.durations[phase] = now - self._phase_start
+        self._phase_start = now
+
+    def end(self) -> None:
+        self.durations["total"] = time.perf_counter() - self._start
+        self.end_time_ns = time.time_ns()
+
+class Histogram:
+    """
+    Latency histogram with fixed bucket upper bounds.
+
+    buckets: tuple[float, ...]
+        The upper bounds of the buckets in seconds. Values
+        above the last bound are counted in an overflow bucket.
+    """
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the
+        bucket that contains it.
+
+        q: float
+            The quantile, between 0 and 1.
+        """
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+class FunctionMetrics:
+    """
+    Counters and latency histograms of one function,
+    with a histogram for each of CALL_PHASES. For the
+    parse metrics, only the "total" histogram is used.
+    """
+    __slots__ = ("calls", "errors", "histograms")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.histograms = {phase: Histogram(buckets) for phase in CALL_PHASES}
+
+class Exporter:
+    """
+    Interface of the exporters of an Instrumentation,
+    which receive every finished span.
+    """
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+class InMemoryExporter(Exporter):
+    """
+    Exporter that keeps the finished spans in memory,
+    e.g. for tests.
+    """
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+class OpenTelemetrySpanExporter(Exporter):
+    """
+    Exporter that converts spans to dictionaries following
+    the OpenTelemetry span data model (trace and span IDs,
+    Unix nanosecond timestamps, attributes, events and a
+    status), and passes them to a sink, e.g. a function that
+    forwards them to an OTLP collector. Without a sink, the
+    latest dictionaries are kept in the spans attribute.
+
+    sink: Optional[Callable[[dict], None]]
+        The function receiving the span dictionaries.
+    service_name: str
+        The service.name resource attribute of the spans.
+    max_spans: int
+        The number of dictionaries kept without a sink,
+        after which the oldest ones are dropped.
+    """
+    def __init__(
+            self,
+            sink: Optional[Callable[[dict], None]] = None,
+            service_name: str = "tiny_fnc_engine",
+            max_spans: int = MAX_OTEL_SPANS
+        ):
+        self.sink = sink
+        self.service_name = service_name
+        self.spans: deque[dict] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        data = self.to_otel(span)
+        if self.sink is not None:
+            self.sink(data)
+        else:
+            self.spans.append(data)
+
+    def to_otel(self, span: Span) -> dict:
+        """
+        Convert a span to the OpenTelemetry span data model.
+
+        span: Span
+            The span to be converted.
+        """
+        attributes = {f"tiny_fnc_engine.{phase}_seconds": value for phase, value in span.durations.items()}
+        attributes["tiny_fnc_engine.kind"] = span.kind
+        if span.kind == "call":
+            attributes["code.function"] = span.name
+        status = {"code": "STATUS_CODE_OK"}
+        events = []
+        if span.error is not None:
+            status = {"code": "STATUS_CODE_ERROR", "message": str(span.error)}
+            events.append({
+                "name": "exception",
+                "time_unix_nano": span.end_time_ns,
+                "attributes": {
+                    "exception.type": type(span.error).__name__,
+                    "exception.message": str(span.error)
+                }
+            })
+        return {
+            "name": span.name,
+            "trace_id": os.urandom(16).hex(),
+            "span_id": os.urandom(8).hex(),
+            "parent_span_id": None,
+            "kind": "SPAN_KIND_INTERNAL",
+            "start_time_unix_nano": span.start_time_ns,
+            "end_time_unix_nano": span.end_time_ns,
+            "attributes": attributes,
+            "events": events,
+            "status": status,
+            "resource": {"attributes": {"service.name": self.service_name}}
+        }
+
+class Instrumentation:
+    """
+    Hooks and metrics around the parsing and calling of
+    functions in an engine. Pass an instance to the engine
+    to enable it; without one, the engine skips all of this.
+
+    Hooks receive the Span of a function call: before hooks
+    when the call starts, after hooks when it succeeded and
+    error hooks when it failed. Exceptions raised by hooks
+    propagate to the caller.
+
+    exporters: Optional[list[Exporter]]
+        The exporters receiving every finished span.
+    buckets: tuple[float, ...]
+        The upper bounds of the latency histogram buckets.
+    """
+    def __init__(
+            self,
+            exporters: Optional[list[Exporter]] = None,
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+        ):
+        self.exporters = list(exporters or [])
+        self.buckets = buckets
+        self.before_hooks: list[Callable[[Span], None]] = []
+        self.after_hooks: list[Callable[[Span], None]] = []
+        self.error_hooks: list[Callable[[Span], None]] = []
+        self.metrics: dict[str, FunctionMetrics] = {}
+        self.parse_metrics = FunctionMetrics(buckets)
+        self._lock = threading.Lock()
+
+    def add_hooks(
+            self,
+            before: Optional[Callable[[Span], None]] = None,
+            after: Optional[Callable[[Span], None]] = None,
+            error: Optional[Callable[[Span], None]] = None
+        ) -> None:
+        """
+        Add callbacks around function calls.
+
+        before: Optional[Callable[[Span], None]]
+            Called before a function call starts.
+        after: Optional[Callable[[Span], None]]
+            Called after a function call succeeded.
+        error: Optional[Callable[[Span], None]]
+            Called after a function call failed.
+        """
+        if before is not None:
+            self.before_hooks.append(before)
+        if after is not None:
+            self.after_hooks.append(after)
+        if error is not None:
+            self.error_hooks.append(error)
+
+    def start_call(self, function_call: Any) -> Span:
+        """
+        Start the span of a function call.
+
+        function_call: Any
+            The function call that starts.
+        """
+        span = Span(function_call.name, "call", function_call)
+        for hook in self.before_hooks:
+            hook(span)
+        return span
+
+    def finish_call(self, span: Span, output: Any) -> None:
+        """
+        Finish the span of a successful function call.
+        """
+        span.output = output
+        self._finish(span)
+        for hook in self.after_hooks:
+            hook(span)
+
+    def fail_call(self, span: Span, error: BaseException) -> None:
+        """
+        Finish the span of a failed function call.
+        """
+        span.error = error
+        self._finish(span)
+        for hook in self.error_hooks:
+            hook(span)
+
+    def start_parse(self) -> Span:
+        return Span("parse_function_calls", "parse")
+
+    def finish_parse(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.error = error
+        self._finish(span)
+
+    def _finish(self, span: Span) -> None:
+        span.end()
+        with self._lock:
+            if span.kind == "parse":
+                metrics = self.parse_metrics
+            else:
+                metrics = self.metrics.get(span.name)
+                if metrics is None:
+                    metrics = self.metrics[span.name] = FunctionMetrics(self.buckets)
+            metrics.calls += 1
+            if span.error is not None:
+                metrics.errors += 1
+            for phase, duration in span.durations.items():
+                metrics.histograms[phase].observe(duration)
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Summarize the metrics of each function, and of parsing
+        under "parse_function_calls": the number of calls and
+        errors and the mean and p99 latency of each phase.
+        """
+        with self._lock:
+            metrics = {"parse_function_calls": self.parse_metrics, **self.metrics}
+            return {
+                name: {
+                    "calls": function_metrics.calls,
+                    "errors": function_metrics.errors,
+                    **{
+                        f"{phase}_mean": histogram.mean
+                        for phase, histogram in function_metrics.histograms.items() if histogram.count
+                    },
+                    **{
+                        f"{phase}_p99": histogram.quantile(0.99)
+                        for phase, histogram in function_metrics.histograms.items() if histogram.count
+                    }
+                }
+                for name, function_metrics in metrics.items()
+            }
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.shutdown()
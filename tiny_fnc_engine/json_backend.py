@@ -0,0 +1,96 @@
+from typing import Any, Callable, NamedTuple, Optional, Union
+import json
+
+# Types of raw JSON input accepted by the backends
+JSONInput = Union[str, bytes, bytearray, memoryview]
+JSON_TYPES = (str, bytes, bytearray, memoryview)
+
+# Supported backends. orjson and msgspec are faster, but reject
+# NaN and Infinity literals and integers beyond 64 bits, which the
+# stdlib accepts, so they are only used when asked for by name
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+class JSONBackend(NamedTuple):
+    """
+    JSON decoder used to parse LLM responses.
+
+    name: str
+        The name of the backend, one of JSON_BACKENDS.
+    loads: Callable[[JSONInput], Any]
+        Decode a JSON document given as str, bytes, bytearray
+        or memoryview. Raises json.JSONDecodeError on invalid
+        JSON, whatever the backend.
+    """
+    name: str
+    loads: Callable[[JSONInput], Any]
+
+def _json_loads(data: JSONInput) -> Any:
+    # The stdlib decodes bytes itself, but does not accept memoryviews,
+    # so decode them straight from the buffer as json.loads does for bytes
+    if isinstance(data, memoryview):
+        data = str(data, json.detect_encoding(data[:4].tobytes()), "surrogatepass")
+    return json.loads(data)
+
+def _orjson_loads() -> Callable[[JSONInput], Any]:
+    import orjson
+
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    return orjson.loads
+
+def _msgspec_loads() -> Callable[[JSONInput], Any]:
+    import msgspec
+
+    decode = msgspec.json.Decoder().decode
+    def loads(data: JSONInput) -> Any:
+        try:
+            return decode(data)
+        except msgspec.DecodeError as e:
+            raise json.JSONDecodeError(str(e), "", 0) from e
+    return loads
+
+_loaders = {
+    "orjson": _orjson_loads,
+    "msgspec": _msgspec_loads,
+    "json": lambda: _json_loads
+}
+
+# Backends loaded so far, by name
+_backends: dict[str, JSONBackend] = {}
+
+def get_json_backend(name: Optional[str] = None) -> JSONBackend:
+    """
+    Get a JSON backend by name, or the stdlib json backend
+    if no name is given. orjson and msgspec are faster, but
+    reject NaN and Infinity literals and integers beyond
+    64 bits, so they have to be asked for by name.
+
+    name: Optional[str]
+        The name of the backend, one of JSON_BACKENDS.
+        Defaults to "json".
+
+    Raises:
+        ValueError: If the name is not one of JSON_BACKENDS.
+        ImportError: If the named backend is not installed.
+    """
+    if name is None:
+        name = "json"
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"JSON backend must be one of {JSON_BACKENDS}, got {name!r}")
+
+    backend = _backends.get(name)
+    if backend is None:
+        backend = _backends[name] = JSONBackend(name, _loaders[name]())
+    return backend
+
+def available_json_backends() -> list[str]:
+    """
+    Get the names of the installed JSON backends.
+    """
+    available = []
+    for name in JSON_BACKENDS:
+        try:
+            get_json_backend(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
@@ -0,0 +1,270 @@
+from typing import Callable, NamedTuple, Optional
+from collections import deque
+import threading
+import asyncio
+import heapq
+import time
+
+class FunctionTimeoutError(TimeoutError):
+    """
+    Error raised when a function call, or the plan of
+    function calls it belongs to, ran out of time.
+
+    name: Optional[str]
+        The name of the function that timed out, if any.
+    timeout: float
+        The timeout that expired, in seconds.
+    scope: str
+        "function" if the timeout of the function expired,
+        or "plan" if the timeout of the plan expired.
+    """
+    def __init__(self, name: Optional[str], timeout: float, scope: str = "function"):
+        self.name = name
+        self.timeout = timeout
+        self.scope = scope
+        if scope == "function":
+            message = f"{name}() timed out after {timeout:g} seconds"
+        else:
+            message = f"The plan timed out after {timeout:g} seconds"
+            if name is not None:
+                message += f" while calling {name}()"
+        super().__init__(message)
+
+    def __reduce__(self) -> tuple:
+        return type(self), (self.name, self.timeout, self.scope)
+
+class ConcurrencyLimitError(RuntimeError):
+    """
+    Error raised when a function call cannot wait for
+    the concurrency limit of its function because the
+    queue of waiting calls is full.
+    """
+
+class Deadline(NamedTuple):
+    """
+    Point in time by which a plan of function calls must finish.
+
+    at: float
+        The deadline, in time.monotonic() seconds.
+    timeout: float
+        The timeout of the plan, in seconds.
+    """
+    at: float
+    timeout: float
+
+    @classmethod
+    def after(cls, timeout: float) -> "Deadline":
+        return cls(time.monotonic() + timeout, timeout)
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+def get_call_timeout(
+        timeout: Optional[float],
+        deadline: Optional[Deadline]
+    ) -> tuple[Optional[float], str]:
+    """
+    Get the time left for a function call and the scope of
+    the timeout that applies, "function" or "plan".
+
+    timeout: Optional[float]
+        The timeout of the function, if any.
+    deadline: Optional[Deadline]
+        The deadline of the plan, if any.
+    """
+    if deadline is None:
+        return timeout, "function"
+    remaining = max(deadline.remaining(), 0.0)
+    if timeout is None or remaining < timeout:
+        return remaining, "plan"
+    return timeout, "function"
+
+def make_timeout_error(
+        name: str,
+        timeout: Optional[float],
+        deadline: Optional[Deadline],
+        scope: str
+    ) -> FunctionTimeoutError:
+    if scope == "plan":
+        return FunctionTimeoutError(name, deadline.timeout, "plan")
+    return FunctionTimeoutError(name, timeout, "function")
+
+class ConcurrencyLimiter:
+    """
+    First-in first-out semaphore limiting how many calls of
+    a function run at the same time, shared by all sessions
+    of an engine. Calls over the limit wait in a queue, from
+    threads, from asyncio tasks or as callbacks.
+
+    limit: int
+        The maximum number of calls running at the same time.
+    max_queue: Optional[int]
+        The maximum number of calls waiting for a slot. Further
+        calls raise ConcurrencyLimitError. Unbounded if None.
+    """
+    def __init__(self, limit: int, max_queue: Optional[int] = None):
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        self.limit = limit
+        self.max_queue = max_queue
+        self._active = 0
+        self._waiters: deque[list] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        """
+        The number of calls holding a slot.
+        """
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        """
+        The number of calls waiting for a slot.
+        """
+        return len(self._waiters)
+
+    def request(self, callback: Callable[[], None]) -> Optional[list]:
+        """
+        Request a slot. Returns None if the slot was acquired
+        right away, in which case the callback is not called.
+        Otherwise, returns the waiter of the request, and
+        the callback is called by the thread releasing the
+        slot that is handed over to the request.
+
+        callback: Callable[[], None]
+            The function called once the slot is acquired.
+
+        Raises:
+            ConcurrencyLimitError: If the queue is full.
+        """
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return None
+            if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+                raise ConcurrencyLimitError(
+                    f"{len(self._waiters)} calls are already waiting for the concurrency limit of {self.limit}"
+                )
+            waiter = [callback]
+            self._waiters.append(waiter)
+            return waiter
+
+    def withdraw(self, waiter: list) -> bool:
+        """
+        Withdraw a request that is still waiting. Returns
+        False if the slot was already handed over to it.
+
+        waiter: list
+            The waiter returned by request.
+        """
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            return True
+
+    def release(self) -> None:
+        """
+        Release a slot, handing it over to the first waiting request.
+        """
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            waiter = self._waiters.popleft()
+        waiter[0]()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a slot in the calling thread. Returns
+        False if no slot was free before the timeout.
+
+        timeout: Optional[float]
+            The maximum number of seconds to wait.
+        """
+        event = threading.Event()
+        waiter = self.request(event.set)
+        if waiter is None or event.wait(timeout):
+            return True
+        return not self.withdraw(waiter)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a slot without blocking the event loop.
+        Returns False if no slot was free before the timeout.
+
+        timeout: Optional[float]
+            The maximum number of seconds to wait.
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def grant() -> None:
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        waiter = self.request(grant)
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return not self.withdraw(waiter)
+        except asyncio.CancelledError:
+            if not self.withdraw(waiter):
+                self.release()
+            raise
+
+class TimerQueue:
+    """
+    Single daemon thread running callbacks after a delay,
+    used to time out function calls that run on pools
+    without a thread per pending timeout.
+    """
+    def __init__(self):
+        self._timers: list[list] = []
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> list:
+        """
+        Run a callback after a delay. Returns the timer,
+        which can be passed to cancel.
+
+        delay: float
+            The delay in seconds.
+        callback: Callable[[], None]
+            The function to be called.
+        """
+        with self._condition:
+            self._counter += 1
+            timer = [time.monotonic() + delay, self._counter, callback]
+            heapq.heappush(self._timers, timer)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="tiny_fnc_engine_timers", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return timer
+
+    @staticmethod
+    def cancel(timer: list) -> None:
+        timer[2] = None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    self._condition.wait(self._timers[0][0] - time.monotonic() if self._timers else None)
+                callback = heapq.heappop(self._timers)[2]
+            if callback is not None:
+                try:
+                    callback()
+                except Exception:
+                    pass
+
+# Timers of the timeouts of all engines
+timers = TimerQueue()
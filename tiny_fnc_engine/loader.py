@@ -0,0 +1,213 @@
+from typing import NamedTuple, Optional
+import threading
+import hashlib
+import json
+import glob
+import ast
+import os
+
+# Version of the manifest format, manifests of other versions are rescanned
+MANIFEST_VERSION = 1
+
+class FunctionInfo(NamedTuple):
+    """
+    Signature of a function found by scanning the source
+    of a module, without importing it.
+
+    name: str
+        The name of the function.
+    parameters: tuple[str, ...]
+        The names of the parameters that can be passed
+        as keyword arguments.
+    required: tuple[str, ...]
+        The names of the parameters without a default.
+    var_keyword: bool
+        Whether the function accepts **kwargs.
+    annotations: dict[str, str]
+        The source of the annotation of each annotated
+        parameter, and of the return value under "return".
+    is_async: bool
+        Whether the function is a coroutine function.
+    docstring: Optional[str]
+        The docstring of the function.
+    """
+    name: str
+    parameters: tuple[str, ...]
+    required: tuple[str, ...]
+    var_keyword: bool
+    annotations: dict[str, str]
+    is_async: bool
+    docstring: Optional[str]
+
+def _scan_function(node: ast.FunctionDef) -> FunctionInfo:
+    arguments = node.args
+    positional = arguments.posonlyargs + arguments.args
+    # Defaults belong to the last positional parameters
+    first_default = len(positional) - len(arguments.defaults)
+
+    parameters, required, annotations = [], [], {}
+    for i, argument in enumerate(positional):
+        if i < len(arguments.posonlyargs):
+            # Positional-only parameters cannot be passed by name
+            continue
+        parameters.append(argument.arg)
+        if i < first_default:
+            required.append(argument.arg)
+    for argument, default in zip(arguments.kwonlyargs, arguments.kw_defaults):
+        parameters.append(argument.arg)
+        if default is None:
+            required.append(argument.arg)
+
+    for argument in positional + arguments.kwonlyargs:
+        if argument.annotation is not None:
+            annotations[argument.arg] = ast.unparse(argument.annotation)
+    if node.returns is not None:
+        annotations["return"] = ast.unparse(node.returns)
+
+    return FunctionInfo(
+        name=node.name,
+        parameters=tuple(parameters),
+        required=tuple(required),
+        var_keyword=arguments.kwarg is not None,
+        annotations=annotations,
+        is_async=isinstance(node, ast.AsyncFunctionDef),
+        docstring=ast.get_docstring(node)
+    )
+
+def scan_source(source: str, file_path: str = "<unknown>") -> list[FunctionInfo]:
+    """
+    Find the public functions defined at the top level of
+    a module, i.e. without a leading underscore. Imported
+    functions, classes and nested functions are skipped.
+
+    source: str
+        The source code of the module.
+    file_path: str
+        The path of the module, used in syntax errors.
+
+    Raises:
+        SyntaxError: If the source cannot be parsed.
+    """
+    tree = ast.parse(source, filename=file_path)
+    return [
+        _scan_function(node)
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_")
+    ]
+
+class ToolManifest:
+    """
+    Cache of the functions found in source files, optionally
+    saved to a JSON file so that restarts skip the scan. A
+    file is only rescanned when its content changed: its
+    modification time and size are checked first, and its
+    hash only if they differ from the manifest.
+
+    path: Optional[str]
+        The path of the JSON file of the manifest. It is read
+        if it exists, and written by save. Kept in memory only
+        if None.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.files: dict[str, dict] = {}
+        self.scanned = 0
+        self.reused = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                data = json.load(file)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data["files"]
+
+    def scan(self, file_path: str) -> list[FunctionInfo]:
+        """
+        Get the functions of a source file, scanning it
+        only if it changed since it was last scanned.
+
+        file_path: str
+            The path of the source file.
+
+        Raises:
+            SyntaxError: If the file cannot be parsed.
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        with self._lock:
+            record = self.files.get(file_path)
+            if record is not None and (record["mtime_ns"], record["size"]) == (stat.st_mtime_ns, stat.st_size):
+                self.reused += 1
+                return self._to_functions(record)
+
+        with open(file_path, "rb") as file:
+            source = file.read()
+        digest = hashlib.blake2b(source, digest_size=16).hexdigest()
+
+        with self._lock:
+            if record is not None and record["hash"] == digest:
+                # Touched but not modified
+                self.reused += 1
+                functions = self._to_functions(record)
+            else:
+                self.scanned += 1
+                functions = scan_source(source.decode("utf-8"), file_path)
+            self.files[file_path] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "functions": [function._asdict() for function in functions]
+            }
+            self._dirty = True
+        return functions
+
+    def save(self) -> None:
+        """
+        Write the manifest to its path, if it has one
+        and it changed since it was read.
+        """
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            data = {"version": MANIFEST_VERSION, "files": self.files}
+            # Write to a temporary file first so readers never see a partial manifest
+            temporary_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(data, file)
+            os.replace(temporary_path, self.path)
+            self._dirty = False
+
+    @staticmethod
+    def _to_functions(record: dict) -> list[FunctionInfo]:
+        return [
+            FunctionInfo(**{
+                **function,
+                "parameters": tuple(function["parameters"]),
+                "required": tuple(function["required"])
+            })
+            for function in record["functions"]
+        ]
+
+def find_source_files(directory: str, pattern: str = "**/*.py") -> list[str]:
+    """
+    Find the source files of a directory, in sorted order.
+    Files and directories whose name starts with an
+    underscore, such as __init__.py, are skipped.
+
+    directory: str
+        The directory to be searched.
+    pattern: str
+        The glob pattern of the source files, relative
+        to the directory.
+
+    Raises:
+        NotADirectoryError: If the directory does not exist.
+    """
+    if not os.path.isdir(directory):
+        raise NotADirectoryError(f"Directory {directory} not found")
+    return sorted(
+        os.path.abspath(path)
+        for path in glob.glob(os.path.join(directory, pattern), recursive=True)
+        if os.path.isfile(path)
+        and not any(part.startswith("_") for part in os.path.relpath(path, directory).split(os.sep))
+    )
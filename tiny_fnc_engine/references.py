@@ -0,0 +1,187 @@
+from typing import Any, NamedTuple, Union
+from collections.abc import Mapping, MutableMapping
+import re
+
+# Declare constants
+REFERENCE_MODES = ("implicit", "explicit")
+REFERENCE_KEY = "$ref"
+_ROOT = re.compile(r"[^.\[\]]+")
+_ACCESSOR = re.compile(r"""\.([^.\[\]]+)|\[(-?\d+)\]|\[(["'])(.*?)\3\]""")
+
+class Reference(NamedTuple):
+    """
+    Reference of a function call to the output of an earlier
+    function call, found when the call is compiled.
+
+    location: tuple[Union[str, int], ...]
+        The keys and indices leading from the parameters
+        of the call to the referencing value.
+    path: str
+        The reference as written, e.g. "user.name".
+    name: str
+        The name of the referenced output.
+    accessors: tuple[Union[str, int], ...]
+        The keys, attributes and indices accessed on the output.
+    implicit: bool
+        Whether the reference is a plain string parameter of
+        the "implicit" mode, only resolved if it names an output.
+    """
+    location: tuple[Union[str, int], ...]
+    path: str
+    name: str
+    accessors: tuple[Union[str, int], ...]
+    implicit: bool
+
+def parse_reference_path(path: str) -> tuple[str, tuple[Union[str, int], ...]]:
+    """
+    Split a reference path into the name of an output and
+    the accessors applied to it, e.g. "results[0].name"
+    into ("results", (0, "name")). Keys containing dots or
+    brackets can be quoted, as in 'scores["a.b"]'.
+
+    path: str
+        The reference path.
+
+    Raises:
+        ValueError: If the path is invalid.
+    """
+    root = _ROOT.match(path)
+    if root is None:
+        raise ValueError(f"Invalid reference {path!r}")
+    accessors, position = [], root.end()
+    while position < len(path):
+        match = _ACCESSOR.match(path, position)
+        if match is None:
+            raise ValueError(f"Invalid reference {path!r}")
+        attribute, index, _, key = match.groups()
+        if attribute is not None:
+            accessors.append(attribute)
+        elif index is not None:
+            accessors.append(int(index))
+        else:
+            accessors.append(key)
+        position = match.end()
+    return root.group(), tuple(accessors)
+
+def _is_reference(value: Any) -> bool:
+    return type(value) is dict and len(value) == 1 and isinstance(value.get(REFERENCE_KEY), str)
+
+def _find_references(value: Any, location: tuple, references: list[Reference]) -> None:
+    if _is_reference(value):
+        path = value[REFERENCE_KEY]
+        name, accessors = parse_reference_path(path)
+        references.append(Reference(location, path, name, accessors, False))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                _find_references(item, (*location, key), references)
+    elif isinstance(value, list):
+        # Lists of scalars, e.g. large arrays, are skipped without a Python loop
+        types = set(map(type, value))
+        if dict in types or list in types:
+            for index, item in enumerate(value):
+                if isinstance(item, (dict, list)):
+                    _find_references(item, (*location, index), references)
+
+def compile_references(parameters: dict[str, Any], explicit: bool = False) -> tuple[Reference, ...]:
+    """
+    Compile the parameters of a function call into the list of
+    its references, so that resolving them walks only their
+    paths. In the "explicit" mode, references are {"$ref": path}
+    objects at any depth. In the "implicit" mode, the top-level
+    string parameters are references if they name an output.
+
+    parameters: dict[str, Any]
+        The parameters of the function call.
+    explicit: bool
+        Whether to compile explicit references.
+
+    Raises:
+        ValueError: If a reference path is invalid.
+    """
+    references = []
+    for key, value in parameters.items():
+        if explicit:
+            if isinstance(value, (dict, list)):
+                _find_references(value, (key,), references)
+        elif isinstance(value, str):
+            references.append(Reference((key,), value, value, (), True))
+    return tuple(references)
+
+def get_output(reference: Reference, outputs: MutableMapping[str, Any]) -> Any:
+    """
+    Get the value of an explicit reference from the outputs
+    of a session. Keys of mappings are looked up with [],
+    other objects, such as Pydantic models, with getattr.
+    Attributes starting with an underscore are not found, so
+    that references cannot reach private or interpreter
+    internals such as __class__ or __globals__.
+
+    reference: Reference
+        The reference to be resolved.
+    outputs: MutableMapping[str, Any]
+        The outputs of the session.
+
+    Raises:
+        KeyError: If the output or one of its accessors does not exist.
+    """
+    try:
+        value = outputs[reference.name]
+    except KeyError:
+        raise KeyError(f"Output {reference.name!r} referenced by {reference.path!r} does not exist") from None
+    for accessor in reference.accessors:
+        try:
+            if isinstance(accessor, int) or isinstance(value, Mapping):
+                value = value[accessor]
+            elif accessor.startswith("_"):
+                raise AttributeError(accessor)
+            else:
+                value = getattr(value, accessor)
+        except (LookupError, AttributeError, TypeError) as e:
+            raise KeyError(f"Cannot resolve {reference.path!r}: {accessor!r} not found in {type(value).__name__}") from e
+    return value
+
+def resolve_references(
+        parameters: dict[str, Any],
+        references: tuple[Reference, ...],
+        outputs: MutableMapping[str, Any]
+    ) -> dict[str, Any]:
+    """
+    Replace the references of a function call by the outputs
+    they reference. The parameters are not modified: the
+    containers on the path of each reference are copied,
+    while the rest of the tree is shared with the result.
+    The parameters are returned as is if nothing is replaced.
+
+    parameters: dict[str, Any]
+        The parameters of the function call.
+    references: tuple[Reference, ...]
+        The compiled references of the parameters.
+    outputs: MutableMapping[str, Any]
+        The outputs of the session.
+
+    Raises:
+        KeyError: If an explicit reference cannot be resolved.
+    """
+    resolved = None
+    for reference in references:
+        if reference.implicit:
+            if reference.name not in outputs:
+                continue
+            value = outputs[reference.name]
+        else:
+            value = get_output(reference, outputs)
+
+        if resolved is None:
+            resolved, copies = dict(parameters), {}
+        location = reference.location
+        container = resolved
+        for depth in range(1, len(location)):
+            child = copies.get(location[:depth])
+            if child is None:
+                child = container[location[depth - 1]]
+                child = copies[location[:depth]] = dict(child) if isinstance(child, dict) else list(child)
+                container[location[depth - 1]] = child
+            container = child
+        container[location[-1]] = value
+    return resolved if resolved is not None else parameters
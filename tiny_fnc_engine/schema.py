@@ -0,0 +1,203 @@
+from typing import Any, Optional
+import warnings
+import inspect
+import typing
+import json
+import re
+
+from pydantic import ConfigDict, Field, create_model
+
+from tiny_fnc_engine.loader import FunctionInfo
+
+# Section headers after which a docstring no longer describes parameters
+_OTHER_SECTIONS = {"Returns:", "Return:", "Raises:", "Yields:", "Examples:", "Example:", "Note:", "Notes:"}
+_ARGUMENT_SECTIONS = {"Args:", "Arguments:", "Parameters:", "Params:"}
+_PARAMETER_LINE = re.compile(r"^(?::param\s+)?\*{0,2}(\w+)\s*(?:\([^)]*\))?\s*:(.*)$")
+
+# JSON schema types of the builtin annotations, used for unimported functions
+_ANNOTATION_TYPES = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "List": "array",
+    "tuple": "array",
+    "Tuple": "array",
+    "set": "array",
+    "dict": "object",
+    "Dict": "object",
+}
+
+def parse_docstring(docstring: Optional[str], parameter_names: set[str]) -> tuple[str, dict[str, str]]:
+    """
+    Get the description of a function and of each of its
+    parameters from its docstring. Parameters can be
+    documented in the style of this library, a "name: type"
+    line followed by an indented description, in the Google
+    style under an "Args:" section, or with ":param name:".
+
+    docstring: Optional[str]
+        The docstring of the function.
+    parameter_names: set[str]
+        The names of the parameters of the function.
+    """
+    if not docstring:
+        return "", {}
+
+    summary, descriptions = [], {}
+    current, current_indent = None, 0
+    in_summary, in_arguments = True, False
+    for line in inspect.cleandoc(docstring).splitlines():
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+
+        if indent == 0 and stripped in _ARGUMENT_SECTIONS | _OTHER_SECTIONS:
+            in_summary, current = False, None
+            in_arguments = stripped in _ARGUMENT_SECTIONS
+            continue
+
+        match = _PARAMETER_LINE.match(stripped)
+        if match and match.group(1) in parameter_names and (indent == 0 or in_arguments):
+            in_summary = False
+            current, current_indent = match.group(1), indent
+            # After "name: type" lines, the text is the type, not a description
+            rest = match.group(2).strip()
+            descriptions[current] = rest if in_arguments or stripped.startswith(":param") else ""
+            continue
+
+        if in_summary:
+            if stripped:
+                summary.append(stripped)
+            elif summary:
+                in_summary = False
+        elif current is not None and stripped and indent > current_indent:
+            descriptions[current] = f"{descriptions[current]} {stripped}".strip()
+        elif stripped:
+            current = None
+
+    return " ".join(summary), {name: text for name, text in descriptions.items() if text}
+
+def _strip_titles(schema: Any) -> Any:
+    """
+    Remove the titles Pydantic adds to JSON schemas, which
+    only repeat the names of the properties and models.
+    """
+    if isinstance(schema, dict):
+        return {
+            key: (
+                {name: _strip_titles(value) for name, value in item.items()}
+                if key in ("properties", "$defs")
+                else _strip_titles(item)
+            )
+            for key, item in schema.items()
+            if not (key == "title" and isinstance(item, str))
+        }
+    if isinstance(schema, list):
+        return [_strip_titles(item) for item in schema]
+    return schema
+
+def _tool(name: str, description: str, parameters: dict) -> dict:
+    function = {"name": name}
+    if description:
+        function["description"] = description
+    function["parameters"] = parameters
+    return {"type": "function", "function": function}
+
+def build_tool_schema(name: str, function: callable) -> dict:
+    """
+    Build the OpenAI tool schema of a function from its
+    signature, type hints and docstring. Pydantic models
+    in the annotations are described under "$defs".
+
+    name: str
+        The name of the tool.
+    function: callable
+        The function to be described.
+    """
+    try:
+        signature = inspect.signature(function)
+    except (TypeError, ValueError):
+        return _tool(name, inspect.getdoc(function) or "", {"type": "object", "properties": {}})
+    try:
+        hints = typing.get_type_hints(function)
+    except Exception:
+        hints = {}
+
+    parameters = [
+        parameter for parameter in signature.parameters.values()
+        if parameter.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    ]
+    description, descriptions = parse_docstring(inspect.getdoc(function), {parameter.name for parameter in parameters})
+
+    # Fields are aliased, so that any parameter name is a valid field name
+    fields = {
+        f"field_{i}": (
+            hints.get(parameter.name, Any),
+            Field(
+                ... if parameter.default is inspect.Parameter.empty else parameter.default,
+                alias=parameter.name,
+                description=descriptions.get(parameter.name)
+            )
+        )
+        for i, parameter in enumerate(parameters)
+    }
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = create_model(f"{name}_parameters", __config__=ConfigDict(arbitrary_types_allowed=True), **fields)
+            schema = _strip_titles(model.model_json_schema(by_alias=True))
+    except Exception:
+        # Types or defaults without a JSON schema
+        schema = {
+            "type": "object",
+            "properties": {
+                parameter.name: {"description": descriptions[parameter.name]} if parameter.name in descriptions else {}
+                for parameter in parameters
+            },
+            "required": [parameter.name for parameter in parameters if parameter.default is inspect.Parameter.empty]
+        }
+    schema.setdefault("properties", {})
+    if not schema.get("required"):
+        schema.pop("required", None)
+    return _tool(name, description, schema)
+
+def _annotation_schema(annotation: str) -> dict:
+    annotation = annotation.replace(" ", "")
+    optional = re.fullmatch(r"(?:typing\.)?Optional\[(.*)\]", annotation)
+    if optional:
+        annotation = optional.group(1)
+    elif annotation.endswith("|None"):
+        annotation = annotation[:-len("|None")]
+    base = annotation.split("[", 1)[0].rsplit(".", 1)[-1]
+    return {"type": _ANNOTATION_TYPES[base]} if base in _ANNOTATION_TYPES else {}
+
+def build_tool_schema_from_info(info: FunctionInfo) -> dict:
+    """
+    Build the OpenAI tool schema of a function that was
+    scanned but not imported. Only builtin annotations
+    such as str, int or list[str] get a type.
+
+    info: FunctionInfo
+        The scanned signature of the function.
+    """
+    description, descriptions = parse_docstring(info.docstring, set(info.parameters))
+    properties = {}
+    for name in info.parameters:
+        schema = _annotation_schema(info.annotations[name]) if name in info.annotations else {}
+        if name in descriptions:
+            schema["description"] = descriptions[name]
+        properties[name] = schema
+    parameters = {"type": "object", "properties": properties}
+    if info.required:
+        parameters["required"] = list(info.required)
+    return _tool(info.name, description, parameters)
+
+def serialize_tool_schema(schema: dict) -> bytes:
+    """
+    Serialize a tool schema to compact JSON bytes.
+
+    schema: dict
+        The tool schema to be serialized.
+    """
+    return json.dumps(schema, separators=(",", ":"), ensure_ascii=False).encode()
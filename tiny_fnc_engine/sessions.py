@@ -0,0 +1,340 @@
+from typing import TYPE_CHECKING, AsyncIterable, Iterable, Optional, Sequence, Union
+from collections.abc import MutableMapping
+import threading
+import time
+
+from tiny_fnc_engine.json_backend import JSONInput
+from tiny_fnc_engine.snapshots import Checkpoint, snapshot_outputs
+
+if TYPE_CHECKING:
+    from tiny_fnc_engine.engine import CallResults, FunctionCallingEngine, FunctionCall, PlanReport, ValidOutput
+    from tiny_fnc_engine.async_engine import AsyncCallResults
+
+class Session:
+    """
+    Lightweight session of a FunctionCallingEngine. Each
+    session owns its outputs, while the functions and the
+    pools of the engine are shared by all of its sessions.
+    Sessions are created with engine.create_session.
+
+    engine: FunctionCallingEngine
+        The engine of the session.
+    session_id: str
+        The ID of the session.
+    ttl: Optional[float]
+        The number of idle seconds after which the session
+        expires. Sessions never expire if None.
+    """
+    __slots__ = ("engine", "session_id", "ttl", "outputs", "last_used", "checkpoint")
+
+    def __init__(self, engine: "FunctionCallingEngine", session_id: str, ttl: Optional[float] = None):
+        self.engine = engine
+        self.session_id = session_id
+        self.ttl = ttl
+        self.outputs: MutableMapping[str, "ValidOutput"] = engine.output_store()
+        self.last_used = time.monotonic()
+        self.checkpoint: Optional[Checkpoint] = None
+
+    @property
+    def expired(self) -> bool:
+        """
+        Whether the session has been idle for longer than its TTL.
+        """
+        return self.ttl is not None and time.monotonic() - self.last_used > self.ttl
+
+    def touch(self) -> None:
+        """
+        Mark the session as used, which postpones its expiry.
+        """
+        self.last_used = time.monotonic()
+
+    def reset(self) -> None:
+        """
+        Reset the outputs of the session.
+        """
+        self.close()
+        self.outputs = self.engine.output_store()
+        self.checkpoint = None
+
+    def close(self) -> None:
+        """
+        Release the outputs of the session.
+        """
+        close = getattr(self.outputs, "close", None)
+        if close is not None:
+            close()
+
+    def snapshot(self, incremental: bool = False, compress: bool = False) -> bytes:
+        """
+        Take a snapshot of the outputs of the session, which
+        engine.restore_session restores, e.g. in another
+        process. Pydantic outputs are stored as JSON, other
+        outputs are pickled with protocol 5, with the buffers
+        of large outputs such as arrays out of band.
+
+        incremental: bool
+            Whether to only store the outputs added, replaced
+            or removed since the last snapshot of the session.
+            The first snapshot is always a full snapshot.
+        compress: bool
+            Whether to compress the snapshot with zlib.
+
+        Raises:
+            pickle.PicklingError, TypeError: If an output cannot be pickled.
+        """
+        checkpoint = self.checkpoint if incremental else None
+        data, self.checkpoint = snapshot_outputs(self.outputs, checkpoint, compress, self.session_id)
+        return data
+
+    def call_function(self, function_call: "FunctionCall") -> "ValidOutput":
+        """
+        Call a function with the outputs of the session.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        """
+        self.touch()
+        return self.engine._call_function(function_call, self.outputs)
+
+    def call_functions(
+            self,
+            function_calls: list["FunctionCall"],
+            parallel: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional["PlanReport"] = None
+        ) -> list["ValidOutput"]:
+        """
+        Call multiple functions with the outputs of the session.
+
+        function_calls: list[FunctionCall]
+            The function calls to be executed.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        optimization: Optional[PlanReport]
+            The calls that do not run, see engine.call_functions.
+        """
+        self.touch()
+        return self.engine._call_functions(function_calls, self.outputs, parallel, timeout, cancel_event, optimization)
+
+    def parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            parallel: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> list["ValidOutput"]:
+        """
+        Parse and call function calls with the outputs of the session.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        """
+        self.touch()
+        function_calls = self.engine._parse_input(function_calls, verbose)
+        return self.engine._call_functions(function_calls, self.outputs, parallel, timeout, cancel_event)
+
+    def iter_call_functions(
+            self,
+            function_calls: Sequence["FunctionCall"],
+            parallel: bool = True,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> "CallResults":
+        """
+        Call multiple functions with the outputs of the session,
+        yielding their results in completion order, see
+        engine.iter_call_functions.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        """
+        self.touch()
+        return self.engine._iter_call_functions(function_calls, self.outputs, parallel, timeout, cancel_event)
+
+    def iter_parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            parallel: bool = True,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> "CallResults":
+        """
+        Parse function calls and yield their results in
+        completion order with the outputs of the session.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        parallel: bool
+            Whether to run independent function calls in parallel.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        """
+        self.touch()
+        function_calls = self.engine._parse_input(function_calls, verbose)
+        return self.engine._iter_call_functions(function_calls, self.outputs, parallel, timeout, cancel_event)
+
+    def stream_and_call_functions(
+            self,
+            chunks: Iterable[Union[str, dict, list]],
+            verbose: bool = False
+        ) -> list["ValidOutput"]:
+        """
+        Parse and call function calls from a streamed LLM
+        response with the outputs of the session.
+
+        chunks: Iterable[Union[str, dict, list]]
+            The chunks of the response.
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        self.touch()
+        return self.engine._stream_and_call_functions(chunks, self.outputs, verbose)
+
+class AsyncSession(Session):
+    """
+    Session of an AsyncFunctionCallingEngine, whose
+    calls are awaited like those of the engine.
+    """
+    __slots__ = ()
+
+    async def call_function(self, function_call: "FunctionCall") -> "ValidOutput":
+        """
+        Call a function with the outputs of the session.
+
+        function_call: FunctionCall
+            The function call to be executed.
+        """
+        self.touch()
+        return await self.engine._call_function(function_call, self.outputs)
+
+    async def call_functions(
+            self,
+            function_calls: list["FunctionCall"],
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None,
+            optimization: Optional["PlanReport"] = None
+        ) -> list["ValidOutput"]:
+        """
+        Call multiple functions with the outputs of the session.
+
+        function_calls: list[FunctionCall]
+            The function calls to be executed.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        optimization: Optional[PlanReport]
+            The calls that do not run, see engine.call_functions.
+        """
+        self.touch()
+        return await self.engine._call_functions(function_calls, self.outputs, timeout, cancel_event, optimization)
+
+    async def parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> list["ValidOutput"]:
+        """
+        Parse and call function calls with the outputs of the session.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        """
+        self.touch()
+        function_calls = self.engine._parse_input(function_calls, verbose)
+        return await self.engine._call_functions(function_calls, self.outputs, timeout, cancel_event)
+
+    def iter_call_functions(
+            self,
+            function_calls: Sequence["FunctionCall"],
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> "AsyncCallResults":
+        """
+        Call multiple functions with the outputs of the session,
+        yielding their results in completion order, see
+        engine.iter_call_functions.
+
+        function_calls: Sequence[FunctionCall]
+            The function calls to be executed.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        """
+        self.touch()
+        return self.engine._iter_call_functions(function_calls, self.outputs, timeout, cancel_event)
+
+    def iter_parse_and_call_functions(
+            self,
+            function_calls: Union[dict, list[dict], JSONInput],
+            verbose: bool = False,
+            timeout: Optional[float] = None,
+            cancel_event: Optional[threading.Event] = None
+        ) -> "AsyncCallResults":
+        """
+        Parse function calls and yield their results in
+        completion order with the outputs of the session.
+
+        function_calls: Union[dict, list[dict], JSONInput]
+            The function call(s) to be parsed and called.
+        verbose: bool
+            Whether to print the parsed function calls.
+        timeout: Optional[float]
+            The timeout of the plan, see engine.call_functions.
+        cancel_event: Optional[threading.Event]
+            The event cancelling the remaining calls, see engine.call_functions.
+        """
+        self.touch()
+        function_calls = self.engine._parse_input(function_calls, verbose)
+        return self.engine._iter_call_functions(function_calls, self.outputs, timeout, cancel_event)
+
+    async def stream_and_call_functions(
+            self,
+            chunks: Union[AsyncIterable[Union[str, dict, list]], Iterable[Union[str, dict, list]]],
+            verbose: bool = False
+        ) -> list["ValidOutput"]:
+        """
+        Parse and call function calls from a streamed LLM
+        response with the outputs of the session.
+
+        chunks: Union[AsyncIterable, Iterable]
+            The chunks of the response.
+        verbose: bool
+            Whether to print the parsed function calls.
+        """
+        self.touch()
+        return await self.engine._stream_and_call_functions(chunks, self.outputs, verbose)
@@ -0,0 +1,447 @@
+from typing import Any, Callable, Iterator, Optional
+from collections.abc import MutableMapping
+from multiprocessing import resource_tracker, shared_memory
+import threading
+import weakref
+import pickle
+
+from tiny_fnc_engine.stores import next_version
+
+# Declare constants
+SHARED_MEMORY_MIN_SIZE = 1 << 20
+
+# Segments mapped in this process, by name
+_segments: dict[str, shared_memory.SharedMemory] = {}
+# Segments whose mapping is still exported, e.g. by an array, closed later
+_unclosed: list[shared_memory.SharedMemory] = []
+_segments_lock = threading.Lock()
+
+def _attach(name: str) -> memoryview:
+    with _segments_lock:
+        segment = _segments.get(name)
+        if segment is None:
+            segment = _segments[name] = shared_memory.SharedMemory(name)
+        return segment.buf
+
+def _close(name: str) -> None:
+    with _segments_lock:
+        segment = _segments.pop(name, None)
+        if segment is not None:
+            _unclosed.append(segment)
+        # Retry the mappings that were still exported earlier
+        for segment in list(_unclosed):
+            try:
+                segment.close()
+            except BufferError:
+                continue
+            _unclosed.remove(segment)
+
+def _restore_bytes(buffer: memoryview, kind: type) -> Any:
+    buffer = memoryview(buffer)
+    return buffer.toreadonly() if kind is memoryview else kind(buffer)
+
+class _SharedBytes:
+    """
+    Wrapper pickling a bytes-like object as an out-of-band buffer,
+    which pickle only does for objects like NumPy arrays by itself.
+    bytes and bytearray are copied out of the shared memory when
+    loaded, memoryviews are loaded as read-only views of it.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __reduce_ex__(self, protocol: int) -> tuple:
+        return _restore_bytes, (pickle.PickleBuffer(self.value), type(self.value))
+
+class SharedOutput:
+    """
+    Handle of an output whose large buffers are in shared memory.
+    The output is pickled with protocol 5, and buffers of at
+    least min_size bytes, e.g. the data of NumPy arrays, are
+    copied out of band into shared memory segments. The handle
+    itself only holds the names of the segments and the small
+    in-band pickle, so sending it to another process is cheap,
+    and loading it there maps the segments without copying.
+
+    segments: tuple[tuple[str, int], ...]
+        The name and size of the segment of each out-of-band buffer.
+    data: bytes
+        The in-band pickle of the output.
+    """
+    __slots__ = ("segments", "data")
+
+    def __init__(self, segments: tuple[tuple[str, int], ...], data: bytes):
+        self.segments = segments
+        self.data = data
+
+    def __reduce__(self) -> tuple:
+        return SharedOutput, (self.segments, self.data)
+
+    def __repr__(self) -> str:
+        return f"SharedOutput({self.nbytes} bytes in {len(self.segments)} segment(s))"
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the buffers in shared memory.
+        """
+        return sum(size for _, size in self.segments)
+
+    @classmethod
+    def create(cls, value: Any, min_size: int = SHARED_MEMORY_MIN_SIZE) -> Optional["SharedOutput"]:
+        """
+        Copy the large buffers of a value into shared memory.
+        Returns None if the value has no buffer of at least
+        min_size bytes, in which case nothing is created.
+
+        value: Any
+            The value to be shared.
+        min_size: int
+            The minimum size of the buffers moved to shared memory.
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if memoryview(value).nbytes < min_size:
+                return None
+            value = _SharedBytes(value)
+
+        buffers: list[pickle.PickleBuffer] = []
+
+        def out_of_band(buffer: pickle.PickleBuffer) -> bool:
+            if buffer.raw().nbytes < min_size:
+                return True
+            buffers.append(buffer)
+            return False
+
+        data = pickle.dumps(value, protocol=5, buffer_callback=out_of_band)
+        if not buffers:
+            return None
+
+        segments = []
+        try:
+            for buffer in buffers:
+                raw = buffer.raw()
+                segment = shared_memory.SharedMemory(create=True, size=max(raw.nbytes, 1))
+                segment.buf[:raw.nbytes] = raw
+                segments.append(segment)
+        except BaseException:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+            raise
+        for segment in segments:
+            segment.close()
+        return cls(tuple((segment.name, buffer.raw().nbytes) for segment, buffer in zip(segments, buffers)), data)
+
+    def load(self) -> Any:
+        """
+        Load the output, mapping its buffers from shared memory.
+        """
+        buffers = [_attach(name)[:size] for name, size in self.segments]
+        return pickle.loads(self.data, buffers=buffers)
+
+    def release(self) -> None:
+        """
+        Unmap the segments of the output in this process,
+        as soon as no loaded value uses them anymore.
+        """
+        for name, _ in self.segments:
+            _close(name)
+
+    def unlink(self) -> None:
+        """
+        Remove the segments of the output. Values loaded
+        from them stay valid until they are released.
+        """
+        for name, _ in self.segments:
+            try:
+                segment = shared_memory.SharedMemory(name)
+            except FileNotFoundError:
+                continue
+            segment.close()
+            segment.unlink()
+        self.release()
+
+class _SharedValue:
+    """
+    Reference count of an output shared by the output stores
+    of this process. Values that cannot be referenced weakly,
+    such as bytes, are kept alive by the entry.
+    """
+    __slots__ = ("handle", "value", "count", "__weakref__")
+
+    def __init__(self, handle: SharedOutput, value: Any):
+        self.handle = handle
+        self.value = value
+        self.count = 0
+
+    def get(self) -> Any:
+        return self.value() if isinstance(self.value, weakref.ref) else self.value
+
+# Shared values of this process, by id of the value
+_shared: dict[int, _SharedValue] = {}
+_shared_lock = threading.Lock()
+
+def _register(handle: SharedOutput, value: Any) -> _SharedValue:
+    key = id(value)
+    entry = _SharedValue(handle, value)
+    try:
+        # The segments are removed once the value is garbage collected
+        entry.value = weakref.ref(value, lambda _: _forget(key, entry))
+    except TypeError:
+        pass
+    _shared[key] = entry
+    return entry
+
+def _forget(key: int, entry: _SharedValue) -> None:
+    with _shared_lock:
+        if _shared.get(key) is entry:
+            del _shared[key]
+    entry.handle.unlink()
+
+def get_handle(value: Any) -> Optional[SharedOutput]:
+    """
+    Get the shared memory handle of a value, if it is shared.
+
+    value: Any
+        The value, e.g. a resolved parameter of a function call.
+    """
+    entry = _shared.get(id(value))
+    if entry is not None and entry.get() is value:
+        return entry.handle
+    return None
+
+def share(value: Any, min_size: int = SHARED_MEMORY_MIN_SIZE) -> Any:
+    """
+    Move the large buffers of a value into shared memory, and
+    return the value to store in its place: a value loaded
+    from the shared memory without copying, or the value
+    itself if it is bytes or bytearray, which cannot be
+    loaded without a copy. Values without large buffers,
+    and values that are already shared, are returned as is.
+
+    value: Any
+        The value to be shared.
+    min_size: int
+        The minimum size of the buffers moved to shared memory.
+    """
+    if get_handle(value) is not None:
+        return value
+    try:
+        handle = SharedOutput.create(value, min_size)
+    except Exception:
+        # Values that cannot be pickled stay in the memory of the process
+        return value
+    if handle is None:
+        return value
+    if not isinstance(value, (bytes, bytearray)):
+        value = handle.load()
+    with _shared_lock:
+        _register(handle, value)
+    return value
+
+def load(value: Any) -> Any:
+    """
+    Load a value returned by a worker process, which is
+    a SharedOutput if its buffers are in shared memory.
+
+    value: Any
+        The value returned by the worker process.
+    """
+    if not isinstance(value, SharedOutput):
+        return value
+    loaded = value.load()
+    try:
+        weakref.ref(loaded)
+    except TypeError:
+        # Nothing would remove the segments of a value that is not
+        # stored, so values such as bytes, which are copied out of
+        # the shared memory anyway, are not kept in it
+        value.unlink()
+        return loaded
+    with _shared_lock:
+        _register(value, loaded)
+    return loaded
+
+def to_handles(parameters: dict[str, Any]) -> dict[str, Any]:
+    """
+    Replace the shared parameters of a function call sent to a
+    worker process by their handles. Returns the parameters as
+    is if none of them are shared.
+
+    parameters: dict[str, Any]
+        The resolved parameters of the function call.
+    """
+    if not _shared:
+        return parameters
+    handles = {}
+    for name, value in parameters.items():
+        handle = get_handle(value)
+        if handle is not None:
+            handles[name] = handle
+    return {**parameters, **handles} if handles else parameters
+
+def ensure_tracker() -> None:
+    """
+    Start the resource tracker of shared memory before worker
+    processes are forked, so that they share it with this
+    process instead of each removing their segments on exit.
+    """
+    resource_tracker.ensure_running()
+
+class SharedCall:
+    """
+    Picklable wrapper of a function run by a worker process,
+    which loads the SharedOutput parameters of the call and
+    returns a SharedOutput if the output has large buffers.
+
+    function: Callable
+        The function to be called.
+    min_size: Optional[int]
+        The minimum size of the buffers of outputs moved to
+        shared memory. Outputs are returned as is if None.
+    """
+    __slots__ = ("function", "min_size")
+
+    def __init__(self, function: Callable, min_size: Optional[int] = None):
+        self.function = function
+        self.min_size = min_size
+
+    def __reduce__(self) -> tuple:
+        return SharedCall, (self.function, self.min_size)
+
+    def __call__(self, **parameters: Any) -> Any:
+        handles = [value for value in parameters.values() if isinstance(value, SharedOutput)]
+        if handles:
+            parameters = {
+                name: value.load() if isinstance(value, SharedOutput) else value
+                for name, value in parameters.items()
+            }
+        try:
+            output = self.function(**parameters)
+        finally:
+            del parameters
+            for handle in handles:
+                handle.release()
+        if self.min_size is not None:
+            handle = SharedOutput.create(output, self.min_size)
+            if handle is not None:
+                return handle
+        return output
+
+class SharedMemoryOutputStore(MutableMapping):
+    """
+    Output store keeping outputs with large buffers, such as
+    NumPy arrays, bytes or Arrow-like tables, in shared memory,
+    so that they are passed to functions running on worker
+    processes by handle instead of being pickled and copied.
+    Shared outputs are reference counted across the stores of
+    the process, and their segments are removed when no store
+    holds them anymore, e.g. after reset_session.
+
+    min_size: int
+        The minimum size in bytes of the buffers moved to
+        shared memory. Smaller outputs are stored as is.
+    """
+    def __init__(self, min_size: int = SHARED_MEMORY_MIN_SIZE):
+        self.min_size = min_size
+        self._values: dict[str, Any] = {}
+        self._entries: dict[str, _SharedValue] = {}
+        self._versions: dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name: str) -> Any:
+        return self._values[name]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        value = share(value, self.min_size)
+        with self._lock:
+            # The new reference is taken before the old one is released,
+            # so that storing a shared output again under its name keeps it
+            with _shared_lock:
+                entry = _shared.get(id(value))
+                if entry is not None and entry.get() is value:
+                    entry.count += 1
+                else:
+                    entry = None
+            self._discard(name)
+            self._values[name] = value
+            self._versions[name] = next_version()
+            if entry is not None:
+                self._entries[name] = entry
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            if name not in self._values:
+                raise KeyError(name)
+            self._discard(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._values
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._values))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def shared_bytes(self) -> int:
+        """
+        The size of the buffers of the outputs of the
+        store that are in shared memory.
+        """
+        with self._lock:
+            entries = {id(entry): entry for entry in self._entries.values()}
+            return sum(entry.handle.nbytes for entry in entries.values())
+
+    def handle(self, name: str) -> Optional[SharedOutput]:
+        """
+        Get the shared memory handle of an output, if it is shared.
+
+        name: str
+            The name of the output.
+        """
+        entry = self._entries.get(name)
+        return entry.handle if entry is not None else None
+
+    def version(self, name: str) -> int:
+        """
+        Get the version of an output, which changes whenever
+        the output is set.
+
+        name: str
+            The name of the output.
+
+        Raises:
+            KeyError: If there is no output with the name.
+        """
+        return self._versions[name]
+
+    def close(self) -> None:
+        """
+        Remove all outputs, and the shared memory segments
+        that no other store holds.
+        """
+        with self._lock:
+            for name in list(self._values):
+                self._discard(name)
+
+    def clear(self) -> None:
+        self.close()
+
+    def _discard(self, name: str) -> None:
+        self._values.pop(name, None)
+        self._versions.pop(name, None)
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return
+        with _shared_lock:
+            entry.count -= 1
+            if entry.count > 0:
+                return
+            for key, shared_entry in list(_shared.items()):
+                if shared_entry is entry:
+                    del _shared[key]
+        entry.handle.unlink()
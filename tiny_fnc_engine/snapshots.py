@@ -0,0 +1,509 @@
+from typing import Any, Iterable, NamedTuple, Optional, Union
+from collections.abc import Mapping, MutableMapping
+import importlib
+import threading
+import hashlib
+import weakref
+import struct
+import pickle
+import mmap
+import uuid
+import zlib
+import os
+
+from pydantic import BaseModel
+
+# Declare constants
+SNAPSHOT_MAGIC = b"TFNS"
+SNAPSHOT_VERSION = 1
+COMPRESSION_LEVEL = 1
+OUT_OF_BAND_MIN_SIZE = 64 * 1024
+_COMPRESSED = 1
+_ALIGNMENT = 64
+# Magic, version, flags, length of the pickle, number of out-of-band buffers
+_HEADER = struct.Struct("<4sBBQI")
+_LENGTH = struct.Struct("<Q")
+
+SnapshotInput = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+class Snapshot(NamedTuple):
+    """
+    Contents of a snapshot of the outputs of a session.
+
+    snapshot_id: str
+        The ID of the snapshot.
+    base_id: Optional[str]
+        The ID of the snapshot an incremental snapshot
+        applies to, or None for a full snapshot.
+    session_id: Optional[str]
+        The ID of the session the snapshot was taken from.
+    outputs: dict[str, Any]
+        The outputs added or replaced since the base
+        snapshot, or all outputs for a full snapshot.
+    deleted: tuple[str, ...]
+        The names of the outputs removed since the base snapshot.
+    """
+    snapshot_id: str
+    base_id: Optional[str]
+    session_id: Optional[str]
+    outputs: dict[str, Any]
+    deleted: tuple[str, ...]
+
+class Checkpoint:
+    """
+    State of the outputs of a session at its last snapshot,
+    from which incremental snapshots are taken. The outputs
+    are not kept: each name is mapped to the version of the
+    output if the store has versions, like BoundedOutputStore,
+    whose spilled outputs stay on disk, and otherwise to a
+    weak reference to the output, or to its id and a digest
+    of its content if it cannot be referenced weakly, e.g. a
+    list. Outputs referenced weakly and modified in place
+    after a snapshot are not part of the next incremental
+    snapshot.
+
+    snapshot_id: str
+        The ID of the last snapshot.
+    tokens: dict[str, Any]
+        The version or reference of each output at the last snapshot.
+    """
+    __slots__ = ("snapshot_id", "tokens")
+
+    def __init__(self, snapshot_id: str, tokens: dict[str, Any]):
+        self.snapshot_id = snapshot_id
+        self.tokens = tokens
+
+def _digest(value: Any) -> Any:
+    """
+    Digest the content of an output that cannot be referenced
+    weakly: the hash of immutable values, which str and bytes
+    cache, or a hash of the bytes or the pickle of the others.
+    Returns None if the value cannot be pickled.
+    """
+    if isinstance(value, (str, bytes, int, float, tuple, frozenset)):
+        try:
+            return hash(value)
+        except TypeError:
+            # Tuples of mutable values
+            pass
+    if isinstance(value, bytearray):
+        return hashlib.sha256(value).digest()
+    try:
+        data = pickle.dumps(value, protocol=5)
+    except Exception:
+        return None
+    return hashlib.sha256(data).digest()
+
+def _reference(value: Any) -> Any:
+    try:
+        return weakref.ref(value)
+    except TypeError:
+        # Values such as lists, dicts and strings are not kept alive by the checkpoint
+        return id(value), _digest(value)
+
+def _is_referenced(token: Any, value: Any) -> bool:
+    if isinstance(token, weakref.ref):
+        return value is not None and token() is value
+    return token[0] == id(value) and token[1] is not None and token[1] == _digest(value)
+
+def _get_tokens(outputs: Mapping[str, Any]) -> dict[str, Any]:
+    """
+    Get the checkpoint tokens of outputs, without loading
+    the outputs of stores with versions.
+
+    outputs: Mapping[str, Any]
+        The outputs of the session.
+    """
+    version = getattr(outputs, "version", None)
+    if version is not None:
+        return {name: version(name) for name in list(outputs)}
+    return {name: _reference(value) for name, value in list(outputs.items())}
+
+def _import_model(module: str, qualname: str) -> Optional[type]:
+    try:
+        value = importlib.import_module(module)
+        for name in qualname.split("."):
+            value = getattr(value, name)
+    except (ImportError, AttributeError):
+        return None
+    return value
+
+def _restore_model(module: str, qualname: str, data: bytes) -> BaseModel:
+    model = _import_model(module, qualname)
+    if model is None:
+        raise pickle.UnpicklingError(f"Cannot import the model {module}.{qualname}")
+    return model.model_validate_json(data)
+
+class _ModelOutput:
+    """
+    Pydantic model pickled as its JSON, which pydantic-core
+    dumps and validates several times faster than pickle
+    copies the attributes of the model.
+    """
+    __slots__ = ("module", "qualname", "data")
+
+    def __init__(self, module: str, qualname: str, data: bytes):
+        self.module = module
+        self.qualname = qualname
+        self.data = data
+
+    def __reduce__(self) -> tuple:
+        return _restore_model, (self.module, self.qualname, self.data)
+
+# Whether the models of each class survive a round trip through JSON
+_json_models: "weakref.WeakKeyDictionary[type, bool]" = weakref.WeakKeyDictionary()
+_json_models_lock = threading.Lock()
+
+def _encode_model(value: BaseModel) -> Any:
+    """
+    Get the value to pickle in place of a Pydantic model:
+    a _ModelOutput if its class can be imported and the
+    first model of the class that was encoded round-trips
+    through JSON, or the model itself otherwise, e.g. if
+    its JSON loses excluded fields or has computed fields.
+    """
+    model = type(value)
+    try:
+        data = model.__pydantic_serializer__.to_json(value, round_trip=True)
+    except Exception:
+        # Values without a JSON representation, e.g. non-UTF-8 bytes
+        return value
+    with _json_models_lock:
+        eligible = _json_models.get(model)
+    if eligible is None:
+        eligible = _import_model(model.__module__, model.__qualname__) is model
+        if eligible:
+            try:
+                eligible = model.model_validate_json(data) == value
+            except Exception:
+                eligible = False
+        with _json_models_lock:
+            _json_models[model] = eligible
+    if not eligible:
+        return value
+    return _ModelOutput(model.__module__, model.__qualname__, data)
+
+def _pad(length: int) -> int:
+    return -length % _ALIGNMENT
+
+def encode_snapshot(snapshot: Snapshot, compress: bool = False) -> bytes:
+    """
+    Serialize a snapshot. The outputs are pickled with
+    protocol 5, with Pydantic models as JSON, and the
+    buffers of large outputs, e.g. arrays, are written out
+    of band after the pickle, aligned to 64 bytes, so that
+    they are not copied into it and can be loaded from a
+    memory-mapped file without copying.
+
+    snapshot: Snapshot
+        The snapshot to be serialized.
+    compress: bool
+        Whether to compress the pickle and the buffers with zlib.
+    """
+    outputs = {
+        name: _encode_model(value) if isinstance(value, BaseModel) else value
+        for name, value in snapshot.outputs.items()
+    }
+    buffers: list[pickle.PickleBuffer] = []
+
+    def out_of_band(buffer: pickle.PickleBuffer) -> bool:
+        if buffer.raw().nbytes < OUT_OF_BAND_MIN_SIZE:
+            return True
+        buffers.append(buffer)
+        return False
+
+    data = pickle.dumps(snapshot._replace(outputs=outputs), protocol=5, buffer_callback=out_of_band)
+    sections = [data] + [buffer.raw() for buffer in buffers]
+    if compress:
+        sections = [zlib.compress(section, COMPRESSION_LEVEL) for section in sections]
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _COMPRESSED if compress else 0, len(sections[0]), len(buffers))
+    header += b"".join(_LENGTH.pack(len(section)) for section in sections[1:])
+    parts = [header, bytes(_pad(len(header)))]
+    for section in sections:
+        parts.append(section)
+        parts.append(bytes(_pad(len(section))))
+    return b"".join(parts)
+
+def decode_snapshot(data: SnapshotInput) -> Snapshot:
+    """
+    Deserialize a snapshot. The out-of-band buffers of
+    uncompressed snapshots are views of the data, so outputs
+    such as arrays loaded from a memory-mapped file share
+    its pages instead of being copied.
+
+    data: SnapshotInput
+        The serialized snapshot, e.g. a memory-mapped file.
+
+    Raises:
+        ValueError: If the data is not a snapshot.
+    """
+    view = memoryview(data).cast("B")
+    if view.nbytes < _HEADER.size:
+        raise ValueError("Invalid snapshot: too short")
+    magic, version, flags, data_length, count = _HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Invalid snapshot: bad magic number")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+
+    lengths = [data_length] + [
+        _LENGTH.unpack_from(view, _HEADER.size + i * _LENGTH.size)[0]
+        for i in range(count)
+    ]
+    offset = _HEADER.size + count * _LENGTH.size
+    offset += _pad(offset)
+    sections = []
+    for length in lengths:
+        if offset + length > view.nbytes:
+            raise ValueError("Invalid snapshot: truncated")
+        sections.append(view[offset:offset + length])
+        offset += length + _pad(length)
+    if flags & _COMPRESSED:
+        sections = [zlib.decompress(section) for section in sections]
+
+    snapshot = pickle.loads(sections[0], buffers=sections[1:])
+    if not isinstance(snapshot, Snapshot):
+        raise ValueError("Invalid snapshot: unexpected contents")
+    return snapshot
+
+def snapshot_outputs(
+        outputs: Mapping[str, Any],
+        checkpoint: Optional[Checkpoint] = None,
+        compress: bool = False,
+        session_id: Optional[str] = None
+    ) -> tuple[bytes, Checkpoint]:
+    """
+    Take a snapshot of the outputs of a session. Returns the
+    serialized snapshot and the checkpoint of the outputs,
+    from which the next incremental snapshot can be taken.
+
+    outputs: Mapping[str, Any]
+        The outputs of the session.
+    checkpoint: Optional[Checkpoint]
+        The checkpoint of the last snapshot. If set, the
+        snapshot is incremental: it only contains the outputs
+        added or replaced since then, and the names of the
+        removed outputs. Otherwise, it contains all outputs.
+    compress: bool
+        Whether to compress the snapshot with zlib.
+    session_id: Optional[str]
+        The ID of the session, stored in the snapshot.
+
+    Raises:
+        pickle.PicklingError, TypeError: If an output cannot be pickled.
+    """
+    version = getattr(outputs, "version", None)
+    # Spilled outputs are serialized without being loaded back into the store
+    peek = getattr(outputs, "peek", outputs.__getitem__)
+    base = checkpoint.tokens if checkpoint is not None else {}
+    tokens: dict[str, Any] = {}
+    changed: dict[str, Any] = {}
+    for name in list(outputs):
+        if version is not None:
+            # Read before the output, so that an output set meanwhile is part of the next snapshot
+            tokens[name] = version(name)
+            if name not in base or base[name] != tokens[name]:
+                changed[name] = peek(name)
+        else:
+            value = outputs[name]
+            tokens[name] = _reference(value)
+            if name not in base or not _is_referenced(base[name], value):
+                changed[name] = value
+    deleted = tuple(name for name in base if name not in tokens)
+    snapshot = Snapshot(
+        uuid.uuid4().hex,
+        checkpoint.snapshot_id if checkpoint is not None else None,
+        session_id,
+        changed,
+        deleted
+    )
+    return encode_snapshot(snapshot, compress), Checkpoint(snapshot.snapshot_id, tokens)
+
+def restore_outputs(
+        snapshots: Iterable[SnapshotInput],
+        outputs: Optional[MutableMapping[str, Any]] = None
+    ) -> tuple[MutableMapping[str, Any], Checkpoint, Optional[str]]:
+    """
+    Restore the outputs of a session from a full snapshot
+    followed by the incremental snapshots taken after it.
+    Returns the outputs, the checkpoint of the last snapshot
+    from which further incremental snapshots can be taken,
+    and the ID of the session the snapshots were taken from.
+
+    snapshots: Iterable[SnapshotInput]
+        The serialized snapshots, in the order they were taken.
+    outputs: Optional[MutableMapping[str, Any]]
+        The mapping the outputs are restored into. A new
+        dict is used if None.
+
+    Raises:
+        ValueError: If there is no snapshot, if the first
+            snapshot is incremental, or if a snapshot does
+            not apply to the one before it.
+    """
+    if outputs is None:
+        outputs = {}
+    values: dict[str, Any] = {}
+    snapshot_id, session_id = None, None
+    for data in snapshots:
+        snapshot = decode_snapshot(data)
+        if snapshot_id is None and snapshot.base_id is not None:
+            raise ValueError("The first snapshot must be a full snapshot")
+        if snapshot_id is not None and snapshot.base_id not in (None, snapshot_id):
+            raise ValueError(f"Snapshot {snapshot.snapshot_id} does not apply to snapshot {snapshot_id}")
+        if snapshot.base_id is None:
+            values = dict(snapshot.outputs)
+        else:
+            for name in snapshot.deleted:
+                values.pop(name, None)
+            values.update(snapshot.outputs)
+        snapshot_id, session_id = snapshot.snapshot_id, snapshot.session_id
+    if snapshot_id is None:
+        raise ValueError("No snapshot to restore")
+
+    for name in [name for name in outputs if name not in values]:
+        del outputs[name]
+    for name, value in values.items():
+        outputs[name] = value
+    # Outputs may be replaced by the store, e.g. when moved to shared memory
+    return outputs, Checkpoint(snapshot_id, _get_tokens(outputs)), session_id
+
+class SnapshotStore:
+    """
+    Store of the snapshots of sessions in a directory, one
+    file per snapshot. Checkpointing a session writes a full
+    snapshot the first time and whenever full is set, which
+    removes the older snapshots of the session, and otherwise
+    an incremental snapshot of the outputs changed since the
+    last checkpoint. Snapshots are read with mmap, so large
+    buffers of uncompressed snapshots are not copied.
+
+    directory: str
+        The directory of the snapshots, created if needed.
+    compress: bool
+        Whether to compress the snapshots with zlib.
+    """
+    def __init__(self, directory: str, compress: bool = False):
+        self.directory = directory
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+
+    def _session_directory(self, session_id: str) -> str:
+        if not session_id or os.sep in session_id or session_id in (".", ".."):
+            raise ValueError(f"Invalid session ID {session_id!r}")
+        return os.path.join(self.directory, session_id)
+
+    def paths(self, session_id: str) -> list[str]:
+        """
+        Get the paths of the snapshots of a session, oldest first.
+
+        session_id: str
+            The ID of the session.
+        """
+        directory = self._session_directory(session_id)
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".snap"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name) for name in names]
+
+    def write(self, session_id: str, data: bytes, full: bool) -> str:
+        """
+        Write a serialized snapshot of a session. Writing a
+        full snapshot removes the older snapshots.
+
+        session_id: str
+            The ID of the session.
+        data: bytes
+            The serialized snapshot.
+        full: bool
+            Whether the snapshot is a full snapshot.
+        """
+        directory = self._session_directory(session_id)
+        os.makedirs(directory, exist_ok=True)
+        old = self.paths(session_id)
+        sequence = int(os.path.basename(old[-1])[:-5]) + 1 if old else 0
+        path = os.path.join(directory, f"{sequence:010d}.snap")
+        # Written to a temporary file first, so that readers never see a partial snapshot
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+        if full:
+            for old_path in old:
+                os.unlink(old_path)
+        return path
+
+    def read(self, session_id: str) -> list[SnapshotInput]:
+        """
+        Read the snapshots of a session as memory maps, which
+        the caller closes once the snapshots are restored.
+
+        session_id: str
+            The ID of the session.
+
+        Raises:
+            KeyError: If the session has no snapshot.
+        """
+        snapshots = []
+        for path in self.paths(session_id):
+            with open(path, "rb") as file:
+                snapshots.append(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        if not snapshots:
+            raise KeyError(f"No snapshot of session {session_id}")
+        return snapshots
+
+    def checkpoint(self, session: Any, full: bool = False) -> str:
+        """
+        Checkpoint a session, and return the path of the snapshot.
+
+        session: Session
+            The session to be checkpointed.
+        full: bool
+            Whether to write a full snapshot even if the
+            session has been checkpointed before.
+        """
+        full = full or session.checkpoint is None or not self.paths(session.session_id)
+        data = session.snapshot(incremental=not full, compress=self.compress)
+        return self.write(session.session_id, data, full)
+
+    def restore(self, engine: Any, session_id: str, ttl: Optional[float] = None) -> Any:
+        """
+        Restore a session of an engine from its snapshots.
+
+        engine: FunctionCallingEngine
+            The engine the session is restored into.
+        session_id: str
+            The ID of the session.
+        ttl: Optional[float]
+            The TTL of the restored session, see create_session.
+
+        Raises:
+            KeyError: If the session has no snapshot.
+        """
+        snapshots = self.read(session_id)
+        try:
+            return engine.restore_session(snapshots, session_id, ttl)
+        finally:
+            for snapshot in snapshots:
+                try:
+                    snapshot.close()
+                except BufferError:
+                    # Restored outputs still use its pages, which are unmapped
+                    # once the outputs are garbage collected
+                    pass
+
+    def remove(self, session_id: str) -> None:
+        """
+        Remove the snapshots of a session.
+
+        session_id: str
+            The ID of the session.
+        """
+        for path in self.paths(session_id):
+            os.unlink(path)
+        try:
+            os.rmdir(self._session_directory(session_id))
+        except OSError:
+            pass
@@ -0,0 +1,276 @@
+from typing import Any, Iterator, NamedTuple, Optional
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import itertools
+import tempfile
+import threading
+import weakref
+import pickle
+import shutil
+import sys
+import os
+
+from pydantic import BaseModel
+
+# Versions of the outputs set in the stores of this process
+next_version = itertools.count(1).__next__
+
+def approximate_size(value: Any, _seen: Optional[set[int]] = None) -> int:
+    """
+    Approximate the memory used by a value in bytes,
+    including the items of containers, the fields of
+    Pydantic models and the buffers of arrays.
+
+    value: Any
+        The value to be measured.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, memoryview):
+        return size + value.nbytes
+    if isinstance(value, dict):
+        return size + sum(
+            approximate_size(key, _seen) + approximate_size(item, _seen)
+            for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(approximate_size(item, _seen) for item in value)
+    if isinstance(value, BaseModel):
+        return size + approximate_size(value.__dict__, _seen)
+
+    # Arrays, e.g. NumPy, and DataFrames, e.g. pandas
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return size + nbytes
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            return size + int(memory_usage(deep=True).sum())
+        except Exception:
+            pass
+    if hasattr(value, "__dict__"):
+        return size + approximate_size(vars(value), _seen)
+    return size
+
+class OutputStoreStats(NamedTuple):
+    """
+    Counters of a BoundedOutputStore.
+
+    resident_bytes: int
+        The approximate size of the values kept in memory.
+    resident: int
+        The number of values kept in memory.
+    spilled: int
+        The number of values currently spilled to disk.
+    evictions: int
+        The number of values dropped or spilled to disk
+        because the store was over its memory budget.
+    loads: int
+        The number of values loaded back from disk.
+    """
+    resident_bytes: int
+    resident: int
+    spilled: int
+    evictions: int
+    loads: int
+
+class BoundedOutputStore(MutableMapping):
+    """
+    Output store with a memory budget. It tracks the
+    approximate size of each value, and once the values
+    in memory exceed the budget, the least recently used
+    values are spilled to pickle files on disk, or dropped
+    if spilling is disabled. Spilled values are loaded back
+    when they are accessed again, e.g. when a later function
+    call references them.
+
+    The names of dropped values stay in the store until they
+    are set or deleted again: they are still contained in it,
+    so that a later implicit reference to them is not passed
+    as a plain string, but accessing them raises a KeyError.
+
+    max_bytes: int
+        The memory budget of the store in bytes.
+    spill: bool
+        Whether to spill values to disk instead of dropping them.
+    spill_dir: Optional[str]
+        The directory in which a temporary directory for
+        spilled values is created. Defaults to the system
+        temporary directory.
+    """
+    def __init__(self, max_bytes: int, spill: bool = True, spill_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.spill_dir = spill_dir
+        self._values: OrderedDict[str, Any] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._spilled: dict[str, str] = {}
+        self._versions: dict[str, int] = {}
+        self._dropped: set[str] = set()
+        self._resident_bytes = 0
+        self._evictions = self._loads = 0
+        self._directory: Optional[str] = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self._lock = threading.RLock()
+
+    def __getitem__(self, name: str) -> Any:
+        with self._lock:
+            if name in self._values:
+                self._values.move_to_end(name)
+                return self._values[name]
+            self._check_dropped(name)
+            path = self._spilled.pop(name)
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            os.unlink(path)
+            self._loads += 1
+            self._insert(name, value)
+            return value
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        with self._lock:
+            self._discard(name)
+            self._versions[name] = next_version()
+            self._insert(name, value)
+
+    def __delitem__(self, name: str) -> None:
+        with self._lock:
+            if name not in self:
+                raise KeyError(name)
+            self._discard(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._values or name in self._spilled or name in self._dropped
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._values) + list(self._spilled))
+
+    def __len__(self) -> int:
+        return len(self._values) + len(self._spilled)
+
+    def peek(self, name: str) -> Any:
+        """
+        Get an output without loading it back into memory if it
+        is spilled, nor marking it as recently used, e.g. to
+        serialize it.
+
+        name: str
+            The name of the output.
+
+        Raises:
+            KeyError: If there is no output with the name, or
+                it was dropped.
+        """
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+            self._check_dropped(name)
+            with open(self._spilled[name], "rb") as file:
+                return pickle.load(file)
+
+    def version(self, name: str) -> int:
+        """
+        Get the version of an output, which changes whenever
+        the output is set, but not when it is spilled or
+        loaded back.
+
+        name: str
+            The name of the output.
+
+        Raises:
+            KeyError: If there is no output with the name.
+        """
+        return self._versions[name]
+
+    @property
+    def stats(self) -> OutputStoreStats:
+        """
+        The counters of the store.
+        """
+        with self._lock:
+            return OutputStoreStats(
+                self._resident_bytes,
+                len(self._values),
+                len(self._spilled),
+                self._evictions,
+                self._loads
+            )
+
+    def close(self) -> None:
+        """
+        Remove all values and the spilled files of the store.
+        """
+        with self._lock:
+            self._values.clear()
+            self._sizes.clear()
+            self._spilled.clear()
+            self._versions.clear()
+            self._dropped.clear()
+            self._resident_bytes = 0
+            if self._finalizer is not None:
+                self._finalizer()
+                self._directory = self._finalizer = None
+
+    def clear(self) -> None:
+        self.close()
+
+    def _insert(self, name: str, value: Any) -> None:
+        size = approximate_size(value)
+        self._values[name] = value
+        self._sizes[name] = size
+        self._resident_bytes += size
+        if self._resident_bytes > self.max_bytes:
+            self._enforce_budget()
+
+    def _check_dropped(self, name: str) -> None:
+        if name in self._dropped:
+            raise KeyError(f"Output {name!r} was dropped from the store to stay within max_bytes={self.max_bytes}")
+
+    def _discard(self, name: str) -> None:
+        self._versions.pop(name, None)
+        self._dropped.discard(name)
+        if name in self._values:
+            del self._values[name]
+            self._resident_bytes -= self._sizes.pop(name)
+        elif name in self._spilled:
+            os.unlink(self._spilled.pop(name))
+
+    def _enforce_budget(self) -> None:
+        # Least recently used values go first
+        for name in list(self._values):
+            if self._resident_bytes <= self.max_bytes:
+                break
+            value = self._values[name]
+            if self.spill:
+                try:
+                    self._spilled[name] = self._write(value)
+                except Exception:
+                    # Values that cannot be pickled stay in memory
+                    continue
+            else:
+                del self._versions[name]
+                self._dropped.add(name)
+            del self._values[name]
+            self._resident_bytes -= self._sizes.pop(name)
+            self._evictions += 1
+
+    def _write(self, value: Any) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="tiny_fnc_engine_", dir=self.spill_dir)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._directory, True)
+        file_descriptor, path = tempfile.mkstemp(suffix=".pkl", dir=self._directory)
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump(value, file, protocol=5)
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
@@ -0,0 +1,219 @@
+from typing import Any, Callable, Optional, Union
+import json
+
+class IncrementalJSONParser:
+    """
+    Parser for JSON text that arrives in chunks, such as
+    a streamed LLM response. It yields every object of a
+    top-level array as soon as the object is closed, or
+    the top-level object itself if the text is not an array.
+    Text before the first '[' or '{' (e.g. a code fence) is
+    ignored, and only whitespace and a closing code fence
+    may follow the top-level value, see close.
+
+    loads: Callable[[str], Any]
+        The function decoding each closed object.
+    """
+    def __init__(self, loads: Callable[[str], Any] = json.loads):
+        self.loads = loads
+        self.depth = 0
+        self.in_array = False
+        self.in_string = False
+        self.escape = False
+        self.finished = False
+        self.pieces: Optional[list[str]] = None
+        self.position = 0
+        self.extra: Optional[int] = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        """
+        Feed a chunk of text to the parser.
+
+        chunk: str
+            The next chunk of text.
+
+        Returns:
+            The objects that were closed by the chunk.
+        """
+        objects = []
+        start = 0 if self.pieces is not None else None
+
+        for i, char in enumerate(chunk):
+            if self.finished:
+                self._check_extra(chunk, i)
+                break
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif self.depth == 0:
+                if char == '[':
+                    self.depth, self.in_array = 1, True
+                elif char == '{':
+                    self.depth, self.in_array = 1, False
+                    self.pieces, start = [], i
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+                if char == '{' and self.in_array and self.depth == 2:
+                    self.pieces, start = [], i
+            elif char in '}]':
+                self.depth -= 1
+                if char == '}' and self.depth == (1 if self.in_array else 0):
+                    self.pieces.append(chunk[start:i + 1])
+                    objects.append(self.loads("".join(self.pieces)))
+                    self.pieces = start = None
+                if self.depth == 0:
+                    self.finished = True
+
+        if self.pieces is not None and start is not None:
+            self.pieces.append(chunk[start:])
+        self.position += len(chunk)
+        return objects
+
+    def _check_extra(self, chunk: str, start: int) -> None:
+        # Remember where the first text after the top-level value is
+        if self.extra is None and chunk[start:].strip().strip("`").strip():
+            self.extra = self.position + start + len(chunk[start:]) - len(chunk[start:].lstrip())
+
+    def close(self) -> None:
+        """
+        Check that the text fed to the parser was one complete
+        top-level value, optionally in a code fence. Nothing
+        is checked if no text was fed.
+
+        Raises:
+            json.JSONDecodeError: If the text ended inside the
+                value, had no value, or had other text after it.
+        """
+        if self.position == 0:
+            return
+        if self.depth or self.in_string:
+            raise json.JSONDecodeError("Unterminated JSON value at the end of the stream", "", self.position)
+        if not self.finished:
+            raise json.JSONDecodeError("Expecting value", "", self.position)
+        if self.extra is not None:
+            raise json.JSONDecodeError("Extra data", "", self.extra)
+
+class ToolCallDeltaAccumulator:
+    """
+    Accumulator for streamed OpenAI "tool_calls" deltas.
+    Each delta carries an index, and the id, name and a
+    piece of the JSON arguments of a tool call. A tool call
+    is complete as soon as its arguments object is closed.
+    Deltas can be dictionaries or OpenAI SDK objects.
+
+    loads: Callable[[str], Any]
+        The function decoding the arguments of each tool call.
+    """
+    def __init__(self, loads: Callable[[str], Any] = json.loads):
+        self.loads = loads
+        self.tool_calls: dict[int, dict] = {}
+        self.parsers: dict[int, IncrementalJSONParser] = {}
+        self.completed: set[int] = set()
+
+    @staticmethod
+    def _get(delta: Any, key: str) -> Any:
+        if isinstance(delta, dict):
+            return delta.get(key)
+        return getattr(delta, key, None)
+
+    def feed(self, delta: Any) -> list[dict]:
+        """
+        Feed a tool call delta to the accumulator.
+
+        delta: Any
+            The next tool call delta.
+
+        Returns:
+            The tool calls that were completed by the delta.
+        """
+        index = self._get(delta, "index") or 0
+        tool_call = self.tool_calls.get(index)
+        if tool_call is None:
+            tool_call = self.tool_calls[index] = {"id": None, "name": "", "type": "function"}
+            self.parsers[index] = IncrementalJSONParser(self.loads)
+
+        if self._get(delta, "id"):
+            tool_call["id"] = self._get(delta, "id")
+        function = self._get(delta, "function")
+        if function is None:
+            return []
+        if self._get(function, "name"):
+            tool_call["name"] += self._get(function, "name")
+
+        arguments = self._get(function, "arguments")
+        if arguments and index not in self.completed:
+            objects = self.parsers[index].feed(arguments)
+            if objects:
+                self.completed.add(index)
+                return [self._to_tool_call(tool_call, objects[0])]
+        return []
+
+    def close(self) -> list[dict]:
+        """
+        Complete the remaining tool calls at the end of the
+        stream. Tool calls without arguments complete here.
+        """
+        remaining = []
+        for index, tool_call in sorted(self.tool_calls.items()):
+            if index not in self.completed:
+                self.completed.add(index)
+                remaining.append(self._to_tool_call(tool_call, {}))
+        return remaining
+
+    @staticmethod
+    def _to_tool_call(tool_call: dict, arguments: dict) -> dict:
+        return {
+            "id": tool_call["id"] or "",
+            "function": {"name": tool_call["name"], "arguments": arguments},
+            "type": tool_call["type"]
+        }
+
+class StreamParser:
+    """
+    Parser for a stream of function calls, which accepts
+    either chunks of text or OpenAI "tool_calls" deltas.
+
+    Chunks of text are parsed with an IncrementalJSONParser,
+    while deltas (or lists of deltas) are accumulated with a
+    ToolCallDeltaAccumulator.
+
+    loads: Callable[[str], Any]
+        The function decoding JSON, e.g. the loads
+        function of a JSONBackend.
+    """
+    def __init__(self, loads: Callable[[str], Any] = json.loads):
+        self.text_parser = IncrementalJSONParser(loads)
+        self.delta_accumulator = ToolCallDeltaAccumulator(loads)
+
+    def feed(self, chunk: Union[str, Any, list]) -> list[dict]:
+        """
+        Feed a chunk to the parser.
+
+        chunk: Union[str, Any, list]
+            A chunk of text, a tool call delta or a list of deltas.
+
+        Returns:
+            The function calls that were completed by the chunk.
+        """
+        if isinstance(chunk, str):
+            return self.text_parser.feed(chunk)
+        if isinstance(chunk, list):
+            return [call for delta in chunk for call in self.delta_accumulator.feed(delta)]
+        return self.delta_accumulator.feed(chunk)
+
+    def close(self) -> list[dict]:
+        """
+        Complete the remaining function calls at the end of the stream.
+
+        Raises:
+            json.JSONDecodeError: If the text of the stream was
+                not one complete JSON value, see IncrementalJSONParser.close.
+        """
+        self.text_parser.close()
+        return self.delta_accumulator.close()